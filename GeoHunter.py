@@ -1,5 +1,5 @@
 # GeoHunter.py
-import requests
+import tracing  # Первым: отсчет времени запуска
 import time
 import traceback
 from typing import Dict, Any
@@ -7,27 +7,36 @@ import asyncio
 import sqlite3
 import os
 import logging
+import io
 import json
 from dotenv import load_dotenv
 from telegram import Update, WebAppInfo, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, CallbackContext, MessageHandler, filters, JobQueue, CallbackQueryHandler
 
 from database import Database
+import metrics
+import messages
+import log_events
+import archive
+import periodic
+import trajectory
+import webapp_payload
+from game_config import GAME_MODES, SPOTS_PER_GAME
 
 # Загрузка переменных окружения
 load_dotenv()
 TOKEN = os.getenv('BOT_TOKEN')
 WEB_APP_URL = os.getenv('WEB_APP_URL', 'https://sevryuk88.github.io/GeoHunter-/geohtml.html')
 
-# Настройка логирования
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
+# Настройка логирования (вывод в фоновом потоке)
+log_events.setup_logging()
 logger = logging.getLogger(__name__)
+events = log_events.EventLogger(logger)
+tracing.startup.mark('imports')
 
 # Инициализация базы данных
 db = Database()
+tracing.startup.mark('database')
 
 # CryptoBot API configuration
 CRYPTO_BOT_TOKEN = os.getenv('CRYPTO_BOT_TOKEN')
@@ -37,6 +46,38 @@ CRYPTO_BOT_API_URL = "https://testnet-pay.crypt.bot/" if CRYPTO_BOT_TESTNET else
 # Режим работы (демо/реальный)
 DEMO_MODE = os.getenv('DEMO_MODE', 'True').lower() == 'true'
 
+# Порт для /metrics (0 — не запускать)
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+
+# Строки журнала старше срока переносятся в сжатые архивы (раз в сутки)
+ARCHIVE_RETENTION_DAYS = int(os.getenv('ARCHIVE_RETENTION_DAYS', str(archive.RETENTION_DAYS)))
+ARCHIVE_INTERVAL = 24 * 3600
+
+# Радиусы поиска по режимам передаются веб-приложению в ссылке: radii=economy:30,standard:50,...
+WEB_APP_RADII = ','.join(f"{mode}:{config['search_radius']}" for mode, config in GAME_MODES.items())
+
+
+def verify_game_result(data) -> None:
+    """Проверка результата игры из веб-приложения до начисления; при нарушении — TrackError"""
+    mode = data.get('mode')
+    if mode not in GAME_MODES or data.get('entry_fee') != GAME_MODES[mode]['entry_fee']:
+        raise trajectory.TrackError('mode', f"режим {mode!r}")
+    found = data.get('found_geospots', [])
+    if not isinstance(found, list) or len(found) > SPOTS_PER_GAME:
+        raise trajectory.TrackError('spots', 'лишние метки')
+    for spot in found:
+        if not isinstance(spot, dict) or not all(type(spot.get(key)) in (int, float) for key in ('lat', 'lon')) \
+                or type(spot.get('prize_amount', 0)) not in (int, float):
+            raise trajectory.TrackError('spots', f"неверная метка {spot!r:.80}")
+    prizes = [spot.get('prize_amount', 0) if spot.get('has_prize') else 0 for spot in found]
+    if any(not 0 <= prize <= GAME_MODES[mode]['max_prize'] for prize in prizes) \
+            or data.get('prize_won', 0) != sum(prizes):
+        raise trajectory.TrackError('prize', f"prize_won={data.get('prize_won')}")
+    if 'track' not in data:
+        raise trajectory.TrackError('no_track')
+    trajectory.verify_track(data['track'], [(spot['lat'], spot['lon']) for spot in found],
+                            GAME_MODES[mode]['search_radius'])
+
 def create_crypto_invoice(user_id: int, amount: float, asset: str = "USDT") -> Dict[str, Any]:
     """Создание инвойса в CryptoBot"""
     if DEMO_MODE:
@@ -78,20 +119,26 @@ def create_crypto_invoice(user_id: int, amount: float, asset: str = "USDT") -> D
         "allow_anonymous": False
     }
     
+    # requests нужен только в реальном режиме: не загружаем его при старте
+    import requests
     try:
-        logger.info(f"Sending request to CryptoBot API: {CRYPTO_BOT_API_URL}api/createInvoice")
-        
-        response = requests.post(
-            f"{CRYPTO_BOT_API_URL}api/createInvoice",
-            headers=headers,
-            json=payload,
-            timeout=30
-        )
+        events.log('provider_request', provider='cryptobot', call='createInvoice', user_id=user_id)
+        
+        with metrics.PROVIDER_LATENCY.time('cryptobot', 'createInvoice'):
+            response = requests.post(
+                f"{CRYPTO_BOT_API_URL}api/createInvoice",
+                headers=headers,
+                json=payload,
+                timeout=30
+            )
         
-        logger.info(f"Response status: {response.status_code}")
-        logger.info(f"Response text: {response.text}")
+        # Тело ответа не логируем: в нем платежные данные, а размер не ограничен
+        events.log('provider_response', provider='cryptobot', call='createInvoice',
+                   status=response.status_code, size=len(response.content))
         
         # Проверяем статус ответа
+        if response.status_code >= 400:
+            metrics.PROVIDER_ERRORS.inc('cryptobot', 'createInvoice')
         if response.status_code == 401:
             logger.error("CryptoBot API returned 401 Unauthorized. Please check your token.")
             return {"error": "Invalid API token"}
@@ -111,9 +158,11 @@ def create_crypto_invoice(user_id: int, amount: float, asset: str = "USDT") -> D
             return {"error": error.get('name', 'Unknown error')}
             
     except requests.exceptions.RequestException as e:
+        metrics.PROVIDER_ERRORS.inc('cryptobot', 'createInvoice')
         logger.error(f"Network error creating CryptoBot invoice: {e}")
         return {"error": "Network error"}
     except Exception as e:
+        metrics.PROVIDER_ERRORS.inc('cryptobot', 'createInvoice')
         logger.error(f"Unexpected error creating CryptoBot invoice: {e}")
         logger.error(traceback.format_exc())
         return {"error": "Unexpected error"}
@@ -132,16 +181,19 @@ def check_crypto_invoice(invoice_id: int) -> Dict[str, Any]:
         "Crypto-Pay-API-Token": CRYPTO_BOT_TOKEN
     }
     
+    import requests
     try:
-        response = requests.get(
-            f"{CRYPTO_BOT_API_URL}api/invoice?invoice_ids={invoice_id}",
-            headers=headers,
-            timeout=30
-        )
+        with metrics.PROVIDER_LATENCY.time('cryptobot', 'getInvoices'):
+            response = requests.get(
+                f"{CRYPTO_BOT_API_URL}api/invoice?invoice_ids={invoice_id}",
+                headers=headers,
+                timeout=30
+            )
         response.raise_for_status()
         result = response.json().get("result", {}).get("items", [])
         return result[0] if result else {}
     except Exception as e:
+        metrics.PROVIDER_ERRORS.inc('cryptobot', 'getInvoices')
         logger.error(f"Error checking CryptoBot invoice: {e}")
         return {}
 
@@ -155,12 +207,14 @@ def check_cryptobot_connection():
         "Crypto-Pay-API-Token": CRYPTO_BOT_TOKEN
     }
     
+    import requests
     try:
-        response = requests.get(
-            f"{CRYPTO_BOT_API_URL}api/getMe",
-            headers=headers,
-            timeout=30
-        )
+        with metrics.PROVIDER_LATENCY.time('cryptobot', 'getMe'):
+            response = requests.get(
+                f"{CRYPTO_BOT_API_URL}api/getMe",
+                headers=headers,
+                timeout=30
+            )
         response.raise_for_status()
         result = response.json()
         
@@ -171,6 +225,7 @@ def check_cryptobot_connection():
             logger.error(f"CryptoBot API connection failed: {result}")
             return False
     except Exception as e:
+        metrics.PROVIDER_ERRORS.inc('cryptobot', 'getMe')
         logger.error(f"CryptoBot API connection error: {e}")
         return False
 
@@ -180,7 +235,7 @@ async def process_crypto_payment(context: CallbackContext) -> None:
         logger.info("Starting payment processing job")
         
         # Получаем все ожидающие платежи из базы данных
-        conn = sqlite3.connect('geohunter.db')
+        conn = sqlite3.connect(db.db_name)
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM transactions WHERE status = "pending" AND provider = "cryptobot"')
         pending_transactions = cursor.fetchall()
@@ -196,14 +251,17 @@ async def process_crypto_payment(context: CallbackContext) -> None:
             # Проверяем статус инвойса
             invoice_info = check_crypto_invoice(provider_transaction_id)
             
-            logger.info(f"Invoice info: {invoice_info}")
+            events.log('invoice_info', invoice_id=provider_transaction_id, status=invoice_info.get('status'))
             
             if invoice_info.get('status') == 'paid':
                 logger.info(f"Invoice {provider_transaction_id} is paid, updating balance")
                 
-                # Обновляем статус транзакции и баланс пользователя
-                db.update_balance(user_id, amount)
-                db.add_transaction(user_id, amount, "deposit", "completed", "cryptobot", provider_transaction_id)
+                # Статус и баланс меняются вместе, и только если транзакция еще ожидала оплаты:
+                # повторный проход не зачислит оплаченный инвойс второй раз
+                completed = db.complete_pending_transaction(transaction_id)
+                if completed is None:
+                    logger.info(f"Invoice {provider_transaction_id} was already processed")
+                    continue
                 
                 # Уведомляем пользователя
                 try:
@@ -276,7 +334,7 @@ async def start(update: Update, context: CallbackContext) -> None:
     welcome_text += "Click the button below to launch the game interface:"
     
     # Добавляем initData для аутентификации в веб-приложении
-    web_app_url = f"{WEB_APP_URL}?user_id={user.id}&demo_mode={DEMO_MODE}"
+    web_app_url = f"{WEB_APP_URL}?user_id={user.id}&demo_mode={DEMO_MODE}&radii={WEB_APP_RADII}"
     
     keyboard = [
         [InlineKeyboardButton("🎮 Launch GeoHunter", web_app=WebAppInfo(url=web_app_url))]
@@ -398,14 +456,26 @@ async def handle_deposit_callback(update: Update, context: CallbackContext) -> N
 async def handle_web_app_data(update: Update, context: CallbackContext) -> None:
     """Обработка данных из веб-приложения"""
     try:
-        data = json.loads(update.message.web_app_data.data)
+        # Компактный формат версии 2 или прежний JSON-объект
+        data = webapp_payload.decode_payload(update.message.web_app_data.data)
         user_id = update.effective_user.id
         
-        logger.info(f"Received data from web app: {data}")
+        events.log('web_app_data', user_id=user_id, type=data.get('type'))
         
         # Обработка разных типов данных из веб-приложения
         if data.get('type') == 'game_result':
-            # Обработка результатов игры
+            # Результат считает клиент: до начисления сверяем его с треком игрока
+            try:
+                verify_game_result(data)
+            except (trajectory.TrackError, KeyError, TypeError, ValueError, AttributeError, OverflowError) as e:
+                logger.warning(f"Rejected web app game result from user {user_id}: {e!r}")
+                metrics.TRAJECTORY_FLAGS.inc('rejected')
+                db.create_game(user_id, str(data.get('mode')), 0, status='rejected')
+                await update.message.reply_text(messages.text(
+                    messages.language_for(update.effective_user.language_code), 'webapp.rejected',
+                    balance=db.get_balance(user_id)))
+                return
+
             game_id = db.create_game(user_id, data['mode'], data['entry_fee'])
             
             # Добавляем найденные геоточки
@@ -558,6 +628,68 @@ async def admin_toggle_mode(update: Update, context: CallbackContext) -> None:
         f"✅ Режим изменен на: {'Демо' if DEMO_MODE else 'Реальный'}"
     )
 
+async def admin_verbose(update: Update, context: CallbackContext) -> None:
+    """Переключение подробных логов горячих путей: /verbose on|off"""
+    user_id = update.effective_user.id
+    
+    # Проверяем, является ли пользователь администратором
+    if str(user_id) not in os.getenv('ADMIN_IDS', '').split(','):
+        await update.message.reply_text("❌ У вас нет прав для выполнения этой команды.")
+        return
+    
+    if context.args and context.args[0] in ('on', 'off'):
+        log_events.set_verbose(context.args[0] == 'on')
+    
+    await update.message.reply_text(
+        f"📝 Подробные логи: {'включены' if log_events.HOT_PATH_VERBOSE else 'выключены'}\n"
+        f"Отброшено лимитом: {sum(events.dropped.values())}"
+    )
+
+PROFILE_MAX_SECONDS = 300
+
+async def admin_profile(update: Update, context: CallbackContext) -> None:
+    """Сэмплирующий профилировщик: /profile N или /profile stop"""
+    user_id = update.effective_user.id
+    
+    # Проверяем, является ли пользователь администратором
+    if str(user_id) not in os.getenv('ADMIN_IDS', '').split(','):
+        await update.message.reply_text("❌ У вас нет прав для выполнения этой команды.")
+        return
+    
+    async def send_profile():
+        folded = tracing.profiler.stop()
+        await update.message.reply_document(
+            document=io.BytesIO(folded.encode('utf-8')),
+            filename=f"profile_{int(time.time())}.folded",
+            caption="🔥 Стеки в формате flamegraph (collapsed)"
+        )
+    
+    if context.args and context.args[0] == 'stop':
+        if tracing.profiler.running:
+            await send_profile()
+        else:
+            await update.message.reply_text("Профилировщик не запущен")
+        return
+    
+    try:
+        seconds = min(int(context.args[0]), PROFILE_MAX_SECONDS) if context.args else 30
+    except ValueError:
+        await update.message.reply_text("❌ Использование: /profile [секунды|stop]")
+        return
+    
+    if not tracing.profiler.start():
+        await update.message.reply_text("Профилировщик уже запущен")
+        return
+    run_id = tracing.profiler.run_id
+    
+    async def finish_later():
+        await asyncio.sleep(seconds)
+        if tracing.profiler.running and tracing.profiler.run_id == run_id:
+            await send_profile()
+    
+    asyncio.get_running_loop().create_task(finish_later())
+    await update.message.reply_text(f"⏱ Профилирование запущено на {seconds} с")
+
 def generate_payment_url(user_id, amount):
     """Генерация URL для оплаты через CryptoBot"""
     invoice = create_crypto_invoice(user_id, amount)
@@ -578,6 +710,13 @@ async def handle_successful_payment(update: Update, context: CallbackContext) ->
     # Здесь будет обработка успешных платежей
     pass
 
+async def archive_ledger(context: CallbackContext) -> None:
+    """Перенос старых транзакций и игр в архив (в отдельном потоке)"""
+    try:
+        await asyncio.to_thread(archive.archive_old_rows, db.db_name, retention_days=ARCHIVE_RETENTION_DAYS)
+    except Exception as e:
+        logger.error(f"Error archiving ledger: {e}")
+
 def main() -> None:
     """Запуск бота"""
     # Проверяем подключение к CryptoBot API (только в реальном режиме)
@@ -592,22 +731,32 @@ def main() -> None:
     application.add_handler(CommandHandler("stats", admin_stats))
     application.add_handler(CommandHandler("broadcast", admin_broadcast))
     application.add_handler(CommandHandler("toggle_mode", admin_toggle_mode))
+    application.add_handler(CommandHandler("profile", admin_profile))
+    application.add_handler(CommandHandler("verbose", admin_verbose))
     application.add_handler(MessageHandler(filters.StatusUpdate.WEB_APP_DATA, handle_web_app_data))
     
     # Добавляем обработчики callback-запросов
     application.add_handler(CallbackQueryHandler(show_deposit_menu, pattern="^deposit_menu$"))
     application.add_handler(CallbackQueryHandler(handle_deposit_callback, pattern="^(demo_)?deposit_\\d+$"))
     
+    # Метрики латентности для всех обработчиков
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            handler.callback = metrics.instrument_handler(handler.callback)
+    
+    metrics.REGISTRY.gauge('geohunter_db_cache_hit_ratio', 'Доля попаданий в кэш пользователей',
+                           lambda: round(db.user_cache.hit_ratio, 4))
+    if METRICS_PORT:
+        metrics.start_http_server(METRICS_PORT)
+        logger.info(f"Metrics available on port {METRICS_PORT}")
+    
+    periodic.run_repeating(application, archive_ledger, ARCHIVE_INTERVAL, first=60)
+    
     # Добавляем планировщик для проверки платежей (только в реальном режиме)
     if not DEMO_MODE:
-        job_queue = application.job_queue
-        if job_queue:
-            job_queue.run_repeating(
-                lambda context: asyncio.create_task(process_crypto_payment(context)),
-                interval=300,
-                first=10
-            )
+        periodic.run_repeating(application, process_crypto_payment, 300, first=10)
     
+    tracing.startup.mark('application')
     logger.info(f"Bot started in {'DEMO' if DEMO_MODE else 'REAL'} mode")
     application.run_polling()
 
@@ -0,0 +1,158 @@
+# archive.py
+# Архивация старых строк журнала: перенос в сжатые помесячные файлы (только дозапись)
+# с итогами по пользователям в базе и чтение архивов для аудита.
+#
+# Пример:
+#   python archive.py --db geohunter.db --days 90          # перенести строки старше 90 дней
+#   python archive.py --read transactions --user 42        # прочитать архив пользователя
+import os
+import sys
+import glob
+import gzip
+import json
+import sqlite3
+import logging
+import argparse
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', 'archive')
+RETENTION_DAYS = 90
+BATCH_SIZE = 5000
+
+# Таблица: (ключ, колонка суммы для итогов, дополнительное условие отбора)
+ARCHIVED_TABLES = {
+    'transactions': ('transaction_id', 'amount', ''),
+    'games': ('game_id', 'prize_won', " AND status != 'active'"),
+    'found_geospots': ('geospot_id', 'prize_amount', ''),
+}
+
+
+def archive_path(archive_dir, table, month):
+    return os.path.join(archive_dir, f"{table}-{month}.ndjson.gz")
+
+
+def ensure_summary_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS archived_summary (
+            user_id INTEGER,
+            source TEXT,
+            month TEXT,
+            rows INTEGER,
+            total REAL,
+            PRIMARY KEY (user_id, source, month)
+        ) WITHOUT ROWID
+    ''')
+
+
+def archive_table(conn, table, cutoff, archive_dir, batch_size=BATCH_SIZE):
+    """Перенос строк таблицы старше cutoff пачками; возвращает число перенесенных строк"""
+    key, total_column, condition = ARCHIVED_TABLES[table]
+    moved = 0
+    while True:
+        cursor = conn.execute(
+            f'SELECT * FROM {table} WHERE created_at < ?{condition} ORDER BY {key} LIMIT ?',
+            (cutoff, batch_size))
+        columns = [c[0] for c in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        if not rows:
+            return moved
+
+        # Сначала данные попадают на диск, затем удаляются из базы.
+        # При сбое между шагами строка окажется в архиве дважды — read_archive убирает дубли по ключу
+        by_month = {}
+        for row in rows:
+            by_month.setdefault(row['created_at'][:7], []).append(row)
+        for month, month_rows in by_month.items():
+            # Режим 'ab' добавляет новый gzip-член: файл остается читаемым целиком
+            with gzip.open(archive_path(archive_dir, table, month), 'ab') as f:
+                f.write(''.join(json.dumps(row, ensure_ascii=False, default=str) + '\n'
+                                for row in month_rows).encode('utf-8'))
+                f.flush()
+                os.fsync(f.fileno())
+
+        summary = {}
+        for row in rows:
+            item = summary.setdefault((row['user_id'], row['created_at'][:7]), [0, 0.0])
+            item[0] += 1
+            item[1] += row[total_column] or 0
+        with conn:
+            conn.executemany(
+                'INSERT INTO archived_summary (user_id, source, month, rows, total) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (user_id, source, month) DO UPDATE SET '
+                'rows = rows + excluded.rows, total = total + excluded.total',
+                [(user_id, table, month, count, total) for (user_id, month), (count, total) in summary.items()])
+            conn.executemany(f'DELETE FROM {table} WHERE {key} = ?', [(row[key],) for row in rows])
+        moved += len(rows)
+
+
+def archive_old_rows(db_name, archive_dir=ARCHIVE_DIR, retention_days=RETENTION_DAYS,
+                     batch_size=BATCH_SIZE, vacuum=False):
+    """Архивация всех таблиц журнала; {таблица: перенесено строк}"""
+    os.makedirs(archive_dir, exist_ok=True)
+    # created_at пишется через CURRENT_TIMESTAMP, то есть в UTC
+    cutoff = (datetime.utcnow() - timedelta(days=retention_days)).strftime('%Y-%m-%d %H:%M:%S')
+    conn = sqlite3.connect(db_name)
+    try:
+        with conn:
+            ensure_summary_table(conn)
+        result = {table: archive_table(conn, table, cutoff, archive_dir, batch_size) for table in ARCHIVED_TABLES}
+        if vacuum and any(result.values()):
+            # Возвращает освободившиеся страницы ОС; блокирует запись, поэтому по запросу
+            conn.execute('VACUUM')
+    finally:
+        conn.close()
+    logger.info(f"Archived rows older than {cutoff}: {result}")
+    return result
+
+
+def read_archive(source, archive_dir=ARCHIVE_DIR, user_id=None, start=None, end=None):
+    """Строки архива таблицы source (по возрастанию месяцев), с фильтром по пользователю и датам.
+
+    start/end — строки 'YYYY-MM-DD[ HH:MM:SS]', end не включается"""
+    key = ARCHIVED_TABLES[source][0]
+    for path in sorted(glob.glob(os.path.join(archive_dir, f"{source}-*.ndjson.gz"))):
+        month = path[-len('YYYY-MM.ndjson.gz'):-len('.ndjson.gz')]
+        if (start and month < start[:7]) or (end and month > end[:7]):
+            continue
+        seen = set()
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                row = json.loads(line)
+                if row[key] in seen:
+                    continue
+                seen.add(row[key])
+                if user_id is not None and row['user_id'] != user_id:
+                    continue
+                if (start and row['created_at'] < start) or (end and row['created_at'] >= end):
+                    continue
+                yield row
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Архивация старых строк журнала GeoHunter")
+    parser.add_argument('--db', default=os.getenv('DB_NAME', 'geohunter.db'))
+    parser.add_argument('--dir', default=ARCHIVE_DIR)
+    parser.add_argument('--days', type=int, default=RETENTION_DAYS, help="срок хранения в базе")
+    parser.add_argument('--vacuum', action='store_true', help="сжать файл базы после переноса")
+    parser.add_argument('--read', choices=sorted(ARCHIVED_TABLES), help="вывести строки архива")
+    parser.add_argument('--user', type=int)
+    parser.add_argument('--start')
+    parser.add_argument('--end')
+    args = parser.parse_args(argv)
+
+    if args.read:
+        for row in read_archive(args.read, args.dir, args.user, args.start, args.end):
+            print(json.dumps(row, ensure_ascii=False))
+        return 0
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    result = archive_old_rows(args.db, args.dir, args.days, vacuum=args.vacuum)
+    for table, moved in result.items():
+        print(f"{table}: {moved}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,262 @@
+# benchmarks.py
+# Микробенчмарки горячих путей игры и хранилища с сохраненным базовым уровнем.
+#
+# Пример:
+#   python benchmarks.py                    # сравнить с benchmarks_baseline.json
+#   python benchmarks.py --save-baseline    # записать новый базовый уровень
+#   python benchmarks.py -k database        # только кейсы, содержащие подстроку
+import os
+import sys
+import json
+import time
+import atexit
+import shutil
+import logging
+import argparse
+import tempfile
+import statistics
+from types import SimpleNamespace
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks_baseline.json')
+DEFAULT_THRESHOLD = 1.5   # Допустимое замедление относительно базового уровня
+DEFAULT_ROUNDS = 7
+MIN_ROUND_TIME = 0.05     # Минимальная длительность одного раунда, с
+
+CENTER = (55.7558, 37.6173)
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Регистрация кейса: фабрика setup() возвращает функцию для замера"""
+    def decorator(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return decorator
+
+
+def measure(func, rounds=DEFAULT_ROUNDS):
+    """Медианное время одного вызова: число повторов подбирается, как в timeit.autorange"""
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= MIN_ROUND_TIME:
+            break
+        loops *= 2 if elapsed * 10 > MIN_ROUND_TIME else 10
+
+    timings = [elapsed / loops]
+    for _ in range(rounds - 1):
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        timings.append((time.perf_counter() - started) / loops)
+    return statistics.median(timings)
+
+
+# ========== ИГРА ==========
+def _draft():
+    import draft
+    return draft
+
+
+@benchmark('game.generate_geospots')
+def bench_generate_geospots():
+    draft = _draft()
+    game = draft.GeoGame(1, *CENTER, 'standard')
+    return game.generate_geospots
+
+
+@benchmark('game.check_proximity')
+def bench_check_proximity():
+    draft = _draft()
+    game = draft.GeoGame(1, *CENTER, 'standard')
+    position = (CENTER[0] + 0.0001, CENTER[1] + 0.0001)
+    return lambda: game.check_proximity(position)
+
+
+@benchmark('game.generate_prize_amount')
+def bench_generate_prize_amount():
+    draft = _draft()
+    game = draft.GeoGame(1, *CENTER, 'premium')
+    return game.generate_prize_amount
+
+
+@benchmark('bot.build_location_message')
+def bench_build_location_message():
+    draft = _draft()
+    game = draft.GeoGame(1, *CENTER, 'standard')
+    return lambda: draft.build_location_message(game, CENTER[0], CENTER[1], "updated")
+
+
+@benchmark('trajectory.check')
+def bench_trajectory_check():
+    import trajectory
+    guard = trajectory.TrajectoryGuard()
+    players = 1000
+    state = {'tick': 0}
+
+    # Игроки по кругу идут на север со скоростью пешехода
+    def step():
+        tick = state['tick'] = state['tick'] + 1
+        guard.check(tick % players, CENTER[0] + (tick // players) * 1e-5, CENTER[1], tick // players)
+    return step
+
+
+@benchmark('trajectory.verify_track')
+def bench_verify_track():
+    import trajectory
+    # Час ходьбы зигзагом с точкой каждые 3 с и пять находок на треке
+    points = 1200
+    flat = [round(CENTER[0] * trajectory.TRACK_SCALE), round(CENTER[1] * trajectory.TRACK_SCALE), 0]
+    for i in range(1, points):
+        flat += [3 if i % 40 < 20 else -3, 2, 3]
+    lat = lon = 0
+    spots = []
+    for i in range(points):
+        lat, lon = lat + flat[3 * i], lon + flat[3 * i + 1]
+        if i % 240 == 239:
+            spots.append((lat / trajectory.TRACK_SCALE, lon / trajectory.TRACK_SCALE))
+    return lambda: trajectory.verify_track(flat, spots, max_radius=5000)
+
+
+@benchmark('webapp.decode_payload')
+def bench_decode_payload():
+    import webapp_payload
+    # Результат игры с 5 метками и треком из 400 точек в компактном формате
+    data = {'type': 'game_result', 'mode': 'standard', 'entry_fee': 5, 'prize_won': 10,
+            'found_geospots': [{'has_prize': i == 0, 'prize_amount': 10 if i == 0 else 0,
+                                'lat': CENTER[0] + i * 1e-4, 'lon': CENTER[1]} for i in range(5)],
+            'track': [round(CENTER[0] * 1e5), round(CENTER[1] * 1e5), 0] + [3, -2, 4] * 399}
+    raw = webapp_payload.encode_payload(data)
+    return lambda: webapp_payload.decode_payload(raw)
+
+
+# ========== ХРАНИЛИЩЕ ==========
+def _database():
+    from database import Database
+    directory = tempfile.mkdtemp(prefix='geohunter-bench-')
+    atexit.register(shutil.rmtree, directory, True)
+    db = Database(os.path.join(directory, 'bench.db'))
+    user = SimpleNamespace(id=1, username='bench', first_name='Bench', last_name='User')
+    db.create_user(user)
+    return db, user
+
+
+@benchmark('database.init_db')
+def bench_init_db():
+    db, _ = _database()
+    return db.init_db
+
+
+@benchmark('database.get_user')
+def bench_get_user():
+    db, user = _database()
+    return lambda: db.get_user(user.id)
+
+
+@benchmark('database.fetch_user')
+def bench_fetch_user():
+    db, user = _database()
+    return lambda: db.fetch_user(user.id)
+
+
+@benchmark('database.create_user')
+def bench_create_user():
+    db, user = _database()
+    return lambda: db.create_user(user)
+
+
+@benchmark('database.update_balance')
+def bench_update_balance():
+    db, user = _database()
+    return lambda: db.update_balance(user.id, 1.0)
+
+
+@benchmark('database.get_balance')
+def bench_get_balance():
+    db, user = _database()
+    return lambda: db.get_balance(user.id)
+
+
+@benchmark('database.create_game')
+def bench_create_game():
+    db, user = _database()
+    return lambda: db.create_game(user.id, 'standard', 5)
+
+
+@benchmark('database.update_game_result')
+def bench_update_game_result():
+    db, user = _database()
+    game_id = db.create_game(user.id, 'standard', 5)
+    return lambda: db.update_game_result(game_id, 10)
+
+
+@benchmark('database.add_transaction')
+def bench_add_transaction():
+    db, user = _database()
+    return lambda: db.add_transaction(user.id, 10, 'deposit', 'completed', 'demo', 'bench')
+
+
+@benchmark('database.add_found_geospot')
+def bench_add_found_geospot():
+    db, user = _database()
+    game_id = db.create_game(user.id, 'standard', 5)
+    return lambda: db.add_found_geospot(game_id, user.id, True, 5)
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Микробенчмарки GeoHunter")
+    parser.add_argument('-k', dest='keyword', default='', help="фильтр по имени кейса")
+    parser.add_argument('--rounds', type=int, default=DEFAULT_ROUNDS)
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="допустимое отношение к базовому уровню")
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true')
+    args = parser.parse_args(argv)
+
+    # Логирование горячих путей искажает замеры
+    logging.disable(logging.INFO)
+
+    baseline = load_baseline(args.baseline)
+    results = {}
+    regressions = []
+    for name, setup in BENCHMARKS.items():
+        if args.keyword not in name:
+            continue
+        seconds = measure(setup(), args.rounds)
+        results[name] = seconds
+        line = f"{name:<32} {seconds * 1e6:>10.2f} мкс"
+        reference = baseline.get(name)
+        if reference:
+            ratio = seconds / reference
+            line += f"   x{ratio:.2f} к базовому"
+            if ratio > args.threshold:
+                line += "  РЕГРЕССИЯ"
+                regressions.append(name)
+        print(line)
+
+    if args.save_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Базовый уровень сохранен: {args.baseline}")
+        return 0
+
+    if regressions:
+        print(f"Регрессии (порог x{args.threshold}): {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
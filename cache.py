@@ -0,0 +1,77 @@
+# cache.py
+# LRU-кэш с ограничением размера и временем жизни записей
+import time
+import threading
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class LRUCache:
+    def __init__(self, maxsize=10_000, ttl=60.0, on_lookup=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_lookup = on_lookup  # Колбэк (hit: bool) для метрик
+        self.entries = OrderedDict()  # ключ -> (срок годности, значение)
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0  # Растет при каждой записи/инвалидации
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return self.get(key, record=False) is not MISSING
+
+    def get(self, key, record=True):
+        """Значение или MISSING; просроченная запись удаляется"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self.entries[key]
+                entry = None
+            if entry is not None:
+                self.entries.move_to_end(key)
+            if record:
+                if entry is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+        if record and self.on_lookup is not None:
+            self.on_lookup(entry is not None)
+        return MISSING if entry is None else entry[1]
+
+    def put(self, key, value, generation=None):
+        """Сохранить значение; с generation — только если с начала чтения не было записей"""
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def update(self, key, func):
+        """Изменить значение на месте (без продления срока); False — записи нет"""
+        with self.lock:
+            self.generation += 1
+            entry = self.entries.get(key)
+            if entry is None:
+                return False
+            self.entries[key] = (entry[0], func(entry[1]))
+            return True
+
+    def invalidate(self, key):
+        with self.lock:
+            self.generation += 1
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    @property
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
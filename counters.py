@@ -0,0 +1,259 @@
+# counters.py
+# Счетчики с окнами для лимитов ответственной игры и ограничения частоты запросов:
+# проверки отвечают из памяти за O(1), изменения пакетно сохраняются в SQLite
+import time
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+FIXED = 'fixed'        # Календарное окно (день начинается в локальную полночь)
+SLIDING = 'sliding'    # Скользящее окно: текущее + взвешенное предыдущее
+COOLDOWN = 'cooldown'  # Запрет до момента времени (перерыв после лимита)
+
+FLUSH_INTERVAL = 5.0   # Период сохранения изменений, с
+FLUSH_BATCH = 500      # Досрочное сохранение при таком числе изменений
+
+
+class Window:
+    def __init__(self, name, seconds, kind=FIXED, persist=True):
+        self.name = name
+        self.seconds = seconds
+        self.kind = kind
+        self.persist = persist  # Короткие лимиты частоты не сохраняются
+
+    def position(self, now):
+        """Номер окна и доля прошедшего в нем времени"""
+        offset = time.localtime(now).tm_gmtoff if self.kind == FIXED else 0
+        index, elapsed = divmod(now + offset, self.seconds)
+        return int(index), elapsed / self.seconds
+
+
+class CounterEngine:
+    """Счетчики по (окно, user_id); запись хранится как [номер окна, значение, предыдущее]"""
+
+    def __init__(self, flush_interval=FLUSH_INTERVAL, batch_size=FLUSH_BATCH):
+        self.windows = {}
+        self.entries = {}
+        self.dirty = set()
+        self.deleted = set()
+        self.lock = threading.Lock()
+        self.db_lock = threading.Lock()
+        self.db_path = None
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._wakeup = threading.Event()
+        self._thread = None
+        # Свертка закончившихся окон: суммы по имени счетчика за время работы процесса
+        self.rollup = {}
+        self.rolled = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def define(self, name, seconds, kind=FIXED, persist=True):
+        self.windows[name] = Window(name, seconds, kind, persist)
+
+    def _current(self, window, user_id, now):
+        """Запись с учетом смены окна (вызывается под блокировкой)"""
+        entry = self.entries.get((window.name, user_id))
+        if entry is None:
+            return None
+        index, _ = window.position(now)
+        if entry[0] != index:
+            self._fold(window, entry)
+            # Окно сменилось: текущее значение становится предыдущим, если окна соседние
+            entry[2] = entry[1] if entry[0] == index - 1 else 0
+            entry[1] = 0
+            entry[0] = index
+        return entry
+
+    def _value(self, window, entry, now):
+        if entry is None:
+            return 0
+        if window.kind == SLIDING:
+            _, elapsed = window.position(now)
+            return entry[1] + entry[2] * (1.0 - elapsed)
+        return entry[1]
+
+    def value(self, name, user_id, now=None):
+        """Значение в текущем окне (для скользящего — приближенное)"""
+        now = now or time.time()
+        window = self.windows[name]
+        with self.lock:
+            return self._value(window, self._current(window, user_id, now), now)
+
+    def incr(self, name, user_id, amount=1, now=None):
+        now = now or time.time()
+        window = self.windows[name]
+        with self.lock:
+            entry = self._current(window, user_id, now)
+            if entry is None:
+                entry = self.entries[(name, user_id)] = [window.position(now)[0], 0, 0]
+            entry[1] += amount
+            self._mark(window, user_id)
+            return self._value(window, entry, now)
+
+    def allow(self, name, user_id, limit, amount=1, now=None):
+        """Атомарная проверка лимита с учетом amount; при успехе значение увеличивается"""
+        now = now or time.time()
+        window = self.windows[name]
+        with self.lock:
+            entry = self._current(window, user_id, now)
+            if self._value(window, entry, now) + amount > limit:
+                return False
+            if entry is None:
+                entry = self.entries[(name, user_id)] = [window.position(now)[0], 0, 0]
+            entry[1] += amount
+            self._mark(window, user_id)
+            return True
+
+    def start_cooldown(self, name, user_id, now=None):
+        """Запрет на window.seconds от текущего момента"""
+        now = now or time.time()
+        window = self.windows[name]
+        with self.lock:
+            self.entries[(name, user_id)] = [now + window.seconds, 1, 0]
+            self._mark(window, user_id)
+
+    def cooldown_left(self, name, user_id, now=None):
+        """Сколько секунд осталось до конца запрета (0 — запрета нет)"""
+        entry = self.entries.get((name, user_id))
+        if entry is None:
+            return 0
+        return max(0.0, entry[0] - (now or time.time()))
+
+    def _mark(self, window, user_id):
+        if not window.persist:
+            return
+        key = (window.name, user_id)
+        self.dirty.add(key)
+        self.deleted.discard(key)
+        if len(self.dirty) >= self.batch_size:
+            self._wakeup.set()
+
+    def _fold(self, window, entry):
+        """Значение закончившегося окна уходит в свертку (вызывается под блокировкой)"""
+        if window.kind == COOLDOWN or not window.persist:
+            return
+        self.rollup[window.name] = self.rollup.get(window.name, 0) + entry[1]
+        self.rolled += 1
+
+    def totals(self):
+        """Суммы за все время работы: свертка плюс еще не свернутые значения записей"""
+        with self.lock:
+            totals = dict(self.rollup)
+            for (name, _), entry in self.entries.items():
+                window = self.windows[name]
+                if window.kind != COOLDOWN and window.persist:
+                    totals[name] = totals.get(name, 0) + entry[1]
+        return totals
+
+    def _expired(self, window, entry, now):
+        if window.kind == COOLDOWN:
+            return entry[0] <= now
+        index, _ = window.position(now)
+        # Скользящему окну нужно и предыдущее значение
+        return entry[0] < index - (1 if window.kind == SLIDING else 0)
+
+    def evict(self, now=None):
+        """Удаление записей, окна которых закончились"""
+        now = now or time.time()
+        with self.lock:
+            expired = [key for key, entry in self.entries.items()
+                       if self._expired(self.windows[key[0]], entry, now)]
+            for key in expired:
+                self._fold(self.windows[key[0]], self.entries[key])
+                del self.entries[key]
+                self.dirty.discard(key)
+                if self.windows[key[0]].persist:
+                    self.deleted.add(key)
+        return len(expired)
+
+    # ========== СОХРАНЕНИЕ ==========
+    def open(self, db_path):
+        """Подключение к SQLite: загрузка действующих записей и запуск фонового сохранения"""
+        self.db_path = db_path
+        conn = sqlite3.connect(db_path)
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS counters (
+                    name TEXT,
+                    user_id INTEGER,
+                    window INTEGER,
+                    value REAL,
+                    previous REAL,
+                    PRIMARY KEY (name, user_id)
+                )
+            ''')
+            conn.commit()
+            rows = conn.execute('SELECT name, user_id, window, value, previous FROM counters').fetchall()
+        finally:
+            conn.close()
+
+        now = time.time()
+        loaded = 0
+        with self.lock:
+            for name, user_id, window_index, value, previous in rows:
+                window = self.windows.get(name)
+                if window is None:
+                    continue
+                entry = [window_index, value, previous]
+                if self._expired(window, entry, now):
+                    self._fold(window, entry)
+                    self.deleted.add((name, user_id))
+                    continue
+                self.entries[(name, user_id)] = entry
+                loaded += 1
+        logger.info(f"Loaded {loaded} counters from {db_path}")
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='counters-flush', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while self.db_path is not None:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                logger.error(f"Error flushing counters: {e}")
+
+    def flush(self):
+        """Запись накопленных изменений одной транзакцией"""
+        if self.db_path is None:
+            return 0
+        with self.db_lock:
+            with self.lock:
+                rows = [(name, user_id, *self.entries[(name, user_id)]) for name, user_id in self.dirty]
+                deleted = list(self.deleted)
+                self.dirty.clear()
+                self.deleted.clear()
+            if not rows and not deleted:
+                return 0
+            conn = sqlite3.connect(self.db_path)
+            try:
+                with conn:
+                    conn.executemany('DELETE FROM counters WHERE name = ? AND user_id = ?', deleted)
+                    conn.executemany('INSERT OR REPLACE INTO counters (name, user_id, window, value, previous) '
+                                     'VALUES (?, ?, ?, ?, ?)', rows)
+            except sqlite3.Error:
+                # Вернем изменения в очередь до следующей попытки
+                with self.lock:
+                    self.dirty.update(row[:2] for row in rows if row[:2] in self.entries)
+                    self.deleted.update(key for key in deleted if key not in self.entries)
+                raise
+            finally:
+                conn.close()
+        return len(rows) + len(deleted)
+
+    def close(self):
+        """Остановка фонового сохранения с финальной записью"""
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self.flush()
+            self.db_path = None
+            self._wakeup.set()
+            thread.join()
@@ -1,18 +1,58 @@
 # database.py
 import sqlite3
 import logging
+import threading
 from datetime import datetime
 
+import metrics
+from cache import LRUCache, MISSING
+
 logger = logging.getLogger(__name__)
 
+# Кэш пользователей (вместе с балансом)
+USER_CACHE_SIZE = 10_000
+USER_CACHE_TTL = 60  # секунд; ограничивает расхождение с изменениями из других процессов
+
+USER_COLUMNS = ('user_id', 'username', 'first_name', 'last_name', 'balance', 'language', 'created_at')
+
+# Страницы истории: (таблица, ключ, выбираемые колонки)
+HISTORY_QUERIES = {
+    'transactions': ('transactions', 'transaction_id', ('transaction_id', 'amount', 'type', 'status', 'provider', 'created_at')),
+    'games': ('games', 'game_id', ('game_id', 'mode', 'entry_fee', 'prize_won', 'status', 'created_at')),
+}
+HISTORY_MAX_LIMIT = 100
+
+# Фоновая запись транзакций: период и досрочная запись по размеру пачки
+TRANSACTION_FLUSH_INTERVAL = 1.0
+TRANSACTION_FLUSH_BATCH = 200
+
+# Версия схемы (PRAGMA user_version): увеличивать при изменении таблиц и индексов в init_db
+SCHEMA_VERSION = 2
+
+
+def make_cursor(created_at, row_id):
+    """Курсор страницы: время и id последней строки"""
+    return f"{created_at}|{row_id}"
+
+
+def parse_cursor(cursor):
+    created_at, _, row_id = cursor.rpartition('|')
+    return created_at, int(row_id)
+
 class Database:
-    def __init__(self, db_name='geohunter.db'):
+    def __init__(self, db_name='geohunter.db', cache_size=USER_CACHE_SIZE, cache_ttl=USER_CACHE_TTL):
         self.db_name = db_name
+        self.user_cache = LRUCache(cache_size, cache_ttl, on_lookup=metrics.record_cache_lookup)
         self.init_db()
 
+    @metrics.timed_query
     def init_db(self):
         """Инициализация таблиц базы данных"""
         conn = sqlite3.connect(self.db_name)
+        # Схема уже актуальна — при старте обходимся одним чтением заголовка базы
+        if conn.execute('PRAGMA user_version').fetchone()[0] >= SCHEMA_VERSION:
+            conn.close()
+            return
         cursor = conn.cursor()
         
         # Таблица пользователей
@@ -71,70 +111,109 @@ class Database:
             )
         ''')
         
+        # Индексы под постраничную историю: стоимость страницы не зависит от ее номера
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_user_created '
+                       'ON transactions (user_id, created_at, transaction_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_games_user_created '
+                       'ON games (user_id, created_at, game_id)')
+        cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        
         conn.commit()
         conn.close()
         
     def get_user(self, user_id):
-        """Получить пользователя по ID"""
+        """Получить пользователя по ID (через кэш)"""
+        user = self.user_cache.get(user_id)
+        if user is MISSING:
+            generation = self.user_cache.generation
+            user = self.fetch_user(user_id)
+            if user is None:
+                return None
+            self.user_cache.put(user_id, user, generation)
+        return dict(user)
+        
+    @metrics.timed_query
+    def fetch_user(self, user_id):
+        """Получить пользователя из базы, минуя кэш"""
         conn = sqlite3.connect(self.db_name)
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
         user = cursor.fetchone()
         conn.close()
-        
-        if user:
-            return {
-                'user_id': user[0],
-                'username': user[1],
-                'first_name': user[2],
-                'last_name': user[3],
-                'balance': user[4],
-                'language': user[5],
-                'created_at': user[6]
-            }
-        return None
+        return dict(zip(USER_COLUMNS, user)) if user else None
         
     def create_user(self, user_data):
-        """Создать нового пользователя"""
+        """Создать нового пользователя (известного по кэшу — без обращения к базе)"""
+        if user_data.id in self.user_cache:
+            return
+        generation = self.user_cache.generation
+        user = self.insert_user(user_data)
+        self.user_cache.put(user_data.id, user, generation)
+        
+    @metrics.timed_query
+    def insert_user(self, user_data):
+        """INSERT OR IGNORE пользователя; возвращает строку из базы"""
         conn = sqlite3.connect(self.db_name)
         cursor = conn.cursor()
         cursor.execute('''
             INSERT OR IGNORE INTO users (user_id, username, first_name, last_name)
             VALUES (?, ?, ?, ?)
         ''', (user_data.id, user_data.username, user_data.first_name, user_data.last_name))
+        cursor.execute('SELECT * FROM users WHERE user_id = ?', (user_data.id,))
+        user = cursor.fetchone()
         conn.commit()
         conn.close()
+        return dict(zip(USER_COLUMNS, user))
         
+    @metrics.timed_query
     def update_balance(self, user_id, amount):
-        """Обновить баланс пользователя"""
+        """Обновить баланс пользователя; кэш получает значение из той же команды"""
         conn = sqlite3.connect(self.db_name)
         cursor = conn.cursor()
-        cursor.execute('UPDATE users SET balance = balance + ? WHERE user_id = ?', (amount, user_id))
+        cursor.execute('UPDATE users SET balance = balance + ? WHERE user_id = ? RETURNING balance', (amount, user_id))
+        row = cursor.fetchone()
         conn.commit()
         conn.close()
         
+        if row is None:
+            self.user_cache.invalidate(user_id)
+            return None
+        balance = float(row[0])
+        self.user_cache.update(user_id, lambda user: {**user, 'balance': balance})
+        return balance
+        
+    @metrics.timed_query
+    def set_language(self, user_id, language):
+        """Сохранить выбранный язык (пользователь создается, если его еще нет)"""
+        conn = sqlite3.connect(self.db_name)
+        try:
+            with conn:
+                conn.execute('INSERT INTO users (user_id, language) VALUES (?, ?) '
+                             'ON CONFLICT (user_id) DO UPDATE SET language = excluded.language', (user_id, language))
+        finally:
+            conn.close()
+        self.user_cache.update(user_id, lambda user: {**user, 'language': language})
+        
     def get_balance(self, user_id):
         """Получить баланс пользователя"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute('SELECT balance FROM users WHERE user_id = ?', (user_id,))
-        balance = cursor.fetchone()
-        conn.close()
-        return balance[0] if balance else 0.0
+        user = self.get_user(user_id)
+        return user['balance'] if user else 0.0
         
-    def create_game(self, user_id, mode, entry_fee):
+    @metrics.timed_query
+    def create_game(self, user_id, mode, entry_fee, status='completed'):
         """Создать запись об игре"""
         conn = sqlite3.connect(self.db_name)
         cursor = conn.cursor()
         cursor.execute('''
-            INSERT INTO games (user_id, mode, entry_fee)
-            VALUES (?, ?, ?)
-        ''', (user_id, mode, entry_fee))
+            INSERT INTO games (user_id, mode, entry_fee, status)
+            VALUES (?, ?, ?, ?)
+        ''', (user_id, mode, entry_fee, status))
         game_id = cursor.lastrowid
         conn.commit()
         conn.close()
         return game_id
         
+    @metrics.timed_query
     def update_game_result(self, game_id, prize_won, status='completed'):
         """Обновить результат игры"""
         conn = sqlite3.connect(self.db_name)
@@ -145,6 +224,7 @@ class Database:
         conn.commit()
         conn.close()
         
+    @metrics.timed_query
     def add_transaction(self, user_id, amount, transaction_type, status, provider, provider_transaction_id=None):
         """Добавить транзакцию"""
         conn = sqlite3.connect(self.db_name)
@@ -155,7 +235,46 @@ class Database:
         ''', (user_id, amount, transaction_type, status, provider, provider_transaction_id))
         conn.commit()
         conn.close()
-        
+
+    @metrics.timed_query
+    def complete_pending_transaction(self, transaction_id):
+        """Перевести ожидающую транзакцию в completed и зачислить ее сумму одной транзакцией базы.
+
+        Возвращает (user_id, сумма, новый баланс) или None, если транзакцию уже обработали"""
+        conn = sqlite3.connect(self.db_name)
+        try:
+            with conn:
+                row = conn.execute("UPDATE transactions SET status = 'completed' "
+                                   "WHERE transaction_id = ? AND status = 'pending' RETURNING user_id, amount",
+                                   (transaction_id,)).fetchone()
+                if row is None:
+                    return None
+                user_id, amount = row
+                balance = conn.execute('UPDATE users SET balance = balance + ? WHERE user_id = ? RETURNING balance',
+                                       (amount, user_id)).fetchone()
+        finally:
+            conn.close()
+        if balance is None:
+            self.user_cache.invalidate(user_id)
+            return user_id, amount, None
+        balance = float(balance[0])
+        self.user_cache.update(user_id, lambda user: {**user, 'balance': balance})
+        return user_id, amount, balance
+
+    @metrics.timed_query
+    def add_transactions(self, rows):
+        """Пачка транзакций одной записью: (user_id, amount, type, status, provider, created_at)"""
+        conn = sqlite3.connect(self.db_name)
+        try:
+            with conn:
+                conn.executemany('''
+                    INSERT INTO transactions (user_id, amount, type, status, provider, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', rows)
+        finally:
+            conn.close()
+
+    @metrics.timed_query
     def add_found_geospot(self, game_id, user_id, has_prize, prize_amount):
         """Добавить найденную геотоку"""
         conn = sqlite3.connect(self.db_name)
@@ -165,4 +284,90 @@ class Database:
             VALUES (?, ?, ?, ?)
         ''', (game_id, user_id, has_prize, prize_amount))
         conn.commit()
-        conn.close()
\ No newline at end of file
+        conn.close()
+        
+    @metrics.timed_query
+    def get_history_page(self, user_id, kind='transactions', limit=10, cursor=None):
+        """Страница истории от новых записей к старым по ключу (created_at, id).
+        
+        Возвращает (строки, курсор следующей страницы или None)"""
+        table, key, columns = HISTORY_QUERIES[kind]
+        limit = max(1, min(limit, HISTORY_MAX_LIMIT))
+        query = f'SELECT {", ".join(columns)} FROM {table} WHERE user_id = ?'
+        params = [user_id]
+        if cursor:
+            query += f' AND (created_at, {key}) < (?, ?)'
+            params.extend(parse_cursor(cursor))
+        query += f' ORDER BY created_at DESC, {key} DESC LIMIT ?'
+        # Лишняя строка показывает, есть ли следующая страница
+        params.append(limit + 1)
+        
+        conn = sqlite3.connect(self.db_name)
+        rows = conn.execute(query, params).fetchall()
+        conn.close()
+        
+        page = [dict(zip(columns, row)) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = page[-1]
+            next_cursor = make_cursor(last['created_at'], last[key])
+        return page, next_cursor
+
+
+class TransactionWriter:
+    """Запись транзакций из фонового потока: add() не обращается к базе и не блокирует цикл событий"""
+
+    def __init__(self, db, flush_interval=TRANSACTION_FLUSH_INTERVAL, batch_size=TRANSACTION_FLUSH_BATCH):
+        self.db = db
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.pending = []
+        self.lock = threading.Lock()
+        self.db_lock = threading.Lock()  # Пачки пишутся по очереди: порядок строк сохраняется
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def add(self, user_id, amount, transaction_type, status='completed', provider='internal'):
+        # Время фиксируется при вызове, а не при записи пачки
+        created_at = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        with self.lock:
+            self.pending.append((user_id, amount, transaction_type, status, provider, created_at))
+            size = len(self.pending)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='transactions-flush', daemon=True)
+                self._thread.start()
+        if size >= self.batch_size:
+            self._wakeup.set()
+
+    def _run(self):
+        while self._thread is not None:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                logger.error(f"Error writing transactions: {e}")
+
+    def flush(self):
+        """Записать накопленные транзакции; вызывать перед чтением журнала"""
+        with self.db_lock:
+            with self.lock:
+                rows, self.pending = self.pending, []
+            if not rows:
+                return 0
+            try:
+                self.db.add_transactions(rows)
+            except sqlite3.Error:
+                with self.lock:
+                    self.pending[:0] = rows
+                raise
+        return len(rows)
+
+    def close(self):
+        """Остановка фонового потока с финальной записью"""
+        with self.lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._wakeup.set()
+            thread.join()
+        self.flush()
@@ -1,8 +1,14 @@
+import tracing  # Первым: отсчет времени запуска
 import os
 import random
 import math
 import logging
+import secrets
+import hmac
+import hashlib
 import urllib.parse
+import tempfile
+import io
 import json  # Добавьте этот импорт, если его нет
 from datetime import datetime, date, timedelta
 from dotenv import load_dotenv
@@ -20,230 +26,372 @@ from telegram.ext import (
     CallbackQueryHandler,
     filters
 )
-from geopy.distance import geodesic
+from telegram.request import HTTPXRequest
 
-# Добавляем новые импорты
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from fastapi.middleware.cors import CORSMiddleware
 import asyncio
 import threading
-import uvicorn
+import time
+
+import game_state
+import stats
+import counters
+import trajectory
+import timer_wheel
+import locks
+import jackpot
+import leaderboard
+import archive
+import ledger_export
+from database import Database, TransactionWriter
+import metrics
+import log_events
+import messages
+import periodic
+import webapp_payload
 
 # Загрузка переменных окружения
 load_dotenv()
 TOKEN = os.getenv('BOT_TOKEN')
 ADMIN_ID = os.getenv('ADMIN_ID', '0')
+API_URL = os.getenv('API_URL', '')  # Публичный адрес FastAPI для веб-приложения
+# С API_URL веб-приложение раздает сам FastAPI (/app/), иначе — GitHub Pages
+WEB_APP_URL = os.getenv('WEB_APP_URL') or (f"{API_URL.rstrip('/')}/app/" if API_URL
+                                           else 'https://sevryuk88.github.io/GeoHunter-/geohtml.html')
 
-# Настройка логирования
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
+# Настройка логирования (вывод в фоновом потоке)
+log_events.setup_logging()
 logger = logging.getLogger(__name__)
+events = log_events.EventLogger(logger)
+tracing.startup.mark('imports')
 
 # ========== ЭКОНОМИЧЕСКАЯ СИСТЕМА ==========
-# Параметры режимов
-GAME_MODES = {
-    'economy': {
-        'name': '🟢 Эконом',
-        'entry_fee': 3,
-        'min_prize': 1,
-        'max_prize': 10,
-        'win_probability': 0.12,  # 12%
-        'prize_distribution': {
-            1: 0.60,    # 60% chance
-            3: 0.25,    # 25% chance
-            5: 0.10,    # 10% chance
-            10: 0.05    # 5% chance
-        }
-    },
-    'standard': {
-        'name': '🔵 Стандарт',
-        'entry_fee': 5,
-        'min_prize': 3,
-        'max_prize': 15,
-        'win_probability': 0.18,  # 18%
-        'prize_distribution': {
-            3: 0.50,    # 50% chance
-            5: 0.25,    # 25% chance
-            10: 0.15,   # 15% chance
-            15: 0.10    # 10% chance
-        }
-    },
-    'premium': {
-        'name': '🟣 Премиум',
-        'entry_fee': 7,
-        'min_prize': 5,
-        'max_prize': 20,
-        'win_probability': 0.25,  # 25%
-        'prize_distribution': {
-            5: 0.45,   # 45% chance
-            10: 0.30,  # 30% chance
-            15: 0.15,  # 15% chance
-            20: 0.10   # 10% chance
-        }
-    }
-}
-
-# Общие параметры экономики
-HOUSE_EDGE = 0.12        # Преимущество казино (12%)
-JACKPOT_CONTRIBUTION = 0.02  # Взнос в джекпот (2%)
-JACKPOT_PROBABILITY = 0.0005  # Вероятность выигрыша джекпота (0.05%)
-
-
-WIN_MESSAGES = [
-    "🎉 Ура! Ты нашел геометку с призом! 🎉",
-    "💰 Вот это удача! Геометка принесла тебе {prize} руб.!",
-    "🤑 Нашел клад! Забирай {prize} руб.!",
-    "✨ Бинго! Ты нашел {prize} руб. в геометке!",
-    "💎 Ого! Геометка оказалась с сюрпризом: {prize} руб.!"
-]
-
-EMPTY_MESSAGES = [
-    "🔍 Ты нашел геометку, но она пустая.",
-    "🤷‍♂️ Ничего страшного, эта метка оказалась пустой. Ищи следующую!",
-    "💨 На этот раз не повезло. Метка пустая, но удача уже близко!",
-    "🌫️ Эх, эта геометка пустая. Не сдавайся!",
-    "❌ Пусто... Но в следующий раз обязательно повезет!"
-]
-
-JACKPOT_MESSAGES = [
-    "🎰 🎰 🎰 ДЖЕКПОТ! 🎰 🎰 🎰\n\n💎 ВЫ ВЫИГРАЛИ ГЛАВНЫЙ ПРИЗ: {prize} руб.! 💎",
-    "🔥 НЕВЕРОЯТНО! ДЖЕКПОТ {prize} руб.! 🔥\n\nЭто настоящая удача!",
-    "🏆 ПОБЕДА! Ты сорвал джекпот в {prize} руб.! 🏆\n\nПоздравляем!"
-]
+from game_config import (
+    GAME_MODES,
+    JACKPOT_CONTRIBUTION,
+    JACKPOT_PROBABILITY,
+    JACKPOT_SEED,
+    SPOTS_PER_GAME,
+    DEPOSIT_BONUSES,
+)
 
 # Динамическая экономика
+ECONOMY_EWMA_ALPHA = 0.05   # Вес новой находки в скользящем среднем
+ECONOMY_MIN_SAMPLES = 10    # Сколько находок нужно до начала регулировки
+
 class DynamicEconomy:
-    def __init__(self):
+    def __init__(self, alpha=ECONOMY_EWMA_ALPHA, min_samples=ECONOMY_MIN_SAMPLES):
         self.total_games = 0
         self.total_profit = 0
-        self.win_rate_history = []
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.win_rates = {}   # Экспоненциально сглаженная доля призовых находок по режимам
+        self.samples = {}     # Число находок по режимам
+        self._adjusted = {}   # Кэш: режим -> (базовая вероятность, скорректированная)
+    
+    def record_spot(self, mode, won):
+        """Учет найденной метки за O(1)"""
+        outcome = 1.0 if won else 0.0
+        count = self.samples.get(mode, 0) + 1
+        self.samples[mode] = count
+        if count == 1:
+            self.win_rates[mode] = outcome
+        else:
+            # Пока выборка мала, используем точное среднее, затем EWMA
+            weight = max(self.alpha, 1.0 / count)
+            self.win_rates[mode] += weight * (outcome - self.win_rates[mode])
+        self._adjusted.pop(mode, None)
         
-    def adjust_difficulty(self, base_probability):
+    def adjust_difficulty(self, base_probability, mode=None):
         """Автоматическая регулировка сложности на основе статистики"""
-        if len(self.win_rate_history) < 10:
-            return base_probability
+        cached = self._adjusted.get(mode)
+        if cached is not None and cached[0] == base_probability:
+            return cached[1]
+        
+        result = base_probability
+        if self.samples.get(mode, 0) >= self.min_samples:
+            avg_win_rate = self.win_rates[mode]
             
-        avg_win_rate = sum(self.win_rate_history) / len(self.win_rate_history)
+            # Регулируем сложность
+            if avg_win_rate > base_probability * 1.2:  # Если выигрывают слишком часто
+                result = base_probability * 0.9  # Уменьшаем вероятность
+            elif avg_win_rate < base_probability * 0.8:  # Если выигрывают слишком редко
+                result = base_probability * 1.1  # Увеличиваем вероятность
         
-        # Регулируем сложность
-        if avg_win_rate > base_probability * 1.2:  # Если выигрывают слишком часто
-            return max(base_probability * 0.7, base_probability * 0.9)  # Уменьшаем вероятность
-        elif avg_win_rate < base_probability * 0.8:  # Если выигрывают слишком редко
-            return min(base_probability * 1.3, base_probability * 1.1)  # Увеличиваем вероятность
-        return base_probability
+        self._adjusted[mode] = (base_probability, result)
+        return result
 
-# Джекпот система
-JACKPOT_POOL = 100  # Начальный джекпот
+# Джекпот система (хранится в SQLite, читается из кэша)
+jackpot_pool = jackpot.JackpotPool(JACKPOT_SEED)
 
 
 # новые 
 # ========== FASTAPI ИНТЕГРАЦИЯ ==========
-# Создаем FastAPI приложение поверх существующего бота
-app = FastAPI()
-
-# Настройка CORS для фронтенда
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
 # WebSocket менеджер для real-time обновлений
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: dict[int, WebSocket] = {}
+        self.active_connections = {}  # user_id -> WebSocket
+        self.binary_connections: set[int] = set()
+        self.loop = None  # Цикл событий FastAPI-потока
 
-    async def connect(self, websocket: WebSocket, user_id: int):
+    async def connect(self, websocket, user_id: int, binary: bool = False):
         await websocket.accept()
+        self.loop = asyncio.get_running_loop()
         self.active_connections[user_id] = websocket
+        if binary:
+            self.binary_connections.add(user_id)
+        else:
+            self.binary_connections.discard(user_id)
 
     def disconnect(self, user_id: int):
         if user_id in self.active_connections:
             del self.active_connections[user_id]
+        self.binary_connections.discard(user_id)
+
+    def push(self, message: dict, user_id: int):
+        """Отправка из синхронного кода любого потока: без ожидания, в цикле FastAPI"""
+        if self.loop is None or self.loop.is_closed() or user_id not in self.active_connections:
+            return
+        asyncio.run_coroutine_threadsafe(self.send_personal_message(message, user_id), self.loop)
 
     async def send_personal_message(self, message: dict, user_id: int):
+        # Вызовы из потока бота переносим в цикл событий FastAPI
+        if self.loop is not None and asyncio.get_running_loop() is not self.loop:
+            future = asyncio.run_coroutine_threadsafe(self.send_personal_message(message, user_id), self.loop)
+            await asyncio.wrap_future(future)
+            return
         if user_id in self.active_connections:
             try:
-                await self.active_connections[user_id].send_json(message)
+                websocket = self.active_connections[user_id]
+                binary = user_id in self.binary_connections
+                body, _ = game_state.encode(message, binary=binary)
+                if binary:
+                    await websocket.send_bytes(body)
+                else:
+                    await websocket.send_text(body.decode('utf-8'))
             except Exception as e:
                 logger.error(f"Error sending message to {user_id}: {e}")
                 self.disconnect(user_id)
 
 manager = ConnectionManager()
 
-# API эндпоинты
-@app.get("/api/game/{user_id}")
-async def get_game_data(user_id: int):
-    if user_id not in games:
-        return {"error": "Game not found"}
-    
-    game = games[user_id]
-    return {
-        "center": game.center,
-        "radius": SEARCH_RADIUS,
-        "geospots": game.geospots,
-        "found_spots": game.found_spots,
-        "mode": game.game_mode,
-        "balance": user_balances.get(user_id, 0)
-    }
-
-@app.post("/api/check_location")
-async def check_location(data: dict):
-    user_id = data.get("user_id")
-    coords = data.get("coords")
-    
-    if user_id not in games:
-        return {"error": "Game not found"}
-    
-    game = games[user_id]
-    proximity_results = game.check_proximity(coords)
+# Исходящие запросы к Bot API с замером латентности и числа запросов в полете
+class InstrumentedRequest(HTTPXRequest):
+    inflight = 0
+
+    async def do_request(self, url, method, request_data=None, *args, **kwargs):
+        api_method = url.rsplit('/', 1)[-1]
+        InstrumentedRequest.inflight += 1
+        try:
+            with metrics.BOT_API_LATENCY.time(api_method):
+                return await super().do_request(url, method, request_data, *args, **kwargs)
+        finally:
+            InstrumentedRequest.inflight -= 1
+
+def create_app():
+    """FastAPI-приложение поверх бота; fastapi импортируется только при первом обращении"""
+    from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request, Response
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.responses import StreamingResponse
+    
+    app = FastAPI()
+    
+    # Настройка CORS для фронтенда
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
     
-    for result in proximity_results:
-        if result['is_close']:
-            spot = result['spot']
-            if not spot['found']:
-                spot['found'] = True
-                game.found_spots.append(spot)
-                
-                prize = 0
-                if spot['has_prize']:
-                    prize = spot['prize_amount']
-                    user_balances[user_id] += prize
-                    log_transaction(user_id, prize, "prize_won")
-                
-                # Отправляем уведомление через WebSocket
-                await manager.send_personal_message({
-                    "type": "spot_found",
-                    "spot_index": game.geospots.index(spot),
-                    "prize": prize,
-                    "balance": user_balances.get(user_id, 0)
-                }, user_id)
-                
-                return {
-                    "found": True,
-                    "spot_index": game.geospots.index(spot),
-                    "prize": prize
-                }
+    @app.get("/metrics")
+    async def metrics_endpoint():
+        return Response(content=metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+    # Веб-приложение: собирается один раз при создании приложения
+    import web_assets
+    assets = web_assets.WebAssets()
+    logger.info(f"Web app assets: {', '.join(assets.files)}")
+
+    @app.get("/app/{name:path}")
+    async def web_app(name: str, request: Request):
+        asset = assets.get(name)
+        if asset is None:
+            return Response(status_code=404)
+        status, body, headers = assets.respond(asset, request.headers.get("accept-encoding", ""),
+                                               request.headers.get("if-none-match", ""))
+        return Response(content=body, status_code=status, headers=headers)
+
+    # API эндпоинты
+    @app.get("/api/game/{token}")
+    async def get_game_data(token: str, request: Request, since: int = None, fmt: str = None):
+        """Состояние игры по токену сессии: полный снимок или дельты после версии since.
+        
+        Снимок не содержит призов: клиент узнает приз только из дельты найденной метки"""
+        game = get_game_by_token(token)
+        if game is None:
+            return {"error": "Game not found"}
+    
+        balance = user_balances.get(game.user_id, 0)
+        etag = game_state.make_etag(game.state.version, balance)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    
+        # Ничего не изменилось — отдаем 304 без тела
+        if game_state.etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+    
+        deltas = game.state.since(since) if since is not None else None
+        if deltas is not None:
+            payload = {"v": game.state.version, "d": deltas, "b": balance}
+        else:
+            payload = {
+                "version": game.state.version,
+                "center": game.center,
+                "radius": game.mode_config['search_radius'],
+                "spots": game.public_spots(),
+                "mode": game.game_mode,
+                "balance": balance
+            }
+    
+        binary = game_state.wants_msgpack(request.headers.get("accept"), fmt)
+        body, media_type = game_state.encode(payload, binary=binary)
+        return Response(content=body, media_type=media_type, headers=headers)
+
+    @app.get("/api/state/{token}")
+    async def get_game_state_by_token(token: str, request: Request):
+        """Публичное состояние игры по токену сессии (без информации о призах)"""
+        game = get_game_by_token(token)
+        if game is None:
+            return Response(status_code=404)
+    
+        etag = game_state.make_etag(game.state.version, 0)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if game_state.etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+    
+        return Response(content=game.public_payload(), media_type=game_state.JSON_MEDIA_TYPE, headers=headers)
+
+    @app.post("/api/check_location")
+    async def check_location(data: dict):
+        coords = data.get("coords")
+    
+        # Игра определяется только токеном сессии: user_id из запроса не принимается
+        game = get_game_by_token(data.get("token") or "")
+        if game is None:
+            return {"error": "Game not found"}
+        user_id = game.user_id
+    
+        if rate_limited('check_location', user_id):
+            return Response(status_code=429, headers={"Retry-After": str(RATE_LIMITS['check_location'][1])})
+    
+        claimed = claim_nearby_spot(game, coords)
+        if claimed is None:
+            return {"found": False}
+        spot_index, (prize, _, delta) = claimed
+    
+        # Отправляем дельту через WebSocket
+        leaderboards.record(user_id, winnings=prize, spots=1)
+        await manager.send_personal_message(delta, user_id)
     
-    return {"found": False}
+        return {
+            "found": True,
+            "spot_index": spot_index,
+            "prize": prize,
+            "v": game.state.version
+        }
 
-@app.websocket("/ws/{user_id}")
-async def websocket_endpoint(websocket: WebSocket, user_id: int):
-    await manager.connect(websocket, user_id)
-    try:
-        while True:
-            # Поддерживаем соединение
-            await asyncio.sleep(10)
-            await websocket.send_json({"type": "ping"})
-    except WebSocketDisconnect:
-        manager.disconnect(user_id)
-    except Exception as e:
-        logger.error(f"WebSocket error for user {user_id}: {e}")
-        manager.disconnect(user_id)
+    @app.get("/api/leaderboard")
+    async def get_leaderboard(period: str = 'all', metric: str = 'winnings', limit: int = 10):
+        """Рейтинг игроков за период по выигрышам или найденным меткам"""
+        if period not in leaderboard.PERIODS or metric not in leaderboard.METRICS:
+            return Response(status_code=400)
+        limit = max(1, min(limit, LEADERBOARD_MAX_LIMIT))
+        top = leaderboards.top(period, metric, limit)
+        return {
+            "period": period,
+            "metric": metric,
+            "top": [{"place": place, "user_id": user_id, "name": name, "score": score}
+                    for place, user_id, name, score in top]
+        }
+
+    @app.get("/api/history/{user_id}")
+    def get_history(user_id: int, request: Request, kind: str = 'transactions', limit: int = 20,
+                    cursor: str = None, token: str = None):
+        """История транзакций или игр по страницам (синхронный эндпоинт — выполняется в пуле потоков).
+        
+        Доступ — по токену активной игры или по подписанным initData веб-приложения
+        (заголовок X-Telegram-Init-Data) того же пользователя"""
+        game = get_game_by_token(token) if token else None
+        owner = game.user_id if game else verify_init_data(request.headers.get("x-telegram-init-data", ""))
+        if owner != user_id:
+            return Response(status_code=403)
+        if kind not in HISTORY_KINDS.values():
+            return Response(status_code=400)
+        ledger_writer.flush()
+        try:
+            rows, next_cursor = db.get_history_page(user_id, kind, limit, cursor)
+        except ValueError:
+            return Response(status_code=400)
+        return {"items": rows, "next": next_cursor}
+
+    @app.get("/api/export/{table}")
+    def export_ledger(table: str, request: Request, start: str = None, end: str = None, fmt: str = 'csv'):
+        """Потоковая выгрузка журнала за период [start, end) в CSV или NDJSON"""
+        authorization = request.headers.get("authorization", "")
+        if not EXPORT_TOKEN or not secrets.compare_digest(authorization, f"Bearer {EXPORT_TOKEN}"):
+            return Response(status_code=403)
+        if table not in ledger_export.EXPORT_TABLES or fmt not in ledger_export.FORMATS:
+            return Response(status_code=400)
+    
+        filename = f"{table}_{start or 'all'}_{end or 'now'}.{fmt}"
+        return StreamingResponse(
+            ledger_export.stream_export(DB_NAME, table, start, end, fmt),
+            media_type=ledger_export.FORMATS[fmt],
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+
+    @app.websocket("/ws/{token}")
+    async def websocket_endpoint(websocket: WebSocket, token: str, fmt: str = None):
+        """Дельты игры по токену сессии: user_id из адреса не принимается"""
+        game = get_game_by_token(token)
+        if game is None:
+            await websocket.close(code=1008)
+            return
+        user_id = game.user_id
+        binary = game_state.wants_msgpack(fmt=fmt)
+        await manager.connect(websocket, user_id, binary=binary)
+        try:
+            while True:
+                # Поддерживаем соединение, пока игра этого токена активна
+                await asyncio.sleep(10)
+                if get_game_by_token(token) is None:
+                    await websocket.close()
+                    manager.disconnect(user_id)
+                    break
+                await manager.send_personal_message({"e": game_state.EVENT_PING, "j": round(jackpot_pool.amount, 2)}, user_id)
+                if user_id not in manager.active_connections:
+                    break
+        except WebSocketDisconnect:
+            manager.disconnect(user_id)
+        except Exception as e:
+            logger.error(f"WebSocket error for user {user_id}: {e}")
+            manager.disconnect(user_id)
+    
+    return app
+
+_app = None
+
+def get_app():
+    global _app
+    if _app is None:
+        _app = create_app()
+    return _app
+
+def __getattr__(name):
+    # draft.app по-прежнему доступен (uvicorn draft:app, тестовые клиенты)
+    if name == 'app':
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
         
         
         
@@ -251,16 +399,13 @@ async def websocket_endpoint(websocket: WebSocket, user_id: int):
 async def handle_spot_found(user_id: int, spot_index: int, prize: int):
     if user_id in games:
         game = games[user_id]
-        game.geospots[spot_index]['found'] = True
-        game.found_spots.append(game.geospots[spot_index])
+        # Приз уже начислен вызывающим — метка только отмечается
+        claimed = game.claim_spot(spot_index, lambda spot: (prize, None))
+        if claimed is None:
+            return
         
-        # Отправляем обновление через WebSocket
-        await manager.send_personal_message({
-            "type": "spot_found",
-            "spot_index": spot_index,
-            "prize": prize,
-            "balance": user_balances.get(user_id, 0)
-        }, user_id)
+        # Отправляем дельту через WebSocket
+        await manager.send_personal_message(claimed[2], user_id)
 # новые         
         
 
@@ -284,14 +429,51 @@ RESPONSIBLE_GAMING_LIMITS = {
     'cooling_off_period': 24
 }
 
+# Ограничения частоты запросов: (не больше N, за секунд)
+RATE_LIMITS = {
+    'check_location': (10, 1),
+    'deposit': (5, 60),
+}
+STATE_DB = os.getenv('STATE_DB', 'geohunter_state.db')  # Лимиты, джекпот и рейтинги переживают перезапуск
+DB_NAME = os.getenv('DB_NAME', 'geohunter.db')          # История транзакций и игр
+HISTORY_PAGE_SIZE = 10
+ARCHIVE_RETENTION_DAYS = int(os.getenv('ARCHIVE_RETENTION_DAYS', str(archive.RETENTION_DAYS)))
+ARCHIVE_INTERVAL = 24 * 3600  # Старые строки журнала уходят в сжатые архивы раз в сутки
+INIT_DATA_MAX_AGE = 24 * 3600  # Срок годности подписанных initData веб-приложения (сек)
+EXPORT_TOKEN = os.getenv('EXPORT_TOKEN', '')  # Bearer-токен выгрузки журнала (пустой — выгрузка выключена)
+HISTORY_KINDS = {'t': 'transactions', 'g': 'games'}  # Короткие коды для callback_data
+
+# Рейтинги игроков
+LEADERBOARD_MAX_LIMIT = 100
+
+# Ограничения памяти для внутрипроцессной статистики
+USER_IDLE_TTL = 30 * 24 * 3600   # Вытеснение неактивных пользователей (сек)
+STATS_SWEEP_INTERVAL = 3600      # Период обслуживания статистики (сек)
+
 # ========== БАЗЫ ДАННЫХ ==========
 games = {}
+game_tokens = {}  # Токен сессии -> user_id
 user_balances = {}
-transactions = {}
 user_stats = {}
 user_achievements = {}
 user_referrals = {}
-DAILY_STATS = {}
+user_languages = {}  # user_id -> язык, выбранный через /language ('' — не выбран); в базе — users.language
+# Баланс и метки игры меняются из цикла бота и из потока FastAPI — только под замком пользователя
+user_locks = locks.StripedLocks()
+user_activity = stats.IdleEvictor(USER_IDLE_TTL)
+db = Database(DB_NAME)
+ledger_writer = TransactionWriter(db)  # Транзакции пишутся пачками из фонового потока
+tracing.startup.mark('database')
+trajectories = trajectory.TrajectoryGuard()
+leaderboards = leaderboard.Leaderboards()
+
+# Лимиты ответственной игры и частоты запросов (сохраняются в SQLite)
+limits = counters.CounterEngine()
+limits.define('games_played', 24 * 3600)
+limits.define('amount_deposited', 24 * 3600, kind=counters.SLIDING)
+limits.define('cooling_off', RESPONSIBLE_GAMING_LIMITS['cooling_off_period'] * 3600, kind=counters.COOLDOWN)
+for action, (_, seconds) in RATE_LIMITS.items():
+    limits.define(f'rate_{action}', seconds, kind=counters.SLIDING, persist=False)
 economy = DynamicEconomy()
 
 # Глобальная статистика
@@ -300,17 +482,25 @@ global_stats = {
     'total_deposits': 0,
     'total_prizes': 0,
     'total_revenue': 0,
-    'jackpot_wins': 0,
-    'active_players': set()
+    'active_players': stats.HyperLogLog()
 }
 
 # ========== ГЕО-КОНФИГУРАЦИЯ ==========
-SEARCH_RADIUS = 30  # Радиус поиска в метрах 100
 MAX_DISTANCE = 10    # Расстояние для реакции 50
 FIND_DISTANCE = 10   # Дистанция находки 10
 GPS_TOLERANCE = 20   # Погрешность GPS в метрах 20
 LIVE_LOCATION_DURATION = 600  # 10 минут в секундах
 
+# Брошенные игры: простой без геопозиции (с), после которого игра завершается,
+# и возврат взноса, если не найдено ни одной метки
+GAME_EXPIRY = {
+    'economy': {'idle': LIVE_LOCATION_DURATION, 'refund_untouched': False},
+    'standard': {'idle': LIVE_LOCATION_DURATION, 'refund_untouched': False},
+    'premium': {'idle': 2 * LIVE_LOCATION_DURATION, 'refund_untouched': True},
+}
+GAME_EXPIRY_TICK = 15  # Шаг колеса таймеров (с)
+game_timers = timer_wheel.TimerWheel(tick=GAME_EXPIRY_TICK)
+
 class GeoGame:
     def __init__(self, user_id, center_lat, center_lon, game_mode):
         self.user_id = user_id
@@ -323,20 +513,88 @@ class GeoGame:
         self.last_update = datetime.now()
         self.live_location_active = False
         self.last_proximity_check = {}
+        self.state = game_state.GameStateLog()
+        self.token = secrets.token_urlsafe(8)
+        self._payload_cache = (-1, b'')
+        self.db_id = None  # Запись в таблице games
+        self.expiry = GAME_EXPIRY[game_mode]
+        self.prize_total = 0
+        game_tokens[self.token] = user_id
         logger.info(f"Created new {game_mode} game for user {user_id}")
+    
+    def public_spots(self):
+        """Метки без призов: [широта, долгота, найдена]"""
+        return [[round(s['coords'][0], 6), round(s['coords'][1], 6), int(s['found'])] for s in self.geospots]
+    
+    def public_payload(self):
+        """Сериализованное публичное состояние, кэшируется на версию игры"""
+        version, body = self._payload_cache
+        if version != self.state.version:
+            body, _ = game_state.encode({
+                'v': self.state.version,
+                'center': self.center,
+                'radius': self.mode_config['search_radius'],
+                'mode': self.game_mode,
+                'spots': self.public_spots()
+            })
+            self._payload_cache = (self.state.version, body)
+        return body
+    
+    def touch(self):
+        """Активность игрока: срок простоя отсчитывается заново"""
+        self.last_update = datetime.now()
+        game_timers.touch(self.user_id, time.monotonic() + self.expiry['idle'])
+    
+    def web_app_url(self, lang=None):
+        """Короткая ссылка на веб-приложение: только токен сессии (и язык)"""
+        url = f"{WEB_APP_URL}?token={self.token}"
+        if lang:
+            url += f"&lang={lang}"
+        if API_URL:
+            url += f"&api={urllib.parse.quote(API_URL, safe='')}"
+        return url
+    
+    def claim_spot(self, spot_index, prize_for=None):
+        """Атомарно забрать метку: отметка, приз, начисление и дельта под замком игрока.
         
-    def generate_geospots(self, count=5):
+        prize_for(spot) -> (приз, тип транзакции или None — не начислять).
+        Возвращает (приз, тип транзакции, дельта) или None, если метку уже забрали"""
+        with user_locks(self.user_id):
+            spot = self.geospots[spot_index]
+            if spot['found']:
+                return None
+            spot['found'] = True
+            self.found_spots.append(spot)
+            prize, transaction_type = (prize_for or self.spot_prize)(spot)
+            if prize and transaction_type:
+                adjust_balance(self.user_id, prize, notify=False)
+                log_transaction(self.user_id, prize, transaction_type)
+            delta = self.record_spot_found(spot_index, prize, user_balances.get(self.user_id, 0))
+        return prize, transaction_type, delta
+    
+    def spot_prize(self, spot):
+        """Приз метки; игрок с неправдоподобной траекторией остается без призов"""
+        if spot['has_prize'] and not trajectories.excluded(self.user_id):
+            return spot['prize_amount'], "prize_won"
+        return 0, None
+    
+    def record_spot_found(self, spot_index, prize, balance):
+        """Записать находку метки в журнал состояния и вернуть дельту"""
+        self.prize_total += prize
+        return self.state.record(game_state.EVENT_SPOT_FOUND, i=spot_index, p=prize, b=balance)
+        
+    def generate_geospots(self, count=SPOTS_PER_GAME):
         """Генерация случайных геометок в радиусе"""
         spots = []
-        current_win_probability = economy.adjust_difficulty(self.mode_config['win_probability'])
+        current_win_probability = economy.adjust_difficulty(self.mode_config['win_probability'], self.game_mode)
         
-        logger.info(f"Generating spots with win probability: {current_win_probability}")
+        events.log('spot_generation', user_id=self.user_id, win_probability=current_win_probability)
         
         
         for _ in range(count):
             # Генерация координат
             angle = random.uniform(0, 2 * math.pi)
-            distance = random.uniform(0, SEARCH_RADIUS)
+            distance = random.uniform(0, self.mode_config['search_radius'])
             
             earth_radius = 6371000
             dx = distance * math.cos(angle)
@@ -359,7 +617,7 @@ class GeoGame:
                 'found': False,
                 'type': 'money' if has_prize else 'empty'
             })
-            logger.info(f"Spot {_}: has_prize={has_prize}, amount={prize_amount}")
+            events.log('spot_generated', user_id=self.user_id, index=_, has_prize=has_prize, amount=prize_amount)
     
         
         return spots
@@ -378,6 +636,8 @@ class GeoGame:
     
     def check_proximity(self, user_location):
         """Проверка близости к геометкам"""
+        # geopy загружается при первой проверке, а не при старте бота
+        from geopy.distance import geodesic
         results = []
         user_lat, user_lon = user_location
         
@@ -405,16 +665,122 @@ class GeoGame:
         return results
 
 # ========== ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ==========
+def adjust_balance(user_id: int, amount, notify: bool = True) -> float:
+    """Изменить баланс под замком пользователя; возвращает новый баланс.
+    
+    При активной игре изменение попадает в ее журнал дельтой баланса и отправляется
+    по WebSocket; notify=False — баланс придет в дельте вызывающего (находка метки)"""
+    with user_locks(user_id):
+        balance = user_balances.get(user_id, 0) + amount
+        user_balances[user_id] = balance
+        game = games.get(user_id)
+        delta = game.state.record(game_state.EVENT_BALANCE, b=balance) if notify and game is not None else None
+    if delta is not None:
+        manager.push(delta, user_id)
+    return balance
+
+def get_game_by_token(token: str):
+    """Активная игра по токену сессии"""
+    user_id = game_tokens.get(token)
+    game = games.get(user_id)
+    if game is None or game.token != token:
+        return None
+    return game
+
+def verify_init_data(init_data: str, max_age: int = INIT_DATA_MAX_AGE):
+    """user_id из initData веб-приложения Telegram, если подпись бота верна и данные свежие"""
+    fields = dict(urllib.parse.parse_qsl(init_data, keep_blank_values=True))
+    received_hash = fields.pop('hash', '')
+    if not received_hash or not TOKEN:
+        return None
+    check_string = '\n'.join(f"{key}={value}" for key, value in sorted(fields.items()))
+    secret = hmac.new(b'WebAppData', TOKEN.encode(), hashlib.sha256).digest()
+    expected = hmac.new(secret, check_string.encode(), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(expected, received_hash):
+        return None
+    try:
+        if time.time() - int(fields.get('auth_date', 0)) > max_age:
+            return None
+        return int(json.loads(fields['user'])['id'])
+    except (KeyError, ValueError, TypeError):
+        return None
+
+def end_game(user_id: int, status: str = None):
+    """Удаление игры вместе с ее токеном и таймером простоя"""
+    game = games.pop(user_id, None)
+    game_timers.cancel(user_id)
+    if game is not None:
+        game_tokens.pop(game.token, None)
+        if game.db_id is not None:
+            if status is None:
+                status = 'completed' if len(game.found_spots) == len(game.geospots) else 'cancelled'
+            db.update_game_result(game.db_id, game.prize_total, status)
+    trajectories.reset(user_id)
+    return game
+
+def create_game(user_id: int, lat: float, lon: float, game_mode: str) -> GeoGame:
+    """Новая игра: регистрация в памяти и запись в историю игр"""
+    game = GeoGame(user_id, lat, lon, game_mode)
+    game.db_id = db.create_game(user_id, game_mode, game.mode_config['entry_fee'], status='active')
+    games[user_id] = game
+    game_timers.schedule(user_id, time.monotonic() + game.expiry['idle'])
+    return game
+
+def expire_idle_games(now: float = None) -> list:
+    """Завершение игр с истекшим простоем по политике режима; [(игра, возврат)]"""
+    expired = []
+    for user_id in game_timers.advance(time.monotonic() if now is None else now):
+        game = games.get(user_id)
+        if game is None:
+            continue
+        refund = 0
+        if game.expiry['refund_untouched'] and not game.found_spots:
+            refund = game.mode_config['entry_fee']
+            adjust_balance(user_id, refund)
+            log_transaction(user_id, refund, "game_expired_refund")
+        end_game(user_id, status='expired')
+        metrics.GAMES_EXPIRED.inc(game.game_mode)
+        logger.info(f"Expired idle {game.game_mode} game for user {user_id}: "
+                    f"found {len(game.found_spots)}/{len(game.geospots)}, refund {refund}")
+        expired.append((game, refund))
+    return expired
+
+def check_trajectory(user_id: int, coords) -> bool:
+    """Учет координаты в траектории игрока; False — координату не проверяем на находки"""
+    was_excluded = trajectories.excluded(user_id)
+    verdict = trajectories.check(user_id, coords[0], coords[1])
+    if verdict != trajectory.OK:
+        metrics.TRAJECTORY_FLAGS.inc(verdict)
+        if verdict == trajectory.EXCLUDE and not was_excluded:
+            logger.warning(f"User {user_id} excluded from prizes: implausible movement")
+    return verdict != trajectory.THROTTLE
+
+def claim_nearby_spot(game, coords, spot_index=None):
+    """Забрать метку рядом с игроком: проверка траектории и расстояния, затем claim_spot.
+    
+    spot_index — забрать только эту метку. Возвращает (индекс, результат claim_spot) или None"""
+    try:
+        coords = (float(coords[0]), float(coords[1]))
+    except (TypeError, ValueError, IndexError):
+        return None
+    if not check_trajectory(game.user_id, coords):
+        return None
+    game.touch()
+    for result in game.check_proximity(coords):
+        if not result['is_close']:
+            continue
+        index = game.geospots.index(result['spot'])
+        if spot_index is not None and index != spot_index:
+            continue
+        claimed = game.claim_spot(index)
+        if claimed is not None:
+            return index, claimed
+    return None
+
 def log_transaction(user_id: int, amount: int, transaction_type: str):
     """Логирование транзакции"""
-    if user_id not in transactions:
-        transactions[user_id] = []
-    
-    transactions[user_id].append({
-        'date': datetime.now().strftime("%Y-%m-%d %H:%M"),
-        'amount': amount,
-        'type': transaction_type
-    })
+    user_activity.touch(user_id, time.time())
+    ledger_writer.add(user_id, amount, transaction_type)
     
     # Обновляем глобальную статистику
     if amount > 0:
@@ -426,25 +792,72 @@ def log_transaction(user_id: int, amount: int, transaction_type: str):
 
 def can_play_game(user_id: int) -> bool:
     """Проверка, может ли пользователь играть сегодня"""
-    today = date.today()
-    if today not in DAILY_STATS:
-        DAILY_STATS[today] = {}
-    
-    if user_id not in DAILY_STATS[today]:
-        DAILY_STATS[today][user_id] = {'games_played': 0, 'amount_deposited': 0}
-    
-    return DAILY_STATS[today][user_id]['games_played'] < RESPONSIBLE_GAMING_LIMITS['daily_games_limit']
+    if limits.cooldown_left('cooling_off', user_id):
+        return False
+    return limits.value('games_played', user_id) < RESPONSIBLE_GAMING_LIMITS['daily_games_limit']
 
 def log_game_played(user_id: int):
-    """Логирование сыгранной игры"""
-    today = date.today()
-    if today not in DAILY_STATS:
-        DAILY_STATS[today] = {}
-    
-    if user_id not in DAILY_STATS[today]:
-        DAILY_STATS[today][user_id] = {'games_played': 0, 'amount_deposited': 0}
-    
-    DAILY_STATS[today][user_id]['games_played'] += 1
+    """Логирование сыгранной игры; исчерпание лимита включает перерыв"""
+    played = limits.incr('games_played', user_id)
+    if played >= RESPONSIBLE_GAMING_LIMITS['daily_games_limit']:
+        limits.start_cooldown('cooling_off', user_id)
+
+def cooling_off_hours(user_id: int) -> int:
+    """Сколько часов осталось до конца перерыва (с округлением вверх)"""
+    return math.ceil(limits.cooldown_left('cooling_off', user_id) / 3600)
+
+def rate_limited(action: str, user_id: int) -> bool:
+    """Превышен ли лимит частоты действия (иначе запрос учитывается)"""
+    limit, _ = RATE_LIMITS[action]
+    return not limits.allow(f'rate_{action}', user_id, limit)
+
+def sweep_stats(now=None):
+    """Вытеснение старых дней и неактивных пользователей"""
+    now = now or time.time()
+    limits.evict(now)
+    leaderboards.prune()
+    evicted = 0
+    for user_id in user_activity.expired(now):
+        if user_id in games:
+            user_activity.touch(user_id, now)
+            continue
+        user_stats.pop(user_id, None)
+        user_achievements.pop(user_id, None)
+        user_languages.pop(user_id, None)
+        evicted += 1
+    if evicted:
+        logger.info(f"Evicted stats for {evicted} idle users")
+    return evicted
+
+async def stats_maintenance(context: CallbackContext) -> None:
+    """Периодическое обслуживание статистики"""
+    sweep_stats()
+
+async def game_expiry(context: CallbackContext) -> None:
+    for game, refund in expire_idle_games():
+        lang = stored_language(game.user_id) or messages.DEFAULT_LANGUAGE
+        text = messages.text(lang, 'game.expired', found=len(game.found_spots), total=len(game.geospots))
+        if refund:
+            text += messages.text(lang, 'game.expired_refund', refund=refund)
+        try:
+            await context.bot.send_message(chat_id=game.user_id, text=text, reply_markup=get_main_menu_keyboard(lang))
+        except Exception as e:
+            logger.error(f"Failed to notify user {game.user_id} about expired game: {e}")
+
+async def close_stores(application) -> None:
+    """Финальная запись фоновых хранилищ при остановке бота"""
+    for store in (ledger_writer, limits, leaderboards):
+        try:
+            await asyncio.to_thread(store.close)
+        except Exception as e:
+            logger.error(f"Failed to close {type(store).__name__}: {e}")
+
+async def archive_ledger(context: CallbackContext) -> None:
+    """Перенос старых транзакций и игр в архив (в отдельном потоке)"""
+    try:
+        await asyncio.to_thread(archive.archive_old_rows, DB_NAME, retention_days=ARCHIVE_RETENTION_DAYS)
+    except Exception as e:
+        logger.error(f"Error archiving ledger: {e}")
 
 async def check_achievements(update: Update, context: CallbackContext, user_id: int, achievement_type: str):
     """Проверка и выдача достижений"""
@@ -456,79 +869,141 @@ async def check_achievements(update: Update, context: CallbackContext, user_id:
         user_achievements[user_id]["first_win"] = True
         reward = 5
         
-        user_balances[user_id] += reward
+        adjust_balance(user_id, reward)
         log_transaction(user_id, reward, "achievement_reward")
         
         await context.bot.send_message(
             chat_id=update.effective_chat.id,
-            text=f"🎖 Получено достижение: Первый выигрыш!\n💰 Награда: {reward} руб."
+            text=messages.text(user_language(update.effective_user), 'achievement.first_win', reward=reward)
         )
 
-def generate_near_miss():
+def generate_near_miss(lang: str = messages.DEFAULT_LANGUAGE):
     """Создание ситуации 'почти выигрыша'"""
     if random.random() < 0.15:  # 15% шанс near miss
-        messages = [
-            "Ой! Вы были так близки к выигрышу! Попробуйте еще раз!",
-            "Почти получилось! Следующая метка точно будет удачной!",
-            "Удача уже на вашей стороне! Продолжайте поиски!"
-        ]
-        return random.choice(messages)
+        return messages.choice(lang, 'spot.near_miss')
     return None
 
 # ========== КНОПКИ ==========
-def get_main_menu_keyboard():
-    keyboard = [
-        [InlineKeyboardButton("🎮 Начать игру", callback_data='choose_mode')],
-        [InlineKeyboardButton("🌎 Открыть карту", web_app=WebAppInfo(url="https://sevryuk88.github.io/GeoHunter-/geohtml.html"))],
-   
-        [InlineKeyboardButton("💰 Мой баланс", callback_data='check_balance')],
-        [InlineKeyboardButton("💳 Пополнить счет", callback_data='make_deposit')],
-        [InlineKeyboardButton("👥 Пригласить друзей", callback_data='invite_friends')],
-        [InlineKeyboardButton("❓ Правила", callback_data='show_rules')],
-        [InlineKeyboardButton("📊 Статистика", callback_data='user_stats')],
-    ]
-    return InlineKeyboardMarkup(keyboard)
+OPEN_MAP = object()  # Место кнопки веб-приложения в раскладке
+
+# Статические клавиатуры: строки из (ключ подписи, callback_data)
+KEYBOARD_LAYOUTS = {
+    'main_menu': [
+        [('btn.start_game', 'choose_mode')],
+        [('btn.open_map', OPEN_MAP)],
+        [('btn.balance', 'check_balance')],
+        [('btn.deposit', 'make_deposit')],
+        [('btn.invite', 'invite_friends')],
+        [('btn.rules', 'show_rules')],
+        [('btn.stats', 'user_stats')],
+    ],
+    'mode_selection': [
+        [('mode.economy', 'mode_economy')],
+        [('mode.standard', 'mode_standard')],
+        [('mode.premium', 'mode_premium')],
+        [('btn.back', 'main_menu')],
+    ],
+    'game': [
+        [('btn.start_live', 'start_live_location')],
+        [('btn.my_stats', 'user_stats')],
+        [('btn.cancel_game', 'cancel_game')],
+        [('btn.main_menu', 'main_menu')],
+    ],
+    'back': [
+        [('btn.back', 'main_menu')],
+    ],
+    'live_location': [
+        [('btn.stop_live', 'stop_live_location')],
+        [('btn.my_stats', 'user_stats')],
+        [('btn.cancel_game', 'cancel_game')],
+    ],
+    'deposit': [
+        [('btn.deposit_5', 'deposit_5')],
+        [('btn.deposit_10', 'deposit_10')],
+        [('btn.deposit_20', 'deposit_20')],
+        [('btn.back', 'main_menu')],
+    ],
+    'need_deposit': [
+        [('btn.make_deposit', 'make_deposit')],
+        [('btn.balance', 'check_balance')],
+        [('btn.back', 'choose_mode')],
+    ],
+    'location_method': [
+        [('btn.start_live', 'start_live_location')],
+        [('btn.send_manually', 'send_location')],
+        [('btn.back', 'choose_mode')],
+    ],
+    'after_deposit': [
+        [('btn.start_game', 'choose_mode')],
+        [('btn.balance', 'check_balance')],
+        [('btn.main_menu', 'main_menu')],
+    ],
+    'balance': [
+        [('btn.top_up', 'make_deposit')],
+        [('btn.history', 'hist|t|')],
+        [('btn.start_game', 'choose_mode')],
+        [('btn.main_menu', 'main_menu')],
+    ],
+    'confirm_live': [
+        [('btn.confirm_live', 'confirm_live')],
+        [('btn.back', 'back_to_game')],
+    ],
+    'back_to_game': [
+        [('btn.back', 'back_to_game')],
+    ],
+}
 
-def get_mode_selection_keyboard():
-    keyboard = [
-        [InlineKeyboardButton("🟢 Эконом (5 руб.)", callback_data='mode_economy')],
-        [InlineKeyboardButton("🔵 Стандарт (10 руб.)", callback_data='mode_standard')],
-        [InlineKeyboardButton("🟣 Премиум (15 руб.)", callback_data='mode_premium')],
-        [InlineKeyboardButton("🔙 Назад", callback_data='main_menu')],
-    ]
-    return InlineKeyboardMarkup(keyboard)
+def build_keyboard(lang: str, layout) -> InlineKeyboardMarkup:
+    rows = []
+    for row in layout:
+        buttons = []
+        for label_key, action in row:
+            label = messages.text(lang, label_key)
+            if action is OPEN_MAP:
+                buttons.append(InlineKeyboardButton(label, web_app=WebAppInfo(url=f"{WEB_APP_URL}?lang={lang}")))
+            else:
+                buttons.append(InlineKeyboardButton(label, callback_data=action))
+        rows.append(buttons)
+    return InlineKeyboardMarkup(rows)
+
+# Собираются один раз на язык; объекты PTB неизменяемы, поэтому разметка общая для всех сообщений
+KEYBOARDS = {
+    lang: {name: build_keyboard(lang, layout) for name, layout in KEYBOARD_LAYOUTS.items()}
+    for lang in messages.LANGUAGES
+}
 
-def get_game_keyboard():
-    keyboard = [
-        [InlineKeyboardButton("📍 Включить трансляцию", callback_data='start_live_location')],
-        [InlineKeyboardButton("📊 Моя статистика", callback_data='user_stats')],
-        [InlineKeyboardButton("❌ Завершить игру", callback_data='cancel_game')],
-        [InlineKeyboardButton("🏠 Главное меню", callback_data='main_menu')],
-    ]
-    return InlineKeyboardMarkup(keyboard)
+def get_keyboard(name: str, lang: str = messages.DEFAULT_LANGUAGE) -> InlineKeyboardMarkup:
+    return KEYBOARDS.get(lang, KEYBOARDS[messages.DEFAULT_LANGUAGE])[name]
 
-def get_back_keyboard():
-    keyboard = [
-        [InlineKeyboardButton("🔙 Назад", callback_data='main_menu')],
-    ]
-    return InlineKeyboardMarkup(keyboard)
+def get_main_menu_keyboard(lang: str = messages.DEFAULT_LANGUAGE):
+    return get_keyboard('main_menu', lang)
 
-def get_live_location_keyboard():
-    keyboard = [
-        [InlineKeyboardButton("📍 Остановить трансляцию", callback_data='stop_live_location')],
-        [InlineKeyboardButton("📊 Моя статистика", callback_data='user_stats')],
-        [InlineKeyboardButton("❌ Завершить игру", callback_data='cancel_game')],
-    ]
-    return InlineKeyboardMarkup(keyboard)
+def get_mode_selection_keyboard(lang: str = messages.DEFAULT_LANGUAGE):
+    return get_keyboard('mode_selection', lang)
 
-def get_deposit_keyboard():
-    keyboard = [
-        [InlineKeyboardButton("5$", callback_data='deposit_5')],
-        [InlineKeyboardButton("10$ (+1$ бонус)", callback_data='deposit_10')],
-        [InlineKeyboardButton("20$ (+3$ бонус)", callback_data='deposit_20')],
-        [InlineKeyboardButton("🔙 Назад", callback_data='main_menu')],
-    ]
-    return InlineKeyboardMarkup(keyboard)
+def get_game_keyboard(lang: str = messages.DEFAULT_LANGUAGE):
+    return get_keyboard('game', lang)
+
+def get_back_keyboard(lang: str = messages.DEFAULT_LANGUAGE):
+    return get_keyboard('back', lang)
+
+def get_live_location_keyboard(lang: str = messages.DEFAULT_LANGUAGE):
+    return get_keyboard('live_location', lang)
+
+def get_deposit_keyboard(lang: str = messages.DEFAULT_LANGUAGE):
+    return get_keyboard('deposit', lang)
+
+def user_language(user) -> str:
+    """Выбранный через /language язык, иначе язык клиента Telegram"""
+    return stored_language(user.id) or messages.language_for(user.language_code)
+
+def stored_language(user_id: int) -> str:
+    """Выбранный язык из памяти, при промахе — из users.language (запоминается и отсутствие)"""
+    lang = user_languages.get(user_id)
+    if lang is None:
+        user = db.get_user(user_id)
+        lang = user_languages[user_id] = user['language'] if user and user['language'] in messages.LANGUAGES else ''
+    return lang
     
 # ========== ОБРАБОТЧИКИ ==========
 async def start(update: Update, context: CallbackContext) -> None:
@@ -538,66 +1013,31 @@ async def start(update: Update, context: CallbackContext) -> None:
     if user.id not in user_balances:
         user_balances[user.id] = 0
         user_stats[user.id] = {'level': 1, 'xp': 0, 'games_played': 0, 'prizes_won': 0}
+    user_activity.touch(user.id, time.time())
     
-    welcome_text = (
-        "🌟 Добро пожаловать в GeoHunter! 🌟\n\n"
-        "Я помогу тебе найти скрытые сокровища вокруг тебя!\n\n"
-        "Доступные режимы игры:\n"
-        #f"🟢 Эконом: 5 руб. - призы 3-30 руб.\n"
-        #f"🔵 Стандарт: 10 руб. - призы 5-50 руб.\n"
-        #f"🟣 Премиум: 15 руб. - призы 10-100 руб.\n\n"
-        f"🟢 Эконом: 3$ - призы 1-10$\n"
-        f"🔵 Стандарт: 5$ - призы 3-15$\n"
-        f"🟣 Премиум: 7$ - призы 5-20$\n\n"
-        f"💎 Джекпот: {JACKPOT_POOL} руб. (шанс {JACKPOT_PROBABILITY*100}%)\n\n"
-        "Выбери действие:"
-    )
+    lang = user_language(user)
+    welcome_text = messages.text(lang, 'welcome', jackpot=jackpot_pool.amount,
+                                 jackpot_chance=JACKPOT_PROBABILITY * 100)
     
     await context.bot.send_message(
         chat_id=update.effective_chat.id,
         text=welcome_text,
-        reply_markup=get_main_menu_keyboard()
+        reply_markup=get_main_menu_keyboard(lang)
     )
 
 async def rules(update: Update, context: CallbackContext) -> None:
     query = update.callback_query
     await query.answer()
     
-    rules_text = (
-        "📜 Правила GeoHunter:\n\n"
-        "1. Выбери режим игры и внеси депозит\n"
-        "2. Запусти игру, отправив свою геопозицию\n"
-        "3. Я создам 5 скрытых геометок в радиусе 100 м\n"
-        "4. Перемещайся по местности и ищи метки\n"
-        "5. Когда приблизишься к метке:\n"
-        "   - 📱 Телефон начнет вибрировать\n"
-        "   - 🔔 Появится звуковой сигнал\n"
-        "   - 📊 Шкала будет показывать близость\n"
-        "6. Найди все метки и собери призы!\n\n"
-        "🔥 Советы:\n"
-        "- Используйте 'Трансляцию геопозиции' для автоматического отслеживания\n"
-        "- Приближайтесь к меткам медленно, чтобы не пропустить их\n\n"
-        "Удачи в охоте! 🗺️"
-    )
-    
-    await query.edit_message_text(rules_text, reply_markup=get_back_keyboard())
+    lang = user_language(query.from_user)
+    await query.edit_message_text(messages.text(lang, 'rules'), reply_markup=get_back_keyboard(lang))
 
 async def choose_mode(update: Update, context: CallbackContext) -> None:
     query = update.callback_query
     await query.answer()
     
-    mode_text = (
-        "🎮 Выбери режим игры:\n\n"
-        "🟢 Эконом (3$)\n"
-        "   - Призы: 1-10$\n\n"   
-        "🔵 Стандарт (5$)\n"
-        "   - Призы: 3-15$\n\n"   
-        "🟣 Премиум (7$)\n"
-        "   - Призы: 5-20$\n\n"   
-        "💎 Во всех режимах есть шанс выиграть джекпот!"
-    )
-    
-    await query.edit_message_text(mode_text, reply_markup=get_mode_selection_keyboard())
+    lang = user_language(query.from_user)
+    await query.edit_message_text(messages.text(lang, 'choose_mode'), reply_markup=get_mode_selection_keyboard(lang))
 
 async def start_game(update: Update, context: CallbackContext, game_mode: str) -> None:
     query = update.callback_query
@@ -605,63 +1045,38 @@ async def start_game(update: Update, context: CallbackContext, game_mode: str) -
     
     user = query.from_user
     mode_config = GAME_MODES[game_mode]
+    lang = user_language(user)
+    mode_name = messages.text(lang, f'mode.{game_mode}')
     
     # Проверяем баланс
     if user.id not in user_balances or user_balances[user.id] < mode_config['entry_fee']:
-        payment_text = (
-            f"Для игры в режиме {mode_config['name']} требуется {mode_config['entry_fee']}$\n\n"
-            f"Что вы можете найти:\n"
-            f"• Призы: {mode_config['min_prize']}-{mode_config['max_prize']}$\n"
-            f"• Шанс выигрыша: {int(mode_config['win_probability'] * 100)}%\n"
-            f"• Джекпот: {JACKPOT_POOL}$\n"
-            f"• 5 геометок в радиусе 100 м\n\n"
-            "Хотите попробовать удачу?"
-        )
-        
-        keyboard = [
-            [InlineKeyboardButton("💳 Внести депозит", callback_data='make_deposit')],
-            [InlineKeyboardButton("💰 Мой баланс", callback_data='check_balance')],
-            [InlineKeyboardButton("🔙 Назад", callback_data='choose_mode')],
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await query.edit_message_text(payment_text, reply_markup=reply_markup)
+        payment_text = messages.text(
+            lang, 'game.need_deposit', mode=mode_name, entry_fee=mode_config['entry_fee'],
+            min_prize=mode_config['min_prize'], max_prize=mode_config['max_prize'],
+            win_chance=int(mode_config['win_probability'] * 100), jackpot=jackpot_pool.amount)
+        await query.edit_message_text(payment_text, reply_markup=get_keyboard('need_deposit', lang))
         return
     
     # Проверяем лимит игр
     if not can_play_game(user.id):
-        limit_text = (
-            f"❌ Вы исчерпали лимит игр на сегодня ({RESPONSIBLE_GAMING_LIMITS['daily_games_limit']} игр/день).\n\n"
-            "Попробуйте завтра или пригласите друзей,\n"
-            "чтобы получить дополнительные игры!"
-        )
-        await query.edit_message_text(limit_text, reply_markup=get_back_keyboard())
+        limit_text = messages.text(lang, 'game.limit_reached',
+                                   limit=RESPONSIBLE_GAMING_LIMITS['daily_games_limit'],
+                                   hours=cooling_off_hours(user.id))
+        await query.edit_message_text(limit_text, reply_markup=get_back_keyboard(lang))
         return
     
     # Списание средств и начало игры
-    user_balances[user.id] -= mode_config['entry_fee']
+    adjust_balance(user.id, -mode_config['entry_fee'])
     log_transaction(user.id, -mode_config['entry_fee'], f"game_entry_{game_mode}")
     log_game_played(user.id)
+    jackpot_pool.contribute(mode_config['entry_fee'] * JACKPOT_CONTRIBUTION)
     
     # Обновляем глобальную статистику
     global_stats['total_games'] += 1
     global_stats['active_players'].add(user.id)
     
-    start_game_text = (
-        f"Отлично! Выбран режим {mode_config['name']}\n"
-        f"С вашего счета списано {mode_config['entry_fee']} руб.\n"
-        "Для начала игры мне нужна твоя текущая геопозиция. "
-        "Выбери способ передачи геопозиции:"
-    )
-    
-    keyboard = [
-        [InlineKeyboardButton("📍 Включить трансляцию", callback_data='start_live_location')],
-        [InlineKeyboardButton("📎 Отправить вручную", callback_data='send_location')],
-        [InlineKeyboardButton("🔙 Назад", callback_data='choose_mode')],
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    await query.edit_message_text(start_game_text, reply_markup=reply_markup)
+    start_game_text = messages.text(lang, 'game.mode_selected', mode=mode_name, entry_fee=mode_config['entry_fee'])
+    await query.edit_message_text(start_game_text, reply_markup=get_keyboard('location_method', lang))
     
     # Сохраняем выбранный режим в контексте
     context.user_data['selected_mode'] = game_mode
@@ -670,51 +1085,52 @@ async def handle_deposit(update: Update, context: CallbackContext) -> None:
     query = update.callback_query
     await query.answer()
     
-    deposit_text = (
-        "Выберите сумму депозита:\n\n"
-        "💎 При пополнении от 50 руб. - бонус 5 руб.! \n"
-        "💎 При пополнении от 100 руб. - бонус 15 руб.!"
-    )
-    
+    lang = user_language(query.from_user)
     await query.edit_message_text(
-        deposit_text,
-        reply_markup=get_deposit_keyboard()
+        messages.text(lang, 'deposit.choose'),
+        reply_markup=get_deposit_keyboard(lang)
     )
 
 async def process_deposit(update: Update, context: CallbackContext, amount: int) -> None:
     query = update.callback_query
     user = query.from_user
     await query.answer()
+    lang = user_language(user)
     
-    bonus = 0
-    if amount == 10:
-        bonus = 1
-    elif amount == 20:
-        bonus = 3
+    if rate_limited('deposit', user.id):
+        await query.edit_message_text(
+            messages.text(lang, 'deposit.rate_limited'),
+            reply_markup=get_back_keyboard(lang)
+        )
+        return
     
-    user_balances[user.id] = user_balances.get(user.id, 0) + amount + bonus
+    # Дневной лимит депозитов (скользящие 24 часа); при превышении — перерыв
+    deposit_limit = RESPONSIBLE_GAMING_LIMITS['daily_deposit_limit']
+    in_cooling_off = limits.cooldown_left('cooling_off', user.id) > 0
+    if in_cooling_off or not limits.allow('amount_deposited', user.id, deposit_limit, amount):
+        if not in_cooling_off:
+            limits.start_cooldown('cooling_off', user.id)
+        await query.edit_message_text(
+            messages.text(lang, 'deposit.limit_reached', limit=deposit_limit, hours=cooling_off_hours(user.id)),
+            reply_markup=get_back_keyboard(lang)
+        )
+        return
+    
+    bonus = DEPOSIT_BONUSES.get(amount, 0)
+    
+    adjust_balance(user.id, amount + bonus)
     log_transaction(user.id, amount + bonus, "deposit")
     
-    deposit_text = (
-        f"✅ Счет успешно пополнен на {amount}$\n"
-    )
+    deposit_text = messages.text(lang, 'deposit.done', amount=amount)
     
     if bonus > 0:
-        deposit_text += f"🎁 Получен бонус: {bonus}$\n"
-    
-    deposit_text += (
-        f"💰 Текущий баланс: {user_balances[user.id]}$\n"
-    )
+        deposit_text += messages.text(lang, 'deposit.bonus', bonus=bonus)
     
-    keyboard = [
-        [InlineKeyboardButton("🎮 Начать игру", callback_data='choose_mode')],
-        [InlineKeyboardButton("💰 Мой баланс", callback_data='check_balance')],
-        [InlineKeyboardButton("🏠 Главное меню", callback_data='main_menu')],
-    ]
+    deposit_text += messages.text(lang, 'deposit.balance', balance=user_balances[user.id])
     
     await query.edit_message_text(
         deposit_text,
-        reply_markup=InlineKeyboardMarkup(keyboard)
+        reply_markup=get_keyboard('after_deposit', lang)
     )
 
 async def handle_balance(update: Update, context: CallbackContext) -> None:
@@ -722,42 +1138,75 @@ async def handle_balance(update: Update, context: CallbackContext) -> None:
     user = query.from_user
     await query.answer()
     
+    lang = user_language(user)
     balance = user_balances.get(user.id, 0)
-    games_today = DAILY_STATS.get(date.today(), {}).get(user.id, {}).get('games_played', 0) if date.today() in DAILY_STATS and user.id in DAILY_STATS[date.today()] else 0
+    games_today = int(limits.value('games_played', user.id))
     
-    balance_text = (
-        f"💰 Ваш баланс: {balance}$\n"
-        f"📅 Игр сегодня: {games_today}/{RESPONSIBLE_GAMING_LIMITS['daily_games_limit']}\n\n"
-        "Доступные режимы:\n"
-    )
+    balance_text = messages.text(lang, 'balance.header', balance=balance, games_today=games_today,
+                                 limit=RESPONSIBLE_GAMING_LIMITS['daily_games_limit'])
     
     # Показываем, сколько игр доступно в каждом режиме
     for mode, config in GAME_MODES.items():
         games_available = balance // config['entry_fee']
-        balance_text += f"{config['name']}: {games_available} игр\n"
+        balance_text += messages.text(lang, 'balance.mode_games', mode=messages.text(lang, f'mode.{mode}'),
+                                      games=games_available)
     
-    balance_text += "\nИстория транзакций:\n"
+    balance_text += messages.text(lang, 'balance.history')
     
     # Добавляем историю транзакций
-    user_transactions = transactions.get(user.id, [])
+    await asyncio.to_thread(ledger_writer.flush)
+    user_transactions, _ = db.get_history_page(user.id, 'transactions', limit=5)
     if user_transactions:
-        for transaction in user_transactions[-5:]:
-            sign = "+" if transaction['amount'] > 0 else ""
-            balance_text += f"• {transaction['date']}: {sign}{transaction['amount']}$ ({transaction['type']})\n"
+        balance_text += format_history('transactions', user_transactions, lang)
     else:
-        balance_text += "История транзакций пуста\n"
-    
-    keyboard = [
-        [InlineKeyboardButton("💳 Пополнить баланс", callback_data='make_deposit')],
-        [InlineKeyboardButton("🎮 Начать игру", callback_data='choose_mode')],
-        [InlineKeyboardButton("🏠 Главное меню", callback_data='main_menu')],
-    ]
+        balance_text += messages.text(lang, 'balance.history_empty')
     
     await query.edit_message_text(
         balance_text,
-        reply_markup=InlineKeyboardMarkup(keyboard)
+        reply_markup=get_keyboard('balance', lang)
     )
 
+def format_history(kind: str, rows: list, lang: str = messages.DEFAULT_LANGUAGE) -> str:
+    """Строки истории для сообщения"""
+    text = ""
+    for row in rows:
+        date_text = row['created_at'][:16]
+        if kind == 'games':
+            text += messages.text(lang, 'history.game', date=date_text, mode=row['mode'],
+                                  prize=row['prize_won'] or 0, status=row['status'])
+        else:
+            sign = "+" if row['amount'] > 0 else ""
+            text += messages.text(lang, 'history.transaction', date=date_text, sign=sign,
+                                  amount=row['amount'], type=row['type'])
+    return text
+
+async def show_history(update: Update, context: CallbackContext, code: str = None, cursor: str = None) -> None:
+    """История транзакций или игр по страницам: /history [games]"""
+    user = update.effective_user
+    lang = user_language(user)
+    query = update.callback_query
+    if code is None:
+        code = 'g' if context.args and context.args[0] == 'games' else 't'
+    kind = HISTORY_KINDS[code]
+    
+    await asyncio.to_thread(ledger_writer.flush)
+    rows, next_cursor = db.get_history_page(user.id, kind, HISTORY_PAGE_SIZE, cursor or None)
+    title = messages.text(lang, f'history.{kind}_title')
+    text = f"{title}:\n\n" + (format_history(kind, rows, lang) or messages.text(lang, 'history.empty'))
+    
+    keyboard = []
+    if next_cursor:
+        keyboard.append([InlineKeyboardButton(messages.text(lang, 'btn.next'),
+                                              callback_data=f'hist|{code}|{next_cursor}')])
+    keyboard.append([InlineKeyboardButton(messages.text(lang, 'btn.main_menu'), callback_data='main_menu')])
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    
+    if query:
+        await query.answer()
+        await query.edit_message_text(text, reply_markup=reply_markup)
+    else:
+        await context.bot.send_message(chat_id=update.effective_chat.id, text=text, reply_markup=reply_markup)
+
 async def invite_friends(update: Update, context: CallbackContext) -> None:
     query = update.callback_query
     user = query.from_user
@@ -765,17 +1214,11 @@ async def invite_friends(update: Update, context: CallbackContext) -> None:
     
     referral_link = f"https://t.me/{(await context.bot.get_me()).username}?start=ref{user.id}"
     
-    referral_text = (
-        "👥 Пригласи друзей и получай бонусы!\n\n"
-        f"Твоя реферальная ссылка: {referral_link}\n\n"
-        "За каждого приглашенного друга:\n"
-        "• Ты получаешь 5 руб.\n"
-        "• Друг получает +1 бесплатную игру\n"
-        "• Растем вместе! 🚀"
-    )
+    lang = user_language(user)
+    referral_text = messages.text(lang, 'invite', link=referral_link)
     
     keyboard = [
-        [InlineKeyboardButton("🏠 Главное меню", callback_data='main_menu')],
+        [InlineKeyboardButton(messages.text(lang, 'btn.main_menu'), callback_data='main_menu')],
     ]
     
     await query.edit_message_text(
@@ -787,59 +1230,77 @@ async def start_live_location(update: Update, context: CallbackContext) -> None:
     query = update.callback_query
     await query.answer()
     
-    instructions = (
-        "📡 Как включить трансляцию геопозиции:\n\n"
-        "1. Откройте меню вложения (кнопка 📎)\n"
-        "2. Выберите 'Геопозиция'\n"
-        "3. Нажмите 'Транслировать мою геопозицию'\n"
-        "4. Выберите время трансляции\n"
-        "5. Нажмите 'Поделиться'\n\n"
-        "Я буду автоматически отслеживать ваше перемещение!"
-    )
-    
-    keyboard = [
-        [InlineKeyboardButton("✅ Я включил трансляцию", callback_data='confirm_live')],
-        [InlineKeyboardButton("🔙 Назад", callback_data='back_to_game')],
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    await query.edit_message_text(instructions, reply_markup=reply_markup)
+    lang = user_language(query.from_user)
+    await query.edit_message_text(messages.text(lang, 'live.instructions'), reply_markup=get_keyboard('confirm_live', lang))
 
 async def confirm_live_location(update: Update, context: CallbackContext) -> None:
     query = update.callback_query
     user = query.from_user
     await query.answer()
+    lang = user_language(user)
     
     # Если игра уже начата, просто обновляем статус
     if user.id in games:
         game = games[user.id]
         game.live_location_active = True
-        response = "✅ Трансляция геопозиции активирована! Начинайте поиск!"
+        response = messages.text(lang, 'live.activated')
         logger.info(f"Live location activated for user {user.id}")
     else:
         # Создаем временную игру
-        response = "⚠️ Сначала начните игру, отправив геопозицию!"
-        await query.edit_message_text(response, reply_markup=get_main_menu_keyboard())
+        response = messages.text(lang, 'live.no_game')
+        await query.edit_message_text(response, reply_markup=get_main_menu_keyboard(lang))
         return
     
-    await query.edit_message_text(response, reply_markup=get_live_location_keyboard())
+    await query.edit_message_text(response, reply_markup=get_live_location_keyboard(lang))
 
 async def stop_live_location(update: Update, context: CallbackContext) -> None:
     query = update.callback_query
     user = query.from_user
     await query.answer()
+    lang = user_language(user)
     
     if user.id in games:
         games[user.id].live_location_active = False
-        response = "⏹ Трансляция геопозиции остановлена."
+        response = messages.text(lang, 'live.stopped')
         logger.info(f"Live location stopped for user {user.id}")
     else:
-        response = "❌ У вас нет активной игры."
+        response = messages.text(lang, 'live.no_active')
     
-    await query.edit_message_text(response, reply_markup=get_game_keyboard())
+    await query.edit_message_text(response, reply_markup=get_game_keyboard(lang))
 
 
 
+def build_location_message(game: GeoGame, latitude: float, longitude: float, action: str,
+                           lang: str = messages.DEFAULT_LANGUAGE):
+    """Текст и клавиатура ответа на геопозицию"""
+    # Веб-приложение получает состояние по токену через API
+    web_app_url = game.web_app_url(lang)
+    
+    # Формируем ссылку на статическую карту с метками
+    yandex_map_url = (
+        f"https://static-maps.yandex.ru/1.x/?ll={longitude},{latitude}"
+        f"&size=650,450"
+        f"&z=17"
+        f"&l=map"
+        f"&pt={longitude},{latitude},pm2rdl"
+    )
+    
+    # Добавляем метки геометок
+    for i, spot in enumerate(game.geospots):
+        lat, lon = spot['coords']
+        color = "pm2gnl" if not spot['found'] else "pm2bll"
+        yandex_map_url += f"~{lon},{lat},{color}{i+1}"
+    
+    response_text = messages.text(
+        lang, 'game.location', action=messages.text(lang, f'game.{action}'),
+        mode=messages.text(lang, f'mode.{game.game_mode}'), radius=game.mode_config['search_radius'], spots=len(game.geospots),
+        prizes=sum(1 for s in game.geospots if s['has_prize']), map_url=yandex_map_url)
+    
+    # Ссылка на веб-приложение своя у каждой игры; остальные строки — из готовой клавиатуры
+    map_button = InlineKeyboardButton(messages.text(lang, 'btn.open_interactive_map'), web_app=WebAppInfo(url=web_app_url))
+    reply_markup = InlineKeyboardMarkup(((map_button,),) + get_game_keyboard(lang).inline_keyboard[:3])
+    return response_text, reply_markup
+
 async def handle_location(update: Update, context: CallbackContext) -> None:
     user = update.effective_user
     message = update.effective_message
@@ -850,76 +1311,28 @@ async def handle_location(update: Update, context: CallbackContext) -> None:
         
     location = message.location
     user_coords = (location.latitude, location.longitude)
-    logger.info(f"Received location update from user {user.id}: {user_coords}")
+    events.log('location_update', user_id=user.id, coords=user_coords)
     
     # Получаем выбранный режим из контекста
     selected_mode = context.user_data.get('selected_mode', 'standard')
-    mode_config = GAME_MODES[selected_mode]
     
     # Сохраняем последнее местоположение
     context.user_data['last_location'] = user_coords
     
     # Если это первое сообщение с геопозицией - начинаем игру
     if user.id not in games:
-        game = GeoGame(user.id, location.latitude, location.longitude, selected_mode)
-        games[user.id] = game
-        action = "начата"
+        game = create_game(user.id, location.latitude, location.longitude, selected_mode)
+        action = "started"
     else:
         game = games[user.id]
-        action = "обновлена"
-        game.last_update = datetime.now()
-    
-    # Формируем данные для передачи в Web App
-    geospots_data = []
-    for i, spot in enumerate(game.geospots):
-        geospots_data.append({
-            'id': i,
-            'lat': spot['coords'][0],
-            'lon': spot['coords'][1],
-            'has_prize': spot['has_prize'],
-            'prize_amount': spot['prize_amount'],
-            'found': spot['found']
-        })
-    
-    # Кодируем данные в JSON и URL-формат
-    geospots_json = json.dumps(geospots_data)
-    geospots_encoded = urllib.parse.quote(geospots_json)
-    
-    # Формируем URL для Web App
-    web_app_url = f"https://sevryuk88.github.io/GeoHunter-/geohtml.html?center_lat={location.latitude}&center_lon={location.longitude}&radius={SEARCH_RADIUS}&geospots={geospots_encoded}&mode={selected_mode}"
-    
-    # Формируем ссылку на статическую карту с метками
-    yandex_map_url = (
-        f"https://static-maps.yandex.ru/1.x/?ll={location.longitude},{location.latitude}"
-        f"&size=650,450"
-        f"&z=17"
-        f"&l=map"
-        f"&pt={location.longitude},{location.latitude},pm2rdl"
-    )
-    
-    # Добавляем метки геометок
-    for i, spot in enumerate(game.geospots):
-        lat, lon = spot['coords']
-        color = "pm2gnl" if not spot['found'] else "pm2bll"
-        yandex_map_url += f"~{lon},{lat},{color}{i+1}"
+        action = "updated"
+        game.touch()
     
-    response_text = (
-        f"🎉 Игра {action}! 🎉\n\n"
-        f"Режим: {mode_config['name']}\n"
-        f"В радиусе {SEARCH_RADIUS} м от тебя спрятаны {len(game.geospots)} геометок.\n"
-        f"Из них {sum(1 for s in game.geospots if s['has_prize'])} содержат призы!\n\n"
-        f"<a href='{yandex_map_url}'>🗺️ Посмотреть карту с метками</a>\n\n"
-        "Нажми кнопку ниже, чтобы открыть интерактивную карту и начать поиск!"
-    )
+    # Неправдоподобное перемещение не проверяем на находки
+    plausible = check_trajectory(user.id, user_coords)
     
-    # Создаем клавиатуру с Web App кнопкой
-    keyboard = [
-        [InlineKeyboardButton("🌎 Открыть интерактивную карту", web_app=WebAppInfo(url=web_app_url))],
-        [InlineKeyboardButton("📍 Включить трансляцию", callback_data='start_live_location')],
-        [InlineKeyboardButton("📊 Моя статистика", callback_data='user_stats')],
-        [InlineKeyboardButton("❌ Завершить игру", callback_data='cancel_game')],
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    response_text, reply_markup = build_location_message(game, location.latitude, location.longitude, action,
+                                                         user_language(user))
     
     await context.bot.send_message(
         chat_id=update.effective_chat.id,
@@ -929,8 +1342,8 @@ async def handle_location(update: Update, context: CallbackContext) -> None:
     )
     
     # Если включена трансляция, сразу проверяем позицию
-    if game.live_location_active:
-        logger.info("Checking proximity immediately after location update")
+    if game.live_location_active and plausible:
+        events.log('proximity_check', user_id=user.id, source='location')
         await check_proximity_and_respond(update, context, user_coords, game)
         
 
@@ -948,23 +1361,25 @@ async def handle_live_location(update: Update, context: CallbackContext) -> None
     # Сохраняем последнее местоположение
     context.user_data['last_location'] = user_coords
     
-    logger.info(f"Received live location from user {user.id}: {user_coords}")
+    events.log('live_location', user_id=user.id, coords=user_coords)
 
     if user.id not in games:
         logger.warning(f"No active game for user: {user.id}")
         return
 
     game = games[user.id]
+    game.touch()
     
     # АКТИВИРУЕМ трансляцию автоматически при получении live location!
     if not game.live_location_active:
         game.live_location_active = True
         logger.info(f"Auto-activated live location for user {user.id}")
     
-    logger.info(f"Game found for user: {user.id}, live status: {game.live_location_active}")
-
+    if not check_trajectory(user.id, user_coords):
+        return
+    
     # Проверяем близость к геометкам
-    logger.info("Checking proximity for live location...")
+    events.log('proximity_check', user_id=user.id, source='live_location')
     await check_proximity_and_respond(update, context, user_coords, game)
     
     
@@ -972,11 +1387,13 @@ async def handle_live_location(update: Update, context: CallbackContext) -> None
 async def check_proximity_and_respond(update: Update, context: CallbackContext, 
                                      user_coords: tuple, game: GeoGame) -> None:
     """Проверка близости и отправка уведомления"""
-    proximity_results = game.check_proximity(user_coords)
+    with tracing.span('geo', 'check_proximity'):
+        proximity_results = game.check_proximity(user_coords)
     
     if not proximity_results:
-        logger.info("No proximity results")
+        events.log('proximity', user_id=game.user_id, results=0)
         return
+    lang = user_language(update.effective_user)
     
     for result in proximity_results:
         spot = result['spot']
@@ -987,7 +1404,7 @@ async def check_proximity_and_respond(update: Update, context: CallbackContext,
         last_progress = game.last_proximity_check.get(spot_id, 0)
         
         if abs(progress - last_progress) < 10 and not result['is_close']:
-            logger.info(f"Progress for spot didn't change significantly ({progress} vs {last_progress})")
+            events.log('proximity', user_id=game.user_id, progress=progress, last_progress=last_progress)
             continue
             
         game.last_proximity_check[spot_id] = progress
@@ -1004,37 +1421,39 @@ async def check_proximity_and_respond(update: Update, context: CallbackContext,
                     logger.error(f"Error deleting progress message: {e}")
                 del context.user_data['progress_message_id']
             
-            # Проверяем, не найдена ли уже эта метка
-            if spot['found']:
-                continue
-                
-            spot['found'] = True
-            game.found_spots.append(spot)
+            # Игрок с неправдоподобной траекторией остается без призов
+            excluded = trajectories.excluded(game.user_id)
+            
+            def prize_for(spot):
+                # Джекпот разыгрывается только если метку забрал этот вызов
+                if excluded:
+                    return 0, None
+                if random.random() < JACKPOT_PROBABILITY:
+                    return round(jackpot_pool.claim(), 2), "jackpot_won"
+                return game.spot_prize(spot)
             
-            prize = 0
-            message_text = ""
-            jackpot_won = False
-
-            # Проверяем джекпот
-            if random.random() < JACKPOT_PROBABILITY:
-                jackpot_won = True
-                prize = JACKPOT_POOL
-                JACKPOT_POOL = 100
-                global_stats['jackpot_wins'] += 1
+            # Метку мог уже забрать другой путь (веб-приложение, API)
+            claimed = game.claim_spot(game.geospots.index(spot), prize_for)
+            if claimed is None:
+                continue
+            prize, transaction_type, delta = claimed
+            economy.record_spot(game.game_mode, spot['has_prize'])
+            jackpot_won = transaction_type == "jackpot_won"
+            balance = user_balances.get(game.user_id, 0)
+
+            if excluded:
+                message_text = messages.text(lang, 'spot.excluded')
+
+            elif jackpot_won:
                 logger.info(f"JACKPOT WON! User {game.user_id} won {prize} rubles!")
-                user_balances[game.user_id] += prize
-                log_transaction(game.user_id, prize, "jackpot_won")
-                message_text = random.choice(JACKPOT_MESSAGES).format(prize=prize)
-                message_text += f"\n\n💰 Твой баланс: {user_balances[game.user_id]} руб.!"
-                message_text += "\n\n🎆 Это невероятная удача! 🎆"
-
-            elif spot['has_prize']:
-                prize = spot['prize_amount']
-                user_balances[game.user_id] += prize
-                log_transaction(game.user_id, prize, "prize_won")
-                message_text = random.choice(WIN_MESSAGES).format(prize=prize)
-                message_text += f"\n\n💰 Твой баланс: {user_balances[game.user_id]} руб.!"
-                message_text += "\n\n🎯 Продолжай в том же духе!"
+                message_text = messages.choice(lang, 'spot.jackpot', prize=prize)
+                message_text += messages.text(lang, 'spot.balance', balance=balance)
+                message_text += messages.text(lang, 'spot.jackpot_footer')
+
+            elif prize:
+                message_text = messages.choice(lang, 'spot.win', prize=prize)
+                message_text += messages.text(lang, 'spot.balance', balance=balance)
+                message_text += messages.text(lang, 'spot.win_footer')
 
                 # Обновляем статистику пользователя
                 if game.user_id in user_stats:
@@ -1042,9 +1461,8 @@ async def check_proximity_and_respond(update: Update, context: CallbackContext,
                     user_stats[game.user_id]['xp'] = user_stats[game.user_id].get('xp', 0) + XP_PER_WIN
 
             else:
-                prize = 0
-                message_text = random.choice(EMPTY_MESSAGES)
-                near_miss = generate_near_miss()
+                message_text = messages.choice(lang, 'spot.empty')
+                near_miss = generate_near_miss(lang)
                 if near_miss:
                     message_text += f"\n\n💫 {near_miss}"
 
@@ -1052,15 +1470,19 @@ async def check_proximity_and_respond(update: Update, context: CallbackContext,
                 user_stats[game.user_id]['prizes_won'] = user_stats[game.user_id].get('prizes_won', 0) + 1
                 user_stats[game.user_id]['xp'] = user_stats[game.user_id].get('xp', 0) + XP_PER_WIN
 
+            # Дельта для веб-клиентов
+            leaderboards.record(game.user_id, winnings=prize, spots=1, name=update.effective_user.first_name)
+            await manager.send_personal_message(delta, game.user_id)
+
             # Отправляем эффектное сообщение о находке
             try:
                 await context.bot.send_message(
                     chat_id=update.effective_chat.id,
                     text=message_text,
                     parse_mode='HTML',
-                    reply_markup=get_live_location_keyboard()
+                    reply_markup=get_live_location_keyboard(lang)
                 )
-                logger.info(f"Message sent to user {game.user_id}: {message_text}")
+                events.log('message_sent', user_id=game.user_id, kind='spot_found', prize=prize)
             except Exception as e:
                 logger.error(f"Failed to send message to user {game.user_id}: {e}")
 
@@ -1074,11 +1496,7 @@ async def check_proximity_and_respond(update: Update, context: CallbackContext,
             # Код для отображения прогресса
             progress_bar = "🟩" * (progress // 10) + "⬜️" * (10 - progress // 10)
             
-            progress_text = (
-                f"🔔 Ты близко к геометке! 🔔\n"
-                f"Расстояние: {distance:.1f} м\n"
-                f"Прогресс: {progress_bar} {progress}%"
-            )
+            progress_text = messages.text(lang, 'spot.progress', distance=distance, bar=progress_bar, progress=progress)
             
             if 'progress_message_id' in context.user_data:
                 try:
@@ -1086,21 +1504,21 @@ async def check_proximity_and_respond(update: Update, context: CallbackContext,
                         chat_id=update.effective_chat.id,
                         message_id=context.user_data['progress_message_id'],
                         text=progress_text,
-                        reply_markup=get_live_location_keyboard()
+                        reply_markup=get_live_location_keyboard(lang)
                     )
                 except Exception as e:
                     logger.error(f"Error editing progress message: {e}")
                     msg = await context.bot.send_message(
                         chat_id=update.effective_chat.id,
                         text=progress_text,
-                        reply_markup=get_live_location_keyboard()
+                        reply_markup=get_live_location_keyboard(lang)
                     )
                     context.user_data['progress_message_id'] = msg.message_id
             else:
                 msg = await context.bot.send_message(
                     chat_id=update.effective_chat.id,
                     text=progress_text,
-                    reply_markup=get_live_location_keyboard()
+                    reply_markup=get_live_location_keyboard(lang)
                 )
                 context.user_data['progress_message_id'] = msg.message_id
     
@@ -1110,14 +1528,9 @@ async def check_proximity_and_respond(update: Update, context: CallbackContext,
         total_prize = sum(s['prize_amount'] for s in game.found_spots if s['has_prize'])
         game_time = datetime.now() - game.start_time
         
-        completion_text = (
-            "🏆 ТЫ НАШЕЛ ВСЕ ГЕОМЕТКИ! 🏆\n\n"
-            f"Режим: {game.mode_config['name']}\n"
-            f"Общее время: {game_time.seconds // 60} мин {game_time.seconds % 60} сек\n"
-            f"Найденные призы: {prize_count}\n"
-            f"Сумма выигрыша: {total_prize} руб.\n\n"
-            "Хочешь сыграть еще раз?"
-        )
+        completion_text = messages.text(
+            lang, 'game.completed', mode=messages.text(lang, f'mode.{game.game_mode}'),
+            minutes=game_time.seconds // 60, seconds=game_time.seconds % 60, prizes=prize_count, total=total_prize)
         
         if 'progress_message_id' in context.user_data:
             try:
@@ -1129,31 +1542,31 @@ async def check_proximity_and_respond(update: Update, context: CallbackContext,
                 logger.error(f"Error deleting progress message: {e}")
             del context.user_data['progress_message_id']
         
-        user_id = game.user_id
-        del games[user_id]
+        end_game(game.user_id)
         
         await context.bot.send_message(
             chat_id=update.effective_chat.id,
             text=completion_text,
-            reply_markup=get_main_menu_keyboard()
+            reply_markup=get_main_menu_keyboard(lang)
         )
         
         
         
 async def handle_text(update: Update, context: CallbackContext) -> None:
     user = update.effective_user
+    lang = user_language(user)
     
     if user.id in games:
         await context.bot.send_message(
             chat_id=update.effective_chat.id,
-            text="Используйте кнопки для управления игрой:",
-            reply_markup=get_game_keyboard()
+            text=messages.text(lang, 'text.in_game'),
+            reply_markup=get_game_keyboard(lang)
         )
     else:
         await context.bot.send_message(
             chat_id=update.effective_chat.id,
-            text="Привет! Я бот для поиска геометок. Начни игру с помощью /start",
-            reply_markup=get_main_menu_keyboard()
+            text=messages.text(lang, 'text.hello'),
+            reply_markup=get_main_menu_keyboard(lang)
         )
         
 # ========== ОБРАБОТЧИКИ ==========
@@ -1162,8 +1575,10 @@ async def handle_text(update: Update, context: CallbackContext) -> None:
 async def web_app_data(update: Update, context: CallbackContext) -> None:
     """Обработка данных из Web App"""
     try:
-        data = json.loads(update.effective_message.web_app_data.data)
+        # Компактный формат версии 2 (массив) или прежний JSON-объект
+        data = webapp_payload.decode_payload(update.effective_message.web_app_data.data)
         user = update.effective_user
+        lang = user_language(user)
         action = data.get('action')
         
         if action == 'start_game':
@@ -1177,60 +1592,43 @@ async def web_app_data(update: Update, context: CallbackContext) -> None:
             if user.id not in user_balances or user_balances[user.id] < mode_config['entry_fee']:
                 await context.bot.send_message(
                     chat_id=update.effective_chat.id,
-                    text=f"❌ Недостаточно средств для игры в режиме {mode_config['name']}",
-                    reply_markup=get_main_menu_keyboard()
+                    text=messages.text(lang, 'webapp.no_funds', mode=messages.text(lang, f'mode.{game_mode}')),
+                    reply_markup=get_main_menu_keyboard(lang)
                 )
                 return
             
             # Создаем игру
-            game = GeoGame(user.id, lat, lon, game_mode)
-            games[user.id] = game
+            end_game(user.id)
+            game = create_game(user.id, lat, lon, game_mode)
             
-            # Подготавливаем данные для отправки в Web App
-            geospots_data = []
-            for i, spot in enumerate(game.geospots):
-                geospots_data.append({
-                    'id': i,
-                    'lat': spot['coords'][0],
-                    'lon': spot['coords'][1],
-                    'has_prize': spot['has_prize'],
-                    'prize_amount': spot['prize_amount']
-                })
-            
-            # Отправляем данные обратно в Web App
+            # Веб-приложение загрузит метки по токену, призы остаются на сервере
             await context.bot.send_message(
                 chat_id=update.effective_chat.id,
-                text=json.dumps({
-                    'status': 'success',
-                    'game_data': {
-                        'geospots': geospots_data,
-                        'center': [lat, lon],
-                        'radius': SEARCH_RADIUS
-                    }
-                }),
-                parse_mode='HTML'
+                text=messages.text(lang, 'webapp.game_created'),
+                reply_markup=InlineKeyboardMarkup([
+                    [InlineKeyboardButton(messages.text(lang, 'btn.open_interactive_map'),
+                                          web_app=WebAppInfo(url=game.web_app_url(lang)))]
+                ])
             )
             
         elif action == 'found_spot':
-            # Обработка найденной геометки
-            spot_id = data.get('spot_id')
-            if user.id in games:
-                game = games[user.id]
-                if 0 <= spot_id < len(game.geospots) and not game.geospots[spot_id]['found']:
-                    game.geospots[spot_id]['found'] = True
-                    game.found_spots.append(game.geospots[spot_id])
+            # Обработка найденной геометки: засчитывается, только если игрок рядом с ней
+            # (те же проверки траектории и расстояния, что и в /api/check_location)
+            game = games.get(user.id)
+            if game is not None:
+                claimed = claim_nearby_spot(game, data.get('coords') or (), data.get('spot_id'))
+                if claimed is not None:
+                    _, (prize, _, delta) = claimed
+                    
+                    leaderboards.record(user.id, winnings=prize, spots=1, name=user.first_name)
+                    await manager.send_personal_message(delta, user.id)
                     
-                    # Начисляем приз, если есть
-                    if game.geospots[spot_id]['has_prize']:
-                        prize = game.geospots[spot_id]['prize_amount']
-                        user_balances[user.id] += prize
-                        log_transaction(user.id, prize, "prize_won")
-                        
+                    if prize:
                         # Отправляем уведомление о выигрыше
                         await context.bot.send_message(
                             chat_id=update.effective_chat.id,
-                            text=f"🎉 Поздравляем! Вы нашли геометку с призом {prize} руб.!",
-                            reply_markup=get_main_menu_keyboard()
+                            text=messages.text(lang, 'webapp.prize', prize=prize),
+                            reply_markup=get_main_menu_keyboard(lang)
                         )
     
     except Exception as e:
@@ -1245,27 +1643,28 @@ async def web_interface(update: Update, context: CallbackContext) -> None:
     # Формируем URL с данными пользователя
     web_app_url = f"https://sevryuk88.github.io/GeoHunter-/geohtml.html/?user_id={user.id}"
     
+    lang = user_language(user)
     keyboard = [
-        [InlineKeyboardButton("🌎 Открыть веб-интерфейс", web_app=WebAppInfo(url=web_app_url))],
+        [InlineKeyboardButton(messages.text(lang, 'btn.open_web'), web_app=WebAppInfo(url=web_app_url))],
     ]
     
     await context.bot.send_message(
         chat_id=update.effective_chat.id,
-        text="Откройте веб-интерфейс для игры:",
+        text=messages.text(lang, 'webapp.open'),
         reply_markup=InlineKeyboardMarkup(keyboard)
     )
 
 
 #новый
 
-async def user_stats(update: Update, context: CallbackContext) -> None:
+async def show_user_stats(update: Update, context: CallbackContext) -> None:
     query = update.callback_query
     user = query.from_user
     await query.answer()
+    lang = user_language(user)
     
     if user.id not in games:
-        stats_text = "У тебя нет активной игры. Начни новую игру!"
-        await query.edit_message_text(stats_text, reply_markup=get_back_keyboard())
+        await query.edit_message_text(messages.text(lang, 'game.none'), reply_markup=get_back_keyboard(lang))
         return
     
     game = games[user.id]
@@ -1275,22 +1674,18 @@ async def user_stats(update: Update, context: CallbackContext) -> None:
     prize_count = len([s for s in game.found_spots if s['has_prize']])
     total_prize = sum(s['prize_amount'] for s in game.found_spots if s['has_prize'])
     
-    stats_text = (
-        "📊 Твоя статистика:\n\n"
-        f"Режим: {game.mode_config['name']}\n"
-        f"🔍 Найдено геометок: {found}/{total}\n"
-        f"🎁 Найдено призов: {prize_count}\n"
-        f"💰 Сумма выигрыша: {total_prize} руб.\n"
-        f"⏱ Время игры: {time_elapsed.seconds // 60} мин {time_elapsed.seconds % 60} сек\n\n"
-        f"📍 Центр поиска: {game.center[0]:.5f}, {game.center[1]:.5f}"
-    )
+    stats_text = messages.text(
+        lang, 'game.stats', mode=messages.text(lang, f'mode.{game.game_mode}'), found=found, total=total,
+        prizes=prize_count, winnings=total_prize, minutes=time_elapsed.seconds // 60,
+        seconds=time_elapsed.seconds % 60, lat=game.center[0], lon=game.center[1])
     
-    await query.edit_message_text(stats_text, reply_markup=get_back_keyboard())
+    await query.edit_message_text(stats_text, reply_markup=get_back_keyboard(lang))
 
 async def cancel_game(update: Update, context: CallbackContext) -> None:
     query = update.callback_query
     user = query.from_user
     await query.answer()
+    lang = user_language(user)
     
     if user.id in games:
         game = games[user.id]
@@ -1299,20 +1694,15 @@ async def cancel_game(update: Update, context: CallbackContext) -> None:
         prize_count = len([s for s in game.found_spots if s['has_prize']])
         total_prize = sum(s['prize_amount'] for s in game.found_spots if s['has_prize'])
         
-        del games[user.id]
-        response = (
-            "❌ Игра завершена досрочно!\n\n"
-            f"Режим: {game.mode_config['name']}\n"
-            f"🔍 Ты нашел {found} из {total} геометок\n"
-            f"🎁 Призов найдено: {prize_count}\n"
-            f"💰 Сумма выигрыша: {total_prize} руб.\n\n"
-            "Можешь начать новую игру в любое время!"
-        )
+        end_game(user.id)
+        response = messages.text(
+            lang, 'game.cancelled', mode=messages.text(lang, f'mode.{game.game_mode}'), found=found, total=total,
+            prizes=prize_count, winnings=total_prize)
         logger.info(f"Game canceled for user {user.id}")
     else:
-        response = "У тебя нет активной игры."
+        response = messages.text(lang, 'game.no_active')
     
-    await query.edit_message_text(response, reply_markup=get_main_menu_keyboard())
+    await query.edit_message_text(response, reply_markup=get_main_menu_keyboard(lang))
 
 
 async def button_handler(update: Update, context: CallbackContext) -> None:
@@ -1327,7 +1717,7 @@ async def button_handler(update: Update, context: CallbackContext) -> None:
     elif data == 'show_rules':
         await rules(update, context)
     elif data == 'user_stats':
-        await user_stats(update, context)
+        await show_user_stats(update, context)
     elif data == 'make_deposit':
         await handle_deposit(update, context)
     elif data == 'check_balance':
@@ -1340,6 +1730,9 @@ async def button_handler(update: Update, context: CallbackContext) -> None:
         await process_deposit(update, context, 50)
     elif data == 'deposit_100':
         await process_deposit(update, context, 100)
+    elif data.startswith('hist|'):
+        _, code, cursor = data.split('|', 2)
+        await show_history(update, context, code, cursor)
     elif data == 'cancel_game':
         await cancel_game(update, context)
     elif data == 'main_menu':
@@ -1363,23 +1756,34 @@ async def button_handler(update: Update, context: CallbackContext) -> None:
 async def main_menu(update: Update, context: CallbackContext) -> None:
     query = update.callback_query
     await query.answer()
-    await query.edit_message_text("Выбери действие:", reply_markup=get_main_menu_keyboard())
+    lang = user_language(query.from_user)
+    await query.edit_message_text(messages.text(lang, 'choose_action'), reply_markup=get_main_menu_keyboard(lang))
 
 async def send_location_prompt(update: Update, context: CallbackContext) -> None:
     query = update.callback_query
     await query.answer()
-    await query.edit_message_text(
-        "Пожалуйста, отправь свою текущую геопозицию через меню Telegram:",
-        reply_markup=InlineKeyboardMarkup([
-            [InlineKeyboardButton("🔙 Назад", callback_data='back_to_game')]
-        ])
-    )
+    lang = user_language(query.from_user)
+    await query.edit_message_text(messages.text(lang, 'game.send_location'), reply_markup=get_keyboard('back_to_game', lang))
+
+async def set_language(update: Update, context: CallbackContext) -> None:
+    """/language ru|en — язык сообщений бота"""
+    user = update.effective_user
+    if not context.args or context.args[0].lower() not in messages.LANGUAGES:
+        await update.message.reply_text(
+            messages.text(user_language(user), 'language.usage', languages='|'.join(messages.LANGUAGES)))
+        return
+    lang = context.args[0].lower()
+    user_languages[user.id] = lang
+    # Выбор переживает вытеснение статистики и перезапуск бота
+    await asyncio.to_thread(db.set_language, user.id, lang)
+    await update.message.reply_text(messages.text(lang, 'language.set'), reply_markup=get_main_menu_keyboard(lang))
 
 async def admin_stats(update: Update, context: CallbackContext) -> None:
+    lang = user_language(update.effective_user)
     if str(update.effective_user.id) != ADMIN_ID:
         await context.bot.send_message(
             chat_id=update.effective_chat.id,
-            text="Эта команда только для администратора"
+            text=messages.text(lang, 'admin.only')
         )
         return
     
@@ -1389,18 +1793,17 @@ async def admin_stats(update: Update, context: CallbackContext) -> None:
     else:
         house_edge_actual = 0
     
-    stats_text = (
-        f"📊 Админ-статистика GeoHunter:\n\n"
-        f"• Активных игр: {len(games)}\n"
-        f"• Уникальных игроков: {len(global_stats['active_players'])}\n"
-        f"• Всего игр: {global_stats['total_games']}\n"
-        f"• Общие депозиты: {global_stats['total_deposits']} руб.\n"
-        f"• Общие выигрыши: {global_stats['total_prizes']} руб.\n"
-        f"• Доход: {global_stats['total_revenue']} руб.\n"
-        f"• Фактическое преимущество: {house_edge_actual:.2%}\n"
-        f"• Размер джекпота: {JACKPOT_POOL} руб.\n"
-        f"• Выигрышей джекпота: {global_stats['jackpot_wins']}\n\n"
-        f"Текущие игры:\n"
+    stats_text = messages.text(
+        lang, 'admin.stats',
+        games=len(games),
+        players=len(global_stats['active_players']),
+        total_games=global_stats['total_games'],
+        deposits=global_stats['total_deposits'],
+        prizes=global_stats['total_prizes'],
+        revenue=global_stats['total_revenue'],
+        house_edge=house_edge_actual,
+        jackpot=jackpot_pool.amount,
+        jackpot_wins=jackpot_pool.wins,
     )
     
     for user_id, game in games.items():
@@ -1408,13 +1811,18 @@ async def admin_stats(update: Update, context: CallbackContext) -> None:
         total = len(game.geospots)
         time_elapsed = datetime.now() - game.start_time
         live_status = "✅" if game.live_location_active else "❌"
-        stats_text += (
-            f"👤 Пользователь: {user_id}\n"
-            f"🎮 Режим: {game.mode_config['name']}\n"
-            f"🔍 Найдено: {found}/{total}\n"
-            f"⏱ Время: {time_elapsed.seconds // 60} мин\n"
-            f"📍 Трансляция: {live_status}\n"
-            f"📍 Центр: {game.center[0]:.5f}, {game.center[1]:.5f}\n\n"
+        idle = datetime.now() - game.last_update
+        stats_text += messages.text(
+            lang, 'admin.stats_game',
+            user_id=user_id,
+            mode=messages.text(lang, f'mode.{game.game_mode}'),
+            found=found,
+            total=total,
+            minutes=time_elapsed.seconds // 60,
+            idle=idle.seconds // 60,
+            live=live_status,
+            lat=game.center[0],
+            lon=game.center[1],
         )
     
     await context.bot.send_message(
@@ -1422,13 +1830,148 @@ async def admin_stats(update: Update, context: CallbackContext) -> None:
         text=stats_text
     )
 
+async def admin_memory(update: Update, context: CallbackContext) -> None:
+    """Отчет о памяти внутрипроцессных структур"""
+    lang = user_language(update.effective_user)
+    if str(update.effective_user.id) != ADMIN_ID:
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id,
+            text=messages.text(lang, 'admin.only')
+        )
+        return
+    
+    report = stats.memory_report({
+        'games': games,
+        'user_balances': user_balances,
+        'user_stats': user_stats,
+        'user_achievements': user_achievements,
+        'limits': limits,
+        'trajectories': trajectories,
+        'leaderboards': leaderboards.boards,
+        'active_players': global_stats['active_players'],
+    })
+    
+    totals = limits.totals()
+    await context.bot.send_message(
+        chat_id=update.effective_chat.id,
+        text=messages.text(lang, 'admin.memory', report=report, rolled=limits.rolled,
+                           total_games=global_stats['total_games'],
+                           deposited=round(totals.get('amount_deposited', 0), 2))
+    )
+
+def write_export(path: str, table: str, start: str, end: str, fmt: str) -> None:
+    ledger_writer.flush()
+    with open(path, 'wb') as f:
+        for chunk in ledger_export.stream_export(DB_NAME, table, start, end, fmt):
+            f.write(chunk)
+
+async def admin_export(update: Update, context: CallbackContext) -> None:
+    """Выгрузка журнала файлом: /export transactions|games [начало] [конец] [csv|ndjson]"""
+    lang = user_language(update.effective_user)
+    if str(update.effective_user.id) != ADMIN_ID:
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id,
+            text=messages.text(lang, 'admin.only')
+        )
+        return
+    
+    args = list(context.args or [])
+    fmt = args.pop() if args and args[-1] in ledger_export.FORMATS else 'csv'
+    if not args or args[0] not in ledger_export.EXPORT_TABLES:
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id,
+            text=messages.text(lang, 'admin.export_usage')
+        )
+        return
+    table = args[0]
+    start = args[1] if len(args) > 1 else None
+    end = args[2] if len(args) > 2 else None
+    
+    # Файл пишется на диск в отдельном потоке, в памяти только текущая пачка
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, f"{table}_{start or 'all'}_{end or 'now'}.{fmt}")
+        await asyncio.to_thread(write_export, path, table, start, end, fmt)
+        with open(path, 'rb') as f:
+            await context.bot.send_document(chat_id=update.effective_chat.id, document=f)
+
+async def admin_verbose(update: Update, context: CallbackContext) -> None:
+    """Переключение подробных логов горячих путей: /verbose on|off"""
+    lang = user_language(update.effective_user)
+    if str(update.effective_user.id) != ADMIN_ID:
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id,
+            text=messages.text(lang, 'admin.only')
+        )
+        return
+    
+    if context.args and context.args[0] in ('on', 'off'):
+        log_events.set_verbose(context.args[0] == 'on')
+    
+    dropped = sum(events.dropped.values())
+    await context.bot.send_message(
+        chat_id=update.effective_chat.id,
+        text=messages.text(lang, 'admin.verbose_on' if log_events.HOT_PATH_VERBOSE else 'admin.verbose_off',
+                           dropped=dropped)
+    )
+
+PROFILE_MAX_SECONDS = 300
+
+async def admin_profile(update: Update, context: CallbackContext) -> None:
+    """Сэмплирующий профилировщик: /profile N или /profile stop"""
+    lang = user_language(update.effective_user)
+    if str(update.effective_user.id) != ADMIN_ID:
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id,
+            text=messages.text(lang, 'admin.only')
+        )
+        return
+    
+    chat_id = update.effective_chat.id
+    
+    async def send_profile():
+        folded = tracing.profiler.stop()
+        await context.bot.send_document(
+            chat_id=chat_id,
+            document=io.BytesIO(folded.encode('utf-8')),
+            filename=f"profile_{datetime.now():%Y%m%d_%H%M%S}.folded",
+            caption=messages.text(lang, 'admin.profile_caption')
+        )
+    
+    if context.args and context.args[0] == 'stop':
+        if not tracing.profiler.running:
+            await context.bot.send_message(chat_id=chat_id, text=messages.text(lang, 'admin.profile_not_running'))
+            return
+        await send_profile()
+        return
+    
+    try:
+        seconds = min(int(context.args[0]), PROFILE_MAX_SECONDS) if context.args else 30
+    except ValueError:
+        await context.bot.send_message(chat_id=chat_id, text=messages.text(lang, 'admin.profile_usage'))
+        return
+    
+    if not tracing.profiler.start():
+        await context.bot.send_message(chat_id=chat_id, text=messages.text(lang, 'admin.profile_running'))
+        return
+    
+    run_id = tracing.profiler.run_id
+    
+    async def finish_later():
+        await asyncio.sleep(seconds)
+        if tracing.profiler.running and tracing.profiler.run_id == run_id:
+            await send_profile()
+    
+    asyncio.get_running_loop().create_task(finish_later())
+    await context.bot.send_message(chat_id=chat_id, text=messages.text(lang, 'admin.profile_started', seconds=seconds))
+
 async def force_check(update: Update, context: CallbackContext) -> None:
     user = update.effective_user
+    lang = user_language(user)
     
     if user.id not in games:
         await context.bot.send_message(
             chat_id=update.effective_chat.id,
-            text="У вас нет активной игры"
+            text=messages.text(lang, 'game.no_active')
         )
         return
         
@@ -1438,7 +1981,7 @@ async def force_check(update: Update, context: CallbackContext) -> None:
     if not hasattr(context, 'user_data') or 'last_location' not in context.user_data:
         await context.bot.send_message(
             chat_id=update.effective_chat.id,
-            text="Нет информации о вашем местоположении"
+            text=messages.text(lang, 'check.no_location')
         )
         return
         
@@ -1448,59 +1991,75 @@ async def force_check(update: Update, context: CallbackContext) -> None:
     await check_proximity_and_respond(update, context, user_coords, game)
     await context.bot.send_message(
         chat_id=update.effective_chat.id,
-        text="Проверка расстояния выполнена"
+        text=messages.text(lang, 'check.done')
     )
 
 async def check_jackpot(update: Update, context: CallbackContext) -> None:
     user = update.effective_user
     
-    jackpot_text = (
-        f"🎰 ТЕКУЩИЙ ДЖЕКПОТ: {JACKPOT_POOL} руб.! 🎰\n\n"
-        f"Шанс выигрыша: {JACKPOT_PROBABILITY*100}%\n"
-        "Джекпот растет с каждой игрой!\n\n"
-        "Для участия в розыгрыше джекпота\n"
-        "просто играйте в любом режиме!"
-    )
+    jackpot_text = messages.text(user_language(user), 'jackpot', amount=jackpot_pool.amount,
+                                 chance=JACKPOT_PROBABILITY * 100)
     
     await context.bot.send_message(
         chat_id=update.effective_chat.id,
         text=jackpot_text
     )
 
+async def show_leaderboard(update: Update, context: CallbackContext) -> None:
+    """Рейтинг игроков: /top [day|week|all] [spots]"""
+    user = update.effective_user
+    args = context.args or []
+    period = next((a for a in args if a in leaderboard.PERIODS), 'all')
+    metric = 'spots' if 'spots' in args else 'winnings'
+    
+    lang = user_language(user)
+    top = leaderboards.top(period, metric, 10)
+    text = messages.text(lang, 'top.title', period=messages.text(lang, f'top.period.{period}'),
+                         metric=messages.text(lang, f'top.metric.{metric}'))
+    if not top:
+        text += messages.text(lang, 'top.empty')
+    for place, user_id, name, score in top:
+        value = messages.text(lang, f'top.{metric}', score=int(score) if metric == 'spots' else score)
+        text += messages.text(lang, 'top.row', place=place, value=value,
+                              name=name or messages.text(lang, 'top.player', user_id=user_id))
+    
+    place, score = leaderboards.rank(user.id, period, metric)
+    if place:
+        text += messages.text(lang, 'top.your_place', place=place)
+    
+    await context.bot.send_message(
+        chat_id=update.effective_chat.id,
+        text=text
+    )
+
 async def handle_withdraw(update: Update, context: CallbackContext) -> None:
     query = update.callback_query
     user = query.from_user
     await query.answer()
     
+    lang = user_language(user)
     balance = user_balances.get(user.id, 0)
     
     if balance < 50:
-        withdraw_text = (
-            f"❌ Минимальная сумма для вывода: 50 руб.\n"
-            f"💰 Ваш текущий баланс: {balance} руб.\n\n"
-            "Продолжайте играть, чтобы накопить нужную сумму!"
-        )
+        withdraw_text = messages.text(lang, 'withdraw.too_small', minimum=50, balance=balance)
         
-        await query.edit_message_text(withdraw_text, reply_markup=get_back_keyboard())
+        await query.edit_message_text(withdraw_text, reply_markup=get_back_keyboard(lang))
         return
     
     # Здесь должна быть интеграция с платежной системой
     # Для демо-режима просто обнуляем баланс
     
-    user_balances[user.id] = 0
+    # Вычитаем прочитанную сумму: приз, начисленный тем временем, остается на балансе
+    adjust_balance(user.id, -balance)
     log_transaction(user.id, -balance, "withdrawal")
     
-    withdraw_text = (
-        f"✅ Запрос на вывод {balance} руб. принят!\n\n"
-        "Обычно обработка занимает до 24 часов.\n"
-        "Средства поступят на ваш счет в течение\n"
-        "рабочего дня после подтверждения."
-    )
+    withdraw_text = messages.text(lang, 'withdraw.accepted', amount=balance)
     
-    await query.edit_message_text(withdraw_text, reply_markup=get_main_menu_keyboard())
+    await query.edit_message_text(withdraw_text, reply_markup=get_main_menu_keyboard(lang))
 
 async def daily_bonus(update: Update, context: CallbackContext) -> None:
     user = update.effective_user
+    lang = user_language(user)
     
     # Инициализация статистики пользователя, если не существует
     if user.id not in user_stats:
@@ -1515,20 +2074,16 @@ async def daily_bonus(update: Update, context: CallbackContext) -> None:
     last_bonus_date = user_stats[user.id].get('last_bonus_date')
     
     if last_bonus_date == today:
-        bonus_text = "❌ Вы уже получали ежедневный бонус сегодня. Приходите завтра!"
+        bonus_text = messages.text(lang, 'bonus.already')
     else:
         # Начисляем бонус
         bonus_amount = random.randint(3, 10)
-        user_balances[user.id] += bonus_amount
+        adjust_balance(user.id, bonus_amount)
         log_transaction(user.id, bonus_amount, "daily_bonus")
         
         user_stats[user.id]['last_bonus_date'] = today
         
-        bonus_text = (
-            f"🎁 Ежедневный бонус: {bonus_amount} руб.! 🎁\n\n"
-            f"💰 Ваш баланс: {user_balances[user.id]} руб.\n"
-            "Возвращайтесь завтра за новым бонусом!"
-        )
+        bonus_text = messages.text(lang, 'bonus.received', amount=bonus_amount, balance=user_balances[user.id])
     
     await context.bot.send_message(
         chat_id=update.effective_chat.id,
@@ -1538,20 +2093,27 @@ async def daily_bonus(update: Update, context: CallbackContext) -> None:
 
 def run_fastapi():
     """Запуск FastAPI сервера в отдельном потоке"""
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    import uvicorn
+    uvicorn.run(get_app(), host="0.0.0.0", port=8000)
 
-def main() -> None:
-    # Запускаем FastAPI в отдельном потоке
-    fastapi_thread = threading.Thread(target=run_fastapi, daemon=True)
-    fastapi_thread.start()
-    
-    application = Application.builder().token(TOKEN).build()
+def build_application(builder=None) -> Application:
+    """Создание приложения бота со всеми обработчиками"""
+    if builder is None:
+        builder = Application.builder().token(TOKEN)
+    application = builder.request(InstrumentedRequest(connection_pool_size=256)).build()
 
     # Регистрация обработчиков
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("stats", admin_stats))
+    application.add_handler(CommandHandler("memory", admin_memory))
+    application.add_handler(CommandHandler("profile", admin_profile))
+    application.add_handler(CommandHandler("verbose", admin_verbose))
+    application.add_handler(CommandHandler("export", admin_export))
     application.add_handler(CommandHandler("check", force_check))
     application.add_handler(CommandHandler("jackpot", check_jackpot))
+    application.add_handler(CommandHandler("top", show_leaderboard))
+    application.add_handler(CommandHandler("history", show_history))
+    application.add_handler(CommandHandler("language", set_language))
     application.add_handler(CommandHandler("withdraw", handle_withdraw))
     application.add_handler(CommandHandler("bonus", daily_bonus))
     application.add_handler(CallbackQueryHandler(button_handler))
@@ -1567,11 +2129,50 @@ def main() -> None:
     application.add_handler(MessageHandler(filters.StatusUpdate.WEB_APP_DATA, web_app_data))
     
 
+    # Метрики латентности для всех обработчиков
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            handler.callback = metrics.instrument_handler(handler.callback)
+    
+    metrics.REGISTRY.gauge('geohunter_active_games', 'Активные игры', lambda: len(games))
+    metrics.REGISTRY.gauge('geohunter_websocket_connections', 'Открытые WebSocket-соединения',
+                           lambda: len(manager.active_connections))
+    metrics.REGISTRY.gauge('geohunter_update_queue_depth', 'Апдейты в очереди на обработку',
+                           lambda: application.update_queue.qsize())
+    metrics.REGISTRY.gauge('geohunter_outbound_inflight', 'Исходящие запросы к Bot API в полете',
+                           lambda: InstrumentedRequest.inflight)
+    
+    # Лимиты, джекпот и рейтинги переживают перезапуск
+    limits.open(STATE_DB)
+    jackpot_pool.open(STATE_DB)
+    leaderboards.open(STATE_DB)
+    tracing.startup.mark('state')
+    
+    # Накопленные транзакции, счетчики лимитов и очки рейтингов записываются при остановке
+    periodic.add_hook(application, 'post_shutdown', close_stores)
+    
+    # Периодическое вытеснение старой статистики, архивация журнала и истечение игр
+    periodic.run_repeating(application, stats_maintenance, STATS_SWEEP_INTERVAL, first=STATS_SWEEP_INTERVAL)
+    periodic.run_repeating(application, archive_ledger, ARCHIVE_INTERVAL, first=60)
+    periodic.run_repeating(application, game_expiry, GAME_EXPIRY_TICK, first=GAME_EXPIRY_TICK)
+    
+    tracing.startup.mark('application')
+    return application
+
+def main() -> None:
+    # Запускаем FastAPI в отдельном потоке
+    fastapi_thread = threading.Thread(target=run_fastapi, daemon=True)
+    fastapi_thread.start()
+    
+    application = build_application()
+    
     # Запуск бота
     logger.info("Бот запущен и работает...")
     logger.info("FastAPI сервер запущен на порту 8000")
     application.run_polling()
     
     
+tracing.startup.mark('module')
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
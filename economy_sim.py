@@ -0,0 +1,194 @@
+# economy_sim.py
+# Векторизованная Монте-Карло симуляция экономики режимов игры.
+# Использует живую конфигурацию из game_config.py и ту же логику призов, что GeoGame.
+#
+# Пример:
+#   python economy_sim.py --games 10000000
+#   python economy_sim.py --games 2000000 --check   # регрессионная проверка для CI
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+from game_config import (
+    GAME_MODES,
+    HOUSE_EDGE,
+    JACKPOT_CONTRIBUTION,
+    JACKPOT_PROBABILITY,
+    JACKPOT_SEED,
+    SPOTS_PER_GAME,
+    DEPOSIT_BONUSES,
+)
+
+DEFAULT_GAMES = 10_000_000
+DEFAULT_CHUNK = 1_000_000
+
+
+def prize_table(mode_config):
+    """Таблица призов и накопленных вероятностей, как в GeoGame.generate_prize_amount"""
+    distribution = mode_config['prize_distribution']
+    # Последний элемент — запасной минимальный приз, если накопленная вероятность < 1
+    prizes = np.array(list(distribution.keys()) + [mode_config['min_prize']], dtype=np.float64)
+    cumulative = np.cumsum(np.array(list(distribution.values()), dtype=np.float64))
+    return prizes, cumulative
+
+
+def expected_rtp(mode_config, spots=SPOTS_PER_GAME):
+    """Аналитическое RTP без учета джекпота"""
+    prizes, cumulative = prize_table(mode_config)
+    probabilities = np.diff(np.concatenate(([0.0], np.minimum(cumulative, 1.0))))
+    mean_prize = float(np.dot(prizes[:-1], probabilities)) + prizes[-1] * max(0.0, 1.0 - cumulative[-1])
+    return spots * mode_config['win_probability'] * mean_prize / mode_config['entry_fee']
+
+
+def simulate_mode(mode, games, rng, chunk=DEFAULT_CHUNK, find_rate=1.0, spots=SPOTS_PER_GAME):
+    """Симуляция games игр режима mode блоками по chunk игр"""
+    config = GAME_MODES[mode]
+    fee = float(config['entry_fee'])
+    prizes, cumulative = prize_table(config)
+    contribution = fee * JACKPOT_CONTRIBUTION
+
+    total_payout = 0.0
+    sum_net = 0.0
+    sum_net_sq = 0.0
+    jackpots = 0
+    jackpot_paid = 0.0
+    # Состояние между блоками: банкролл казино, его пик и счетчик игр с последнего джекпота
+    bankroll = 0.0
+    peak = 0.0
+    max_drawdown = 0.0
+    since_jackpot = 0
+
+    done = 0
+    while done < games:
+        n = min(chunk, games - done)
+
+        has_prize = rng.random((n, spots), dtype=np.float32) < config['win_probability']
+        prize_index = np.searchsorted(cumulative, rng.random((n, spots)), side='left')
+        spot_prizes = np.where(has_prize, prizes[prize_index], 0.0)
+        jackpot_spot = rng.random((n, spots)) < JACKPOT_PROBABILITY
+
+        if find_rate < 1.0:
+            found = rng.random((n, spots), dtype=np.float32) < find_rate
+            spot_prizes *= found
+            jackpot_spot &= found
+
+        # Джекпот заменяет приз метки, на которой выпал
+        payout = np.where(jackpot_spot, 0.0, spot_prizes).sum(axis=1)
+        jackpot_game = jackpot_spot.any(axis=1)
+
+        # Размер джекпота: начальная сумма плюс взносы всех игр с прошлого выигрыша
+        index = np.arange(n)
+        last = np.maximum.accumulate(np.where(jackpot_game, index, -1))
+        previous = np.concatenate(([-1], last[:-1]))
+        games_in_pool = np.where(previous >= 0, index - previous, since_jackpot + index + 1)
+        pool = JACKPOT_SEED + contribution * games_in_pool
+        payout += np.where(jackpot_game, pool, 0.0)
+        if last[-1] >= 0:
+            since_jackpot = n - 1 - int(last[-1])
+        else:
+            since_jackpot += n
+
+        # Результат игрока и банкролл казино
+        net = payout - fee
+        total_payout += float(payout.sum())
+        sum_net += float(net.sum())
+        sum_net_sq += float(np.dot(net, net))
+        jackpots += int(jackpot_game.sum())
+        jackpot_paid += float(pool[jackpot_game].sum())
+
+        house = bankroll - np.cumsum(net)
+        running_peak = np.maximum(np.maximum.accumulate(house), peak)
+        max_drawdown = max(max_drawdown, float((running_peak - house).max()))
+        bankroll = float(house[-1])
+        peak = float(running_peak[-1])
+
+        done += n
+
+    mean_net = sum_net / games
+    variance = sum_net_sq / games - mean_net * mean_net
+    return {
+        'mode': mode,
+        'games': games,
+        'entry_fee': fee,
+        'rtp': total_payout / (fee * games),
+        'rtp_expected_no_jackpot': expected_rtp(config, spots) * find_rate,
+        'player_mean_net': mean_net,
+        'player_variance': variance,
+        'player_std': variance ** 0.5,
+        'jackpots': jackpots,
+        'jackpot_frequency': jackpots / games,
+        'jackpot_paid': jackpot_paid,
+        'house_profit': bankroll,
+        'max_drawdown': max_drawdown,
+    }
+
+
+def deposit_bonus_rtp(rtp, entry_fee):
+    """Бонусы при пополнении в расчете на игру: сумма депозита -> (игр, бонус за игру $, RTP с бонусом).
+
+    Бонус делится на игры, которые оплачивает депозит, и прибавляется к выплате за игру;
+    депозит меньше взноса не оплачивает ни одной игры и пропускается"""
+    result = {}
+    for amount, bonus in DEPOSIT_BONUSES.items():
+        games = int(amount // entry_fee)
+        if games:
+            per_game = bonus / games
+            result[amount] = (games, per_game, rtp + per_game / entry_fee)
+    return result
+
+
+def format_report(results, elapsed):
+    lines = [f"Симуляция экономики GeoHunter (целевое преимущество казино {HOUSE_EDGE:.0%})", ""]
+    for r in results:
+        bonus = ", ".join(f"депозит {a}$ (игр: {games}): +{per_game:.3f}$ за игру, RTP {rtp:.2%}"
+                          for a, (games, per_game, rtp) in deposit_bonus_rtp(r['rtp'], r['entry_fee']).items())
+        lines += [
+            f"[{r['mode']}] игр: {r['games']:,}, взнос {r['entry_fee']:g}$",
+            f"  RTP: {r['rtp']:.2%} (аналитически без джекпота {r['rtp_expected_no_jackpot']:.2%})",
+            f"  Итог игрока за игру: {r['player_mean_net']:+.3f}$, σ = {r['player_std']:.3f}$",
+            f"  Джекпотов: {r['jackpots']} (1 на {1 / r['jackpot_frequency']:,.0f} игр)" if r['jackpots']
+            else "  Джекпотов: 0",
+            f"  Прибыль казино: {r['house_profit']:,.0f}$, макс. просадка: {r['max_drawdown']:,.0f}$",
+            f"  Бонусы при пополнении: {bonus or 'депозиты меньше взноса'}",
+            "",
+        ]
+    lines.append(f"Время: {elapsed:.1f} с")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Монте-Карло симуляция экономики GeoHunter")
+    parser.add_argument('--games', type=int, default=DEFAULT_GAMES, help="игр на режим")
+    parser.add_argument('--modes', nargs='*', default=list(GAME_MODES), choices=list(GAME_MODES))
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--chunk', type=int, default=DEFAULT_CHUNK)
+    parser.add_argument('--find-rate', type=float, default=1.0, help="доля найденных меток")
+    parser.add_argument('--max-rtp', type=float, default=None, help="порог RTP для регрессионной проверки")
+    parser.add_argument('--check', action='store_true', help=f"проверить RTP <= 1 - HOUSE_EDGE ({1 - HOUSE_EDGE:.2f})")
+    parser.add_argument('--json', action='store_true', help="вывод в JSON")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    started = time.perf_counter()
+    results = [simulate_mode(mode, args.games, rng, args.chunk, args.find_rate) for mode in args.modes]
+    elapsed = time.perf_counter() - started
+
+    if args.json:
+        print(json.dumps({'results': results, 'elapsed': elapsed}, ensure_ascii=False, indent=2))
+    else:
+        print(format_report(results, elapsed))
+
+    max_rtp = args.max_rtp if args.max_rtp is not None else (1 - HOUSE_EDGE if args.check else None)
+    if max_rtp is not None:
+        failed = [r for r in results if r['rtp'] > max_rtp]
+        for r in failed:
+            print(f"FAIL: {r['mode']} RTP {r['rtp']:.2%} > {max_rtp:.2%}", file=sys.stderr)
+        return 1 if failed else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,63 @@
+# game_config.py
+# Конфигурация экономики игры (общая для бота и инструментов симуляции)
+
+# Параметры режимов
+GAME_MODES = {
+    'economy': {
+        'name': '🟢 Эконом',
+        'entry_fee': 3,
+        'search_radius': 30,  # Радиус поиска меток веб-приложения, м
+        'min_prize': 1,
+        'max_prize': 10,
+        'win_probability': 0.12,  # 12%
+        'prize_distribution': {
+            1: 0.60,    # 60% chance
+            3: 0.25,    # 25% chance
+            5: 0.10,    # 10% chance
+            10: 0.05    # 5% chance
+        }
+    },
+    'standard': {
+        'name': '🔵 Стандарт',
+        'entry_fee': 5,
+        'search_radius': 50,
+        'min_prize': 3,
+        'max_prize': 15,
+        'win_probability': 0.18,  # 18%
+        'prize_distribution': {
+            3: 0.50,    # 50% chance
+            5: 0.25,    # 25% chance
+            10: 0.15,   # 15% chance
+            15: 0.10    # 10% chance
+        }
+    },
+    'premium': {
+        'name': '🟣 Премиум',
+        'entry_fee': 7,
+        'search_radius': 70,
+        'min_prize': 5,
+        'max_prize': 20,
+        'win_probability': 0.25,  # 25%
+        'prize_distribution': {
+            5: 0.45,   # 45% chance
+            10: 0.30,  # 30% chance
+            15: 0.15,  # 15% chance
+            20: 0.10   # 10% chance
+        }
+    }
+}
+
+# Общие параметры экономики
+HOUSE_EDGE = 0.12        # Преимущество казино (12%)
+JACKPOT_CONTRIBUTION = 0.02  # Взнос в джекпот (2%)
+JACKPOT_PROBABILITY = 0.0005  # Вероятность выигрыша джекпота (0.05%)
+
+JACKPOT_SEED = 100       # Начальный (и после выигрыша) размер джекпота
+
+SPOTS_PER_GAME = 5       # Геометок в одной игре
+
+# Бонусы при пополнении: сумма депозита -> бонус
+DEPOSIT_BONUSES = {
+    10: 1,
+    20: 3
+}
@@ -0,0 +1,74 @@
+# game_state.py
+# Версионированный протокол состояния игры: снимки, дельты, ETag и компактное кодирование
+import json
+from collections import deque
+
+try:
+    import msgpack  # Необязательная зависимость для бинарного формата
+except ImportError:
+    msgpack = None
+
+# Сколько последних дельт хранить на игру (старше — клиент получает полный снимок)
+DELTA_HISTORY_SIZE = 64
+
+# Короткие коды событий
+EVENT_SPOT_FOUND = 'f'
+EVENT_BALANCE = 'b'
+EVENT_PING = 'p'
+
+JSON_MEDIA_TYPE = 'application/json'
+MSGPACK_MEDIA_TYPE = 'application/msgpack'
+
+
+class GameStateLog:
+    """Журнал изменений состояния одной игры"""
+
+    def __init__(self, history_size=DELTA_HISTORY_SIZE):
+        self.version = 0
+        self.deltas = deque(maxlen=history_size)
+
+    def record(self, event, **fields):
+        """Записать дельту и увеличить версию состояния"""
+        self.version += 1
+        delta = {'v': self.version, 'e': event}
+        delta.update(fields)
+        self.deltas.append(delta)
+        return delta
+
+    def since(self, version):
+        """Дельты после указанной версии или None, если история уже вытеснена"""
+        if version >= self.version:
+            return []
+        if version < 0 or not self.deltas or self.deltas[0]['v'] > version + 1:
+            return None
+        # Дельты идут подряд, поэтому нужный срез вычисляется без перебора
+        start = len(self.deltas) - (self.version - version)
+        return [self.deltas[i] for i in range(start, len(self.deltas))]
+
+
+def make_etag(version, balance):
+    """ETag для состояния игры: версия плюс баланс (он меняется и вне игры)"""
+    return f'W/"{version}-{balance}"'
+
+
+def etag_matches(if_none_match, etag):
+    """Проверка заголовка If-None-Match"""
+    if not if_none_match:
+        return False
+    return any(tag.strip() in (etag, '*') for tag in if_none_match.split(','))
+
+
+def wants_msgpack(accept=None, fmt=None):
+    """Клиент запросил MessagePack (и он установлен)"""
+    if msgpack is None:
+        return False
+    if fmt:
+        return fmt == 'msgpack'
+    return bool(accept) and MSGPACK_MEDIA_TYPE in accept
+
+
+def encode(payload, binary=False):
+    """Кодирование сообщения: (тело, media type)"""
+    if binary and msgpack is not None:
+        return msgpack.packb(payload, use_bin_type=True), MSGPACK_MEDIA_TYPE
+    return json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8'), JSON_MEDIA_TYPE
@@ -0,0 +1,994 @@
+// geohtml.js
+// Логика веб-приложения GeoHunter (подключается из geohtml.html)
+const urlParams = new URLSearchParams(window.location.search);
+const userId = urlParams.get('user_id');
+const demoMode = urlParams.get('demo_mode') === 'True';
+// Токен серверной игры: метки загружаются из API, призы знает только сервер
+const gameToken = urlParams.get('token');
+const apiBase = urlParams.get('api') || '';
+
+
+    // Translations
+const translations = {
+    en: {
+        welcomeTitle: "GeoHunter",
+        welcomeSubtitle: "Find hidden treasures around you!",
+        getStarted: "Get Started",
+        viewRules: "View Rules",
+        chooseMode: "Choose Game Mode",
+        economy: "Economy",
+        standard: "Standard",
+        premium: "Premium",
+        prizes: "Prizes:",
+        winChance: "Win chance:",
+        selectMode: "Select Mode",
+        updateLocation: "Update Location",
+        endGame: "End Game",
+        addFunds: "Add Funds",
+        noBonus: "No bonus",
+        bonus1: "+1$ bonus",
+        bonus3: "+3$ bonus",
+        statistics: "Statistics",
+        gamesPlayed: "Games Played",
+        prizesWon: "Prizes Won",
+        totalWinnings: "Total Winnings",
+        timePlayed: "Time Played",
+        backToMenu: "Back to Menu",
+        gameRules: "Game Rules",
+        rule1: "Choose a game mode and make a deposit",
+        rule2: "Start the game by sharing your location",
+        rule3: "5 hidden geospots will be created within 100m radius",
+        rule4: "Move around and search for the spots",
+        rule5: "When you approach a spot, you'll get notifications",
+        rule6: "Find all spots and collect prizes!",
+        understand: "I Understand",
+        mapLoading: "Loading map...",
+        geospotsFound: "Found:",
+        approachingSpot: "Approaching geospot",
+        foundPrize: "🎉 Found prize: {prize}$!",
+        emptySpot: "🤷‍♂️ Empty spot",
+        gameCompleted: "🎊 Game completed! All spots found!",
+        gameCompletedTitle: "Game Completed!",
+        playAgain: "Play Again",
+        totalBalance: "Total Balance",
+        loadingLocation: "Getting your location...",
+        mapLoadError: "Failed to load maps. Please check your internet connection.",
+        retry: "Try again"
+    },
+    ru: {
+        welcomeTitle: "GeoHunter",
+        welcomeSubtitle: "Найди скрытые сокровища вокруг себя!",
+        getStarted: "Начать",
+        viewRules: "Правила",
+        chooseMode: "Выберите режим игры",
+        economy: "Эконом",
+        standard: "Стандарт",
+        premium: "Премиум",
+        prizes: "Призы:",
+        winChance: "Шанс выигрыша:",
+        selectMode: "Выбрать режим",
+        updateLocation: "Обновить позицию",
+        endGame: "Завершить игру",
+        addFunds: "Пополнить счет",
+        noBonus: "Без бонуса",
+        bonus1: "+1$ бонус",
+        bonus3: "+3$ бонус",
+        statistics: "Статистика",
+        gamesPlayed: "Сыграно игр",
+        prizesWon: "Выиграно призов",
+        totalWinnings: "Общий выигрыш",
+        timePlayed: "Время игры",
+        backToMenu: "В меню",
+        gameRules: "Правила игры",
+        rule1: "Выберите режим игры и внесите депозит",
+        rule2: "Запустите игру, отправив свою геопозицию",
+        rule3: "5 скрытых геометок будут созданы в радиусе 100м",
+        rule4: "Перемещайтесь и ищите метки",
+        rule5: "При приближении к метке вы получите уведомления",
+        rule6: "Найдите все метки и соберите призы!",
+        understand: "Понятно",
+        mapLoading: "Загрузка карты...",
+        geospotsFound: "Найдено:",
+        approachingSpot: "Приближаетесь к геометке",
+        foundPrize: "🎉 Найден приз: {prize}$!",
+        emptySpot: "🤷‍♂️ Пустая метка",
+        gameCompleted: "🎊 Игра завершена! Все метки найдены!",
+        gameCompletedTitle: "Игра Завершена!",
+        playAgain: "Играть снова",
+        totalBalance: "Общий баланс",
+        loadingLocation: "Получаем ваше местоположение...",
+        mapLoadError: "Не удалось загрузить карты. Проверьте подключение к интернету.",
+        retry: "Попробовать снова"
+    }
+};
+
+// Game modes configuration
+const GAME_MODES = {
+    'economy': {
+        'name': {en: 'Economy', ru: 'Эконом'},
+        'entry_fee': 3,
+        'min_prize': 1,
+        'max_prize': 10,
+        'win_probability': 0.12
+    },
+    'standard': {
+        'name': {en: 'Standard', ru: 'Стандарт'},
+        'entry_fee': 5,
+        'min_prize': 3,
+        'max_prize': 15,
+        'win_probability': 0.18
+    },
+    'premium': {
+        'name': {en: 'Premium', ru: 'Премиум'},
+        'entry_fee': 7,
+        'min_prize': 5,
+        'max_prize': 20,
+        'win_probability': 0.25
+    }
+};
+
+// Радиусы поиска (м) задает бот из game_config: ?radii=economy:30,standard:50,premium:70;
+// серверная игра присылает свой радиус в состоянии
+const DEFAULT_RADIUS = 50;
+for (const mode of Object.keys(GAME_MODES)) {
+    GAME_MODES[mode].radius = DEFAULT_RADIUS;
+}
+for (const item of (urlParams.get('radii') || '').split(',')) {
+    const [mode, radius] = item.split(':');
+    if (GAME_MODES[mode] && Number(radius) > 0) {
+        GAME_MODES[mode].radius = Number(radius);
+    }
+}
+
+// Game state
+// Язык из ссылки бота (?lang=ru), иначе английский
+let currentLanguage = translations[urlParams.get('lang')] ? urlParams.get('lang') : 'en';
+let selectedMode = null;
+let gameState = {
+    balance: 100,
+    mode: null,
+    center: null,
+    geospots: [],
+    foundSpots: [],
+    gameActive: false,
+    userMarker: null,
+    circle: null,
+    map: null,
+    watchId: null,
+    track: null,
+    version: 0  // Версия состояния серверной игры (последняя примененная дельта)
+};
+
+// Трек игры для проверки результата ботом: точки [широта, долгота, секунды от начала]
+const TRACK_SCALE = 100000;    // Координаты округляются до 1e-5° (≈1 м)
+const TRACK_MIN_STEP = 5;      // Меньшие перемещения не записываются, м
+const TRACK_MAX_POINTS = 400;  // При переполнении прореживается каждая вторая точка
+
+function resetTrack(coords) {
+    gameState.track = {start: Date.now(), points: []};
+    trackPoint(coords, true);
+}
+
+function trackPoint(coords, force = false) {
+    const track = gameState.track;
+    if (!track) return;
+    const last = track.points[track.points.length - 1];
+    if (!force && last && calculateDistance(last[0], last[1], coords[0], coords[1]) < TRACK_MIN_STEP) {
+        return;
+    }
+    // Время точки строго растет: бот отклоняет трек с двумя точками в одну секунду
+    const seconds = Math.round((Date.now() - track.start) / 1000);
+    track.points.push([coords[0], coords[1], last ? Math.max(seconds, last[2] + 1) : seconds, force]);
+    if (track.points.length > TRACK_MAX_POINTS) {
+        // Первая, последняя и обязательные точки (находки) сохраняются
+        track.points = track.points.filter((point, i) =>
+            point[3] || i % 2 === 0 || i === track.points.length - 1);
+    }
+}
+
+// Разностное кодирование: [lat0, lon0, t0, dlat1, dlon1, dt1, ...] в целых числах
+function encodeTrack() {
+    const flat = [];
+    let prev = [0, 0, 0];
+    (gameState.track ? gameState.track.points : []).forEach(point => {
+        const current = [Math.round(point[0] * TRACK_SCALE), Math.round(point[1] * TRACK_SCALE), point[2]];
+        flat.push(current[0] - prev[0], current[1] - prev[1], current[2] - prev[2]);
+        prev = current;
+    });
+    return flat;
+}
+
+// Initialize the app
+function initApp() {
+    // Set up language switcher
+    document.querySelectorAll('.lang-btn').forEach(btn => {
+        btn.addEventListener('click', function() {
+            setLanguage(this.dataset.lang);
+        });
+    });
+
+    // Set up navigation
+    document.getElementById('btn-start').addEventListener('click', function() {
+        showScreen('mode-screen');
+    });
+
+    document.getElementById('btn-rules').addEventListener('click', function() {
+        showScreen('rules-screen');
+    });
+
+    // Set up mode selection
+    document.querySelectorAll('.mode-card').forEach(card => {
+        card.addEventListener('click', function() {
+            document.querySelectorAll('.mode-card').forEach(c => c.classList.remove('selected'));
+            this.classList.add('selected');
+            selectedMode = this.dataset.mode;
+            document.getElementById('btn-select-mode').disabled = false;
+        });
+    });
+
+    document.getElementById('btn-select-mode').addEventListener('click', function() {
+        startGame();
+    });
+
+    // Set initial language
+    setLanguage(currentLanguage);
+
+    // Игра уже создана ботом — сразу переходим к карте
+    if (gameToken) {
+        gameState.gameActive = true;
+        gameState.foundSpots = [];
+        showScreen('game-screen');
+        initGame();
+    }
+}
+
+// Change language
+function setLanguage(lang) {
+    currentLanguage = lang;
+
+    // Update active button
+    document.querySelectorAll('.lang-btn').forEach(btn => {
+        if (btn.dataset.lang === lang) {
+            btn.classList.add('active');
+        } else {
+            btn.classList.remove('active');
+        }
+    });
+
+    // Update all translatable elements
+    document.querySelectorAll('[data-i18n]').forEach(element => {
+        const key = element.getAttribute('data-i18n');
+        if (translations[lang][key]) {
+            element.textContent = translations[lang][key];
+        }
+    });
+}
+
+// Show specific screen
+function showScreen(screenId) {
+    document.querySelectorAll('.screen').forEach(screen => {
+        screen.classList.remove('active');
+    });
+    document.getElementById(screenId).classList.add('active');
+}
+
+// Get mode price
+function getModePrice(mode) {
+    const prices = {
+        'economy': 3,
+        'standard': 5,
+        'premium': 7
+    };
+    return prices[mode] || 0;
+}
+
+// Start game
+function startGame() {
+    if (gameState.balance < getModePrice(selectedMode)) {
+        showScreen('payment-screen');
+        return;
+    }
+
+    // Deduct game cost
+    gameState.balance -= getModePrice(selectedMode);
+    updateBalance();
+
+    gameState.mode = selectedMode;
+    gameState.foundSpots = [];
+    gameState.gameActive = true;
+
+    // Update UI
+    document.getElementById('game-mode-badge').textContent = translations[currentLanguage][selectedMode];
+    document.getElementById('game-mode-badge').className = `mode-badge ${selectedMode}`;
+    document.getElementById('total-count').textContent = '5';
+    document.getElementById('found-count').textContent = '0';
+
+    showScreen('game-screen');
+
+    // Initialize game
+    initGame();
+}
+
+// Добавьте функцию для запроса баланса
+async function fetchBalance() {
+    // В реальном приложении здесь должен быть API-запрос к боту
+    // Для демо-режима используем начальный баланс из параметров
+    return demoMode ? 100 : 0; // Заглушка
+}
+
+// Загрузка серверной игры по токену
+async function loadServerGame() {
+    const response = await fetch(`${apiBase}/api/state/${gameToken}`);
+    if (!response.ok) {
+        throw new Error(`State request failed: ${response.status}`);
+    }
+    const state = await response.json();
+    gameState.mode = state.mode;
+    gameState.center = state.center;
+    if (GAME_MODES[state.mode] && state.radius > 0) {
+        GAME_MODES[state.mode].radius = state.radius;
+    }
+    gameState.geospots = state.spots.map((spot, i) => ({
+        id: i,
+        coords: [spot[0], spot[1]],
+        hasPrize: false,
+        prizeAmount: 0,
+        found: spot[2] === 1,
+        marker: null
+    }));
+    gameState.foundSpots = gameState.geospots.filter(spot => spot.found);
+    gameState.version = state.v;
+}
+
+// Дельты серверной игры (game_state.py) приходят по WebSocket; после обрыва
+// или пропуска версий клиент догоняет запросом /api/game/{token}?since=версия
+let gameSocket = null;
+
+function applyServerDelta(delta, resync = true) {
+    if (delta.v <= gameState.version) return;
+    if (resync && delta.v > gameState.version + 1) {
+        syncServerGame();
+        return;
+    }
+    gameState.version = delta.v;
+    if (delta.e === 'f') {
+        const spot = gameState.geospots[delta.i];
+        if (spot && !spot.found) {
+            spot.hasPrize = delta.p > 0;
+            spot.prizeAmount = delta.p;
+            markSpotFound(spot);
+        }
+    }
+    if (typeof delta.b === 'number') {
+        gameState.balance = delta.b;
+        updateBalance();
+    }
+}
+
+async function syncServerGame() {
+    try {
+        const response = await fetch(`${apiBase}/api/game/${gameToken}?since=${gameState.version}`);
+        const state = await response.json();
+        if (state.d) {
+            state.d.forEach(delta => applyServerDelta(delta, false));
+            gameState.balance = state.b;
+        } else if (state.spots) {
+            // Нужные дельты уже вытеснены: сверяемся со снимком (без призов)
+            gameState.version = state.version;
+            state.spots.forEach((item, i) => {
+                const spot = gameState.geospots[i];
+                if (spot && item[2] === 1 && !spot.found) {
+                    markSpotFound(spot, true);
+                }
+            });
+            gameState.balance = state.balance;
+        } else {
+            return;
+        }
+        updateBalance();
+    } catch (e) {
+        console.error('Game sync failed:', e);
+    }
+}
+
+function connectGameSocket() {
+    if (!gameToken || !window.WebSocket) return;
+    const url = new URL(`${apiBase}/ws/${gameToken}`, window.location.href);
+    url.protocol = url.protocol === 'https:' ? 'wss:' : 'ws:';
+    gameSocket = new WebSocket(url.href);
+    gameSocket.onopen = () => syncServerGame();
+    gameSocket.onmessage = event => {
+        const message = JSON.parse(event.data);
+        if (message.e !== 'p') {
+            applyServerDelta(message);
+        }
+    };
+    gameSocket.onclose = () => {
+        gameSocket = null;
+        if (gameState.gameActive) {
+            setTimeout(connectGameSocket, 5000);
+        }
+    };
+}
+
+// Initialize game
+async function initGame() {
+    if (gameToken) {
+        try {
+            await loadServerGame();
+            initMap();
+            connectGameSocket();
+            return;
+        } catch (e) {
+            console.error('Failed to load server game:', e);
+        }
+    }
+    // Show loading message
+    // Запрашиваем баланс у бота
+    gameState.balance = await fetchBalance();
+    updateBalance();
+    showToast(translations[currentLanguage].loadingLocation);
+
+    // Get user location
+    if (navigator.geolocation) {
+        navigator.geolocation.getCurrentPosition(
+            position => {
+                const coords = [position.coords.latitude, position.coords.longitude];
+                gameState.center = coords;
+                initMap();
+            },
+            error => {
+                console.error('Geolocation error:', error);
+                // Use default coordinates
+                gameState.center = [55.7558, 37.6173];
+                showToast('Using default location. Please enable GPS for better experience.');
+                initMap();
+            },
+            { enableHighAccuracy: true, timeout: 10000, maximumAge: 0 }
+        );
+    } else {
+        alert('Geolocation is not supported by this browser.');
+        // Use default coordinates
+        gameState.center = [55.7558, 37.6173];
+        initMap();
+    }
+}
+
+// Initialize map
+function initMap() {
+    // Check if Yandex Maps is loaded
+    if (typeof ymaps === 'undefined') {
+        console.error('Yandex Maps not loaded');
+        loadYandexMaps();
+        return;
+    }
+
+    ymaps.ready(() => {
+        try {
+            // Initialize map
+            gameState.map = new ymaps.Map('map', {
+                center: gameState.center,
+                zoom: 16,
+                controls: ['zoomControl']
+            });
+
+            // Add user marker
+            gameState.userMarker = new ymaps.Placemark(gameState.center, {}, {
+                preset: 'islands#blueCircleDotIcon',
+                iconColor: '#2196F3'
+            });
+
+            gameState.map.geoObjects.add(gameState.userMarker);
+
+            // Add search radius circle
+            const modeConfig = GAME_MODES[gameState.mode];
+            gameState.circle = new ymaps.Circle([
+                gameState.center,
+                modeConfig.radius
+            ], {}, {
+                fillColor: "rgba(33, 150, 243, 0.2)",
+                strokeColor: "#2196F3",
+                strokeOpacity: 0.8,
+                strokeWidth: 2
+            });
+
+            gameState.map.geoObjects.add(gameState.circle);
+
+            // Generate geospots (серверная игра уже загрузила свои метки)
+            if (!gameToken) {
+                generateGeospots();
+            }
+
+            // Add geospots to map
+            addGeospotsToMap();
+
+            // Start location tracking
+            startLocationTracking();
+
+        } catch (e) {
+            console.error('Map initialization error:', e);
+            showToast('Failed to initialize map');
+        }
+    });
+}
+
+// Обновляем функцию loadYandexMaps
+function loadYandexMaps() {
+    const script = document.createElement('script');
+    script.src = 'https://api-maps.yandex.ru/2.1/?apikey=752def06-b6ee-4762-a047-ccb35a7c4e6f&lang=ru_RU';
+    script.onload = function() {
+        console.log('Yandex Maps loaded successfully');
+        // Retry initialization after maps are loaded
+        initMap();
+    };
+    script.onerror = function() {
+        console.error('Failed to load Yandex Maps');
+
+        // Показываем сообщение об ошибке
+        const mapContainer = document.querySelector('.map-container');
+        const errorDiv = document.createElement('div');
+        errorDiv.className = 'map-error';
+        errorDiv.innerHTML = `
+            <h3>${translations[currentLanguage].mapLoadError || 'Failed to load maps'}</h3>
+            <button onclick="loadYandexMaps()">${translations[currentLanguage].retry || 'Retry'}</button>
+        `;
+        errorDiv.style.cssText = `
+            position: absolute;
+            top: 50%;
+            left: 50%;
+            transform: translate(-50%, -50%);
+            text-align: center;
+            z-index: 10;
+            background: rgba(0,0,0,0.8);
+            padding: 20px;
+            border-radius: 10px;
+        `;
+
+        mapContainer.appendChild(errorDiv);
+    };
+    document.head.appendChild(script);
+}
+
+// Generate geospots
+function generateGeospots() {
+    const modeConfig = GAME_MODES[gameState.mode];
+    gameState.geospots = [];
+
+    for (let i = 0; i < 5; i++) {
+        // Generate random coordinates within radius
+        const angle = Math.random() * Math.PI * 2;
+        const distance = Math.random() * modeConfig.radius;
+        const earthRadius = 6371000; // Earth radius in meters
+
+        const dx = distance * Math.cos(angle);
+        const dy = distance * Math.sin(angle);
+
+        const deltaLat = (dy / earthRadius) * (180 / Math.PI);
+        const deltaLon = (dx / (earthRadius * Math.cos(Math.PI * gameState.center[0] / 180))) * (180 / Math.PI);
+
+        const newLat = gameState.center[0] + deltaLat;
+        const newLon = gameState.center[1] + deltaLon;
+
+        // Determine if this spot has a prize
+        const hasPrize = Math.random() < modeConfig.win_probability;
+        const prizeAmount = hasPrize ? 
+            Math.floor(Math.random() * (modeConfig.max_prize - modeConfig.min_prize + 1)) + modeConfig.min_prize : 
+            0;
+
+        gameState.geospots.push({
+            id: i,
+            coords: [newLat, newLon],
+            hasPrize: hasPrize,
+            prizeAmount: prizeAmount,
+            found: false,
+            marker: null
+        });
+    }
+}
+
+// Add geospots to map
+function addGeospotsToMap() {
+    if (!gameState.map) {
+        console.error('Map is not initialized');
+        return;
+    }
+
+    // Add new geospots
+    gameState.geospots.forEach(spot => {
+        const placemark = new ymaps.Placemark(spot.coords, {
+            balloonContent: spot.hasPrize ? 
+                `${translations[currentLanguage].prizes.replace(':', '')}: ${spot.prizeAmount}$` : 
+                translations[currentLanguage].emptySpot
+        }, {
+            preset: spot.hasPrize ? 'islands#redIcon' : 'islands#grayIcon'
+        });
+
+        spot.marker = placemark;
+        gameState.map.geoObjects.add(placemark);
+    });
+
+    console.log('Geospots added to map:', gameState.geospots.length);
+}
+
+// Start location tracking
+function startLocationTracking() {
+    if (gameState.watchId) {
+        navigator.geolocation.clearWatch(gameState.watchId);
+    }
+
+    resetTrack(gameState.center);
+    gameState.watchId = navigator.geolocation.watchPosition(
+        position => {
+            const coords = [position.coords.latitude, position.coords.longitude];
+            trackPoint(coords);
+            updateUserPosition(coords);
+            checkProximity(coords);
+        },
+        error => {
+            console.error('Geolocation error:', error);
+        },
+        {
+            enableHighAccuracy: true,
+            timeout: 5000,
+            maximumAge: 0
+        }
+    );
+}
+
+// Update user position
+function updateUserPosition(coords) {
+    if (gameState.userMarker) {
+        gameState.userMarker.geometry.setCoordinates(coords);
+    }
+
+    // Update circle position if it exists
+    if (gameState.circle) {
+        const modeConfig = GAME_MODES[gameState.mode];
+        gameState.circle.geometry.setCoordinates(coords);
+        gameState.circle.geometry.setRadius(modeConfig.radius);
+    }
+
+    // Center map on user
+    if (gameState.map) {
+        gameState.map.setCenter(coords);
+    }
+}
+
+// Check proximity to geospots
+function checkProximity(userCoords) {
+    let closestDistance = Infinity;
+    let closestSpot = null;
+
+    gameState.geospots.forEach(spot => {
+        if (spot.found) return;
+
+        const distance = calculateDistance(
+            userCoords[0], userCoords[1],
+            spot.coords[0], spot.coords[1]
+        );
+
+        if (distance < closestDistance) {
+            closestDistance = distance;
+            closestSpot = spot;
+        }
+
+        // Check if we're close enough to "find" the spot
+        if (distance <= 10) { // 10 meters
+            foundGeospot(spot, userCoords);
+        }
+    });
+
+    // Show proximity indicator
+    if (closestSpot && closestDistance <= 50) {
+        const progress = Math.max(0, 100 - (closestDistance / 50) * 100);
+        showProximityIndicator(progress);
+    } else {
+        hideProximityIndicator();
+    }
+}
+
+// Show proximity indicator
+function showProximityIndicator(progress) {
+    const indicator = document.getElementById('proximity-indicator');
+    const progressBar = document.getElementById('proximity-progress');
+
+    if (indicator && progressBar) {
+        indicator.style.display = 'block';
+        progressBar.style.width = `${progress}%`;
+    }
+}
+
+// Hide proximity indicator
+function hideProximityIndicator() {
+    const indicator = document.getElementById('proximity-indicator');
+    if (indicator) {
+        indicator.style.display = 'none';
+    }
+}
+
+// Подтверждение находки на сервере: приз определяет только он
+async function claimServerSpot(spot) {
+    try {
+        const response = await fetch(`${apiBase}/api/check_location`, {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({token: gameToken, coords: spot.claimCoords})
+        });
+        const result = await response.json();
+        if (result.found && result.spot_index === spot.id) {
+            spot.hasPrize = result.prize > 0;
+            spot.prizeAmount = result.prize;
+            return true;
+        }
+    } catch (e) {
+        console.error('Claim request failed:', e);
+    }
+    return false;
+}
+
+// Handle found geospot
+async function foundGeospot(spot, userCoords) {
+    if (spot.found || spot.claiming) return;
+
+    if (gameToken) {
+        spot.claiming = true;
+        spot.claimCoords = userCoords;
+        const confirmed = await claimServerSpot(spot);
+        spot.claiming = false;
+        if (!confirmed) return;
+        trackPoint(userCoords, true);
+        // Баланс приходит дельтой; без WebSocket забираем ее запросом
+        if (!gameSocket || gameSocket.readyState !== WebSocket.OPEN) {
+            syncServerGame();
+        }
+        // Дельта по WebSocket могла отметить метку раньше ответа на запрос
+        if (!spot.found) {
+            markSpotFound(spot);
+        }
+        return;
+    }
+
+    trackPoint(userCoords, true);
+    if (spot.hasPrize) {
+        gameState.balance += spot.prizeAmount;
+        updateBalance();
+    }
+    markSpotFound(spot);
+}
+
+// Отметка найденной метки: маркер, уведомление, счетчик и завершение игры
+function markSpotFound(spot, silent = false) {
+    spot.found = true;
+    gameState.foundSpots.push(spot);
+
+    // Update marker
+    if (spot.marker) {
+        spot.marker.options.set('preset', 'islands#greenIcon');
+    }
+
+    // silent — метка найдена вне веб-приложения и приз неизвестен
+    if (!silent) {
+        showToast(spot.hasPrize
+            ? translations[currentLanguage].foundPrize.replace('{prize}', spot.prizeAmount)
+            : translations[currentLanguage].emptySpot);
+    }
+
+    // Update counter
+    updateFoundCounter();
+
+    // Check if game is complete
+    if (gameState.foundSpots.length === gameState.geospots.length) {
+        endGame(true);
+    }
+}
+
+// Update found counter
+function updateFoundCounter() {
+    document.getElementById('found-count').textContent = gameState.foundSpots.length;
+    document.getElementById('results-found').textContent = `${gameState.foundSpots.length}/5`;
+}
+
+// Update balance
+function updateBalance() {
+    document.getElementById('game-balance').textContent = gameState.balance + ' $';
+    document.getElementById('results-total').textContent = gameState.balance + ' $';
+}
+
+// Calculate total prize
+function calculateTotalPrize() {
+    return gameState.foundSpots
+        .filter(spot => spot.hasPrize)
+        .reduce((sum, spot) => sum + spot.prizeAmount, 0);
+}
+
+
+// Компактный формат данных для бота (версия 2, см. webapp_payload.py):
+// [версия, тип, поля по схеме...], числовые массивы упакованы в little-endian base64
+const PAYLOAD_VERSION = 2;
+const PAYLOAD_SCHEMAS = {
+    game_result: ['mode', 'entry_fee', 'prize_won', 'found_geospots:spots', 'track:track'],
+    payment_request: ['amount']
+};
+
+function toBase64(view) {
+    const bytes = new Uint8Array(view.buffer);
+    let binary = '';
+    for (let i = 0; i < bytes.length; i++) {
+        binary += String.fromCharCode(bytes[i]);
+    }
+    return btoa(binary);
+}
+
+// Метка: приз (uint16), широта и долгота (int32) в единицах 1e-5°
+function packSpots(spots) {
+    const view = new DataView(new ArrayBuffer(spots.length * 10));
+    spots.forEach((spot, i) => {
+        view.setUint16(i * 10, spot.has_prize ? spot.prize_amount : 0, true);
+        view.setInt32(i * 10 + 2, Math.round(spot.lat * TRACK_SCALE), true);
+        view.setInt32(i * 10 + 6, Math.round(spot.lon * TRACK_SCALE), true);
+    });
+    return toBase64(view);
+}
+
+// Трек из encodeTrack: первая точка int32, разности int16.
+// Разность вне int16 (шаг больше ~36 км или пауза больше ~9 ч) не обрезается — это исказило бы трек
+function packTrack(flat) {
+    const view = new DataView(new ArrayBuffer(flat.length ? 12 + (flat.length - 3) * 2 : 0));
+    flat.forEach((value, i) => {
+        if (i < 3) {
+            view.setInt32(i * 4, value, true);
+        } else if (value < -32768 || value > 32767) {
+            throw new RangeError(`Track delta ${value} does not fit int16`);
+        } else {
+            view.setInt16(12 + (i - 3) * 2, value, true);
+        }
+    });
+    return toBase64(view);
+}
+
+function encodePayload(data) {
+    const packers = {spots: packSpots, track: packTrack};
+    const fields = [PAYLOAD_VERSION, data.type];
+    PAYLOAD_SCHEMAS[data.type].forEach(field => {
+        const [name, kind] = field.split(':');
+        fields.push(kind ? packers[kind](data[name]) : data[name]);
+    });
+    return JSON.stringify(fields);
+}
+
+// Версия 2, а если трек не упаковывается — прежний JSON-объект (версия 1)
+function serializePayload(data) {
+    try {
+        return encodePayload(data);
+    } catch (e) {
+        console.warn('Compact payload failed, sending JSON:', e);
+        return JSON.stringify(data);
+    }
+}
+
+// Функция для отправки данных боту
+function sendDataToBot(data) {
+    if (window.Telegram && Telegram.WebApp) {
+        Telegram.WebApp.sendData(serializePayload(data));
+    } else {
+        console.log('Data to be sent to bot:', data);
+        // Для тестирования вне Telegram
+        alert('Данные для отправки: ' + serializePayload(data));
+    }
+}
+
+// Обновляем функцию endGame
+function endGame(isComplete = false) {
+    if (gameState.watchId) {
+        navigator.geolocation.clearWatch(gameState.watchId);
+        gameState.watchId = null;
+    }
+
+    if (isComplete) {
+        const totalPrize = calculateTotalPrize();
+
+        // Отправляем результаты игры боту
+        const gameData = {
+            type: 'game_result',
+            mode: gameState.mode,
+            entry_fee: getModePrice(gameState.mode),
+            prize_won: totalPrize,
+            found_geospots: gameState.foundSpots.map(spot => ({
+                has_prize: spot.hasPrize,
+                prize_amount: spot.prizeAmount,
+                lat: spot.coords[0],
+                lon: spot.coords[1]
+            })),
+            track: encodeTrack()
+        };
+
+        sendDataToBot(gameData);
+
+        // Показываем результаты
+        document.getElementById('results-prize').textContent = totalPrize + ' $';
+        showToast(translations[currentLanguage].gameCompleted);
+
+        // Показываем экран результатов
+        setTimeout(() => {
+            showScreen('results-screen');
+        }, 2000);
+    } else {
+        showScreen('mode-screen');
+    }
+
+    gameState.gameActive = false;
+}
+
+// Добавляем обработчик для кнопки пополнения счета
+function setupPaymentHandlers() {
+    document.querySelectorAll('.payment-card').forEach(card => {
+        card.addEventListener('click', function() {
+            const amount = parseFloat(this.querySelector('.payment-amount').textContent.replace('$', ''));
+
+            const paymentData = {
+                type: 'payment_request',
+                amount: amount
+            };
+
+            sendDataToBot(paymentData);
+        });
+    });
+}
+
+// Calculate distance between coordinates (in meters)
+function calculateDistance(lat1, lon1, lat2, lon2) {
+    const R = 6371000; // Earth radius in meters
+    const dLat = (lat2 - lat1) * Math.PI / 180;
+    const dLon = (lon2 - lon1) * Math.PI / 180;
+
+    const a = 
+        Math.sin(dLat/2) * Math.sin(dLat/2) +
+        Math.cos(lat1 * Math.PI / 180) * Math.cos(lat2 * Math.PI / 180) * 
+        Math.sin(dLon/2) * Math.sin(dLon/2);
+
+    const c = 2 * Math.atan2(Math.sqrt(a), Math.sqrt(1-a));
+    return R * c;
+}
+
+// Update location manually
+function updateLocation() {
+    if (navigator.geolocation) {
+        navigator.geolocation.getCurrentPosition(
+            position => {
+                const coords = [position.coords.latitude, position.coords.longitude];
+                updateUserPosition(coords);
+                checkProximity(coords);
+            },
+            error => {
+                console.error('Geolocation error:', error);
+                showToast('Location update failed');
+            },
+            { enableHighAccuracy: true, timeout: 5000, maximumAge: 0 }
+        );
+    }
+}
+
+
+
+// Show toast notification
+function showToast(message) {
+    // Remove existing toasts
+    document.querySelectorAll('.toast').forEach(toast => toast.remove());
+
+    const toast = document.createElement('div');
+    toast.className = 'toast';
+    toast.textContent = message;
+    document.body.appendChild(toast);
+
+    setTimeout(() => {
+        if (toast.parentNode) {
+            document.body.removeChild(toast);
+        }
+    }, 3000);
+}
+
+// Инициализируем обработчики платежей при загрузке
+document.addEventListener('DOMContentLoaded', function() {
+    initApp();
+    setupPaymentHandlers(); // Добавляем эту строку
+});
@@ -0,0 +1,86 @@
+# jackpot.py
+# Джекпот в SQLite: взнос и выигрыш — одиночные атомарные UPDATE, чтение — из кэша
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class JackpotPool:
+    """Общий джекпот; кэш обновляется значениями, которые вернул UPDATE ... RETURNING"""
+
+    def __init__(self, seed):
+        self.seed = seed
+        self.db_path = None
+        self.amount = seed
+        self.version = 0
+        self.wins = 0
+        self.lock = threading.Lock()
+
+    def open(self, db_path):
+        """Создание таблицы (с начальным размером) и загрузка текущего значения"""
+        self.db_path = db_path
+        conn = sqlite3.connect(db_path)
+        try:
+            with conn:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS jackpot (
+                        id INTEGER PRIMARY KEY CHECK (id = 1),
+                        amount REAL NOT NULL,
+                        last_win REAL DEFAULT 0,
+                        version INTEGER DEFAULT 0,
+                        wins INTEGER DEFAULT 0,
+                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                ''')
+                conn.execute('INSERT OR IGNORE INTO jackpot (id, amount) VALUES (1, ?)', (self.seed,))
+            row = conn.execute('SELECT amount, version, wins FROM jackpot WHERE id = 1').fetchone()
+        finally:
+            conn.close()
+        self._update_cache(*row)
+        logger.info(f"Jackpot loaded: {self.amount:.2f}")
+
+    def _update_cache(self, amount, version, wins):
+        with self.lock:
+            # Ответы могут прийти не по порядку — оставляем самую свежую версию
+            if version >= self.version:
+                self.amount, self.version, self.wins = amount, version, wins
+
+    def _execute(self, query, params):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                return conn.execute(query, params).fetchone()
+        finally:
+            conn.close()
+
+    def contribute(self, amount):
+        """Взнос с игры; возвращает новый размер джекпота"""
+        if self.db_path is None:
+            with self.lock:
+                self.amount += amount
+                self.version += 1
+                return self.amount
+        amount, version, wins = self._execute(
+            'UPDATE jackpot SET amount = amount + ?, version = version + 1, updated_at = CURRENT_TIMESTAMP '
+            'WHERE id = 1 RETURNING amount, version, wins', (amount,))
+        self._update_cache(amount, version, wins)
+        return amount
+
+    def claim(self):
+        """Забрать джекпот: выигрыш и сброс к начальному размеру одной командой.
+
+        Правые части SET видят строку до изменения, поэтому last_win — ровно то,
+        что было в пуле; второй одновременный победитель получит уже новый пул."""
+        if self.db_path is None:
+            with self.lock:
+                prize, self.amount = self.amount, self.seed
+                self.version += 1
+                self.wins += 1
+                return prize
+        prize, amount, version, wins = self._execute(
+            'UPDATE jackpot SET last_win = amount, amount = ?, version = version + 1, wins = wins + 1, '
+            'updated_at = CURRENT_TIMESTAMP WHERE id = 1 RETURNING last_win, amount, version, wins', (self.seed,))
+        self._update_cache(amount, version, wins)
+        return prize
@@ -0,0 +1,253 @@
+# leaderboard.py
+# Рейтинги игроков за день, неделю и все время: инкрементальное обновление
+# упорядоченного индекса в памяти и компактная таблица SQLite
+import sqlite3
+import logging
+import threading
+from bisect import bisect_left, insort
+from datetime import date, timedelta
+
+try:
+    from sortedcontainers import SortedList  # requirements.txt: O(log n) вставка и поиск места
+except ImportError:  # Запасной вариант со сдвигом списка, O(n) на обновление
+    SortedList = None
+
+logger = logging.getLogger(__name__)
+
+PERIODS = ('day', 'week', 'all')
+METRICS = ('winnings', 'spots')
+RETENTION_DAYS = 35   # Сколько хранить в базе дневные и недельные рейтинги
+FLUSH_INTERVAL = 2.0  # Период записи накопленных очков в базу, с
+FLUSH_BATCH = 500     # Досрочная запись при таком числе измененных строк
+
+
+class _BisectList(list):
+    """Замена SortedList на отсортированном списке (вставка со сдвигом элементов)"""
+
+    def add(self, item):
+        insort(self, item)
+
+    def remove(self, item):
+        del self[bisect_left(self, item)]
+
+    def index(self, item):
+        return bisect_left(self, item)
+
+
+def period_keys(day=None):
+    """Ключи текущих периодов: 'd:2024-05-01', 'w:2024-W18', 'all'"""
+    day = day or date.today()
+    year, week, _ = day.isocalendar()
+    return {'day': f'd:{day.isoformat()}', 'week': f'w:{year}-W{week:02d}', 'all': 'all'}
+
+
+class Board:
+    """Один рейтинг: очки пользователей и индекс (-очки, user_id)"""
+
+    def __init__(self):
+        self.scores = {}
+        self.order = SortedList() if SortedList is not None else _BisectList()
+        self.version = 0
+
+    def add(self, user_id, amount):
+        old = self.scores.get(user_id)
+        if old is not None:
+            self.order.remove((-old, user_id))
+        score = (old or 0) + amount
+        self.scores[user_id] = score
+        self.order.add((-score, user_id))
+        self.version += 1
+        return score
+
+    def top(self, limit):
+        return [(user_id, -score) for score, user_id in self.order[:limit]]
+
+    def rank(self, user_id):
+        """Место пользователя (с 1) или None"""
+        score = self.scores.get(user_id)
+        if score is None:
+            return None
+        return self.order.index((-score, user_id)) + 1
+
+
+class Leaderboards:
+    def __init__(self, flush_interval=FLUSH_INTERVAL, batch_size=FLUSH_BATCH):
+        self.keys = period_keys()
+        self.boards = {}   # (ключ периода, метрика) -> Board
+        self.names = {}    # user_id -> имя, только для игроков текущих рейтингов
+        self.cache = {}    # (период, метрика, limit) -> (версия, результат)
+        self.pending = {}  # (ключ периода, метрика, user_id) -> прирост очков, еще не записанный
+        self.pending_names = {}
+        self.db_path = None
+        self.lock = threading.Lock()
+        self.db_lock = threading.Lock()
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def open(self, db_path):
+        """Создание таблицы и загрузка текущих периодов"""
+        self.db_path = db_path
+        conn = sqlite3.connect(db_path)
+        try:
+            with conn:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS leaderboard (
+                        period TEXT,
+                        metric TEXT,
+                        user_id INTEGER,
+                        score REAL,
+                        PRIMARY KEY (period, metric, user_id)
+                    ) WITHOUT ROWID
+                ''')
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS leaderboard_names (
+                        user_id INTEGER PRIMARY KEY,
+                        name TEXT
+                    )
+                ''')
+            keys = period_keys()
+            rows = conn.execute('SELECT period, metric, user_id, score FROM leaderboard WHERE period IN (?, ?, ?)',
+                                tuple(keys.values())).fetchall()
+            names = conn.execute('SELECT user_id, name FROM leaderboard_names WHERE user_id IN '
+                                 '(SELECT user_id FROM leaderboard WHERE period IN (?, ?, ?))',
+                                 tuple(keys.values())).fetchall()
+        finally:
+            conn.close()
+        with self.lock:
+            self.keys = keys
+            self.boards.clear()
+            self.cache.clear()
+            for period, metric, user_id, score in rows:
+                self._board(period, metric).add(user_id, score)
+            self.names = dict(names)
+        logger.info(f"Loaded {len(rows)} leaderboard rows")
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='leaderboard-flush', daemon=True)
+            self._thread.start()
+
+    def _board(self, period_key, metric):
+        board = self.boards.get((period_key, metric))
+        if board is None:
+            board = self.boards[(period_key, metric)] = Board()
+        return board
+
+    def _roll(self):
+        """Смена дня/недели: прошедшие периоды уходят из памяти (в базе остаются)"""
+        keys = period_keys()
+        if keys != self.keys:
+            self.keys = keys
+            current = set(keys.values())
+            for board_key in [k for k in self.boards if k[0] not in current]:
+                del self.boards[board_key]
+            ranked = set().union(*(board.scores for board in self.boards.values()))
+            self.names = {user_id: name for user_id, name in self.names.items() if user_id in ranked}
+            self.cache.clear()
+
+    def record(self, user_id, winnings=0, spots=0, name=None):
+        """Учет находки: O(log n) на каждый рейтинг; в базу очки пишет фоновый поток.
+
+        Имя хранится, пока игрок есть в рейтингах"""
+        changes = [(metric, amount) for metric, amount in (('winnings', winnings), ('spots', spots)) if amount]
+        if not changes:
+            return
+        with self.lock:
+            self._roll()
+            if name and self.names.get(user_id) != name:
+                self.names[user_id] = self.pending_names[user_id] = name
+            for period_key in self.keys.values():
+                for metric, amount in changes:
+                    self._board(period_key, metric).add(user_id, amount)
+                    key = (period_key, metric, user_id)
+                    self.pending[key] = self.pending.get(key, 0) + amount
+            if len(self.pending) >= self.batch_size:
+                self._wakeup.set()
+
+    def _run(self):
+        while self.db_path is not None:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                logger.error(f"Error flushing leaderboard: {e}")
+
+    def flush(self):
+        """Запись накопленных очков и имен одной транзакцией"""
+        if self.db_path is None:
+            return 0
+        with self.db_lock:
+            with self.lock:
+                rows = [(*key, amount) for key, amount in self.pending.items()]
+                names = list(self.pending_names.items())
+                self.pending.clear()
+                self.pending_names.clear()
+            if not rows and not names:
+                return 0
+            conn = sqlite3.connect(self.db_path)
+            try:
+                with conn:
+                    conn.executemany(
+                        'INSERT INTO leaderboard (period, metric, user_id, score) VALUES (?, ?, ?, ?) '
+                        'ON CONFLICT (period, metric, user_id) DO UPDATE SET score = score + excluded.score', rows)
+                    conn.executemany('INSERT OR REPLACE INTO leaderboard_names (user_id, name) VALUES (?, ?)', names)
+            except sqlite3.Error:
+                # Вернем приросты в очередь до следующей попытки
+                with self.lock:
+                    for period_key, metric, user_id, amount in rows:
+                        key = (period_key, metric, user_id)
+                        self.pending[key] = self.pending.get(key, 0) + amount
+                    for user_id, name in names:
+                        self.pending_names.setdefault(user_id, name)
+                raise
+            finally:
+                conn.close()
+        return len(rows) + len(names)
+
+    def close(self):
+        """Остановка фоновой записи с финальной записью"""
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self.flush()
+            self.db_path = None
+            self._wakeup.set()
+            thread.join()
+
+    def top(self, period='all', metric='winnings', limit=10):
+        """Первые limit мест: [(место, user_id, имя, очки)], кэшируется до изменения рейтинга"""
+        with self.lock:
+            self._roll()
+            board = self._board(self.keys[period], metric)
+            cache_key = (period, metric, limit)
+            cached = self.cache.get(cache_key)
+            if cached is not None and cached[0] is board and cached[1] == board.version:
+                return cached[2]
+            result = [(place, user_id, self.names.get(user_id), score)
+                      for place, (user_id, score) in enumerate(board.top(limit), 1)]
+            self.cache[cache_key] = (board, board.version, result)
+            return result
+
+    def rank(self, user_id, period='all', metric='winnings'):
+        with self.lock:
+            self._roll()
+            board = self._board(self.keys[period], metric)
+            return board.rank(user_id), board.scores.get(user_id, 0)
+
+    def prune(self, today=None):
+        """Удаление из базы дневных и недельных рейтингов старше срока хранения"""
+        if self.db_path is None:
+            return 0
+        self.flush()
+        oldest = period_keys((today or date.today()) - timedelta(days=RETENTION_DAYS))
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                cursor = conn.execute(
+                    "DELETE FROM leaderboard WHERE (period LIKE 'd:%' AND period < ?) OR (period LIKE 'w:%' AND period < ?)",
+                    (oldest['day'], oldest['week']))
+                conn.execute('DELETE FROM leaderboard_names WHERE user_id NOT IN (SELECT user_id FROM leaderboard)')
+                return cursor.rowcount
+        finally:
+            conn.close()
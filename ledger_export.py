@@ -0,0 +1,92 @@
+# ledger_export.py
+# Потоковая выгрузка транзакций и игр за период в CSV или NDJSON для бухгалтерии.
+# Строки читаются короткими пачками по ключу: память постоянна, а чтение не держит
+# блокировку базы дольше одной пачки и не мешает записи игроков.
+#
+# Пример:
+#   python ledger_export.py transactions --start 2024-05-01 --end 2024-06-01 > may.csv
+#   python ledger_export.py games --format ndjson --start 2024-05-01 > games.ndjson
+import io
+import os
+import sys
+import csv
+import json
+import sqlite3
+import argparse
+
+CHUNK_SIZE = 2000
+
+EXPORT_TABLES = {
+    'transactions': ('transaction_id', ('transaction_id', 'user_id', 'amount', 'type', 'status', 'provider',
+                                        'provider_transaction_id', 'created_at')),
+    'games': ('game_id', ('game_id', 'user_id', 'mode', 'entry_fee', 'prize_won', 'status', 'created_at')),
+}
+FORMATS = {'csv': 'text/csv; charset=utf-8', 'ndjson': 'application/x-ndjson'}
+
+
+def iter_rows(db_name, table, start=None, end=None, chunk_size=CHUNK_SIZE):
+    """Строки таблицы за период [start, end) пачками по первичному ключу"""
+    key, columns = EXPORT_TABLES[table]
+    query = f'SELECT {", ".join(columns)} FROM {table} WHERE {key} > ?'
+    params = []
+    if start:
+        query += ' AND created_at >= ?'
+        params.append(start)
+    if end:
+        query += ' AND created_at < ?'
+        params.append(end)
+    query += f' ORDER BY {key} LIMIT ?'
+
+    last_key = 0
+    while True:
+        # Новое подключение на пачку: между пачками база свободна для записи
+        conn = sqlite3.connect(f'file:{db_name}?mode=ro', uri=True)
+        try:
+            rows = conn.execute(query, (last_key, *params, chunk_size)).fetchall()
+        finally:
+            conn.close()
+        if not rows:
+            return
+        yield from rows
+        last_key = rows[-1][0]
+
+
+def stream_export(db_name, table, start=None, end=None, fmt='csv', chunk_size=CHUNK_SIZE):
+    """Выгрузка кусками байтов: по одному куску на пачку строк"""
+    columns = EXPORT_TABLES[table][1]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == 'csv' else None
+    if writer:
+        writer.writerow(columns)
+
+    count = 0
+    for row in iter_rows(db_name, table, start, end, chunk_size):
+        if writer:
+            writer.writerow(row)
+        else:
+            buffer.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n')
+        count += 1
+        if count % chunk_size == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Выгрузка журнала GeoHunter")
+    parser.add_argument('table', choices=sorted(EXPORT_TABLES))
+    parser.add_argument('--db', default=os.getenv('DB_NAME', 'geohunter.db'))
+    parser.add_argument('--start', help="начало периода, YYYY-MM-DD (включительно)")
+    parser.add_argument('--end', help="конец периода, YYYY-MM-DD (не включительно)")
+    parser.add_argument('--format', dest='fmt', choices=sorted(FORMATS), default='csv')
+    args = parser.parse_args(argv)
+
+    for chunk in stream_export(args.db, args.table, args.start, args.end, args.fmt):
+        sys.stdout.buffer.write(chunk)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
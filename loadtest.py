@@ -0,0 +1,446 @@
+# loadtest.py
+# Нагрузочный стенд: локальная замена Telegram Bot API и сценарные игроки для draft.py.
+#
+# Фейковый Bot API работает в отдельном процессе, бот — в текущем, поэтому CPU процесса
+# относится к боту и драйверу игроков. Игроки выбирают режим, пополняют счет,
+# включают трансляцию геопозиции и идут к меткам.
+#
+# Пример:
+#   python loadtest.py --players 10 50 100 --steps 40
+import os
+import sys
+import json
+import math
+import time
+import atexit
+import shutil
+import asyncio
+import logging
+import tempfile
+import argparse
+import urllib.parse
+import multiprocessing
+from types import SimpleNamespace
+from collections import defaultdict, deque
+
+FAKE_API_HOST = '127.0.0.1'
+FAKE_API_PORT = 8081
+FAKE_TOKEN = '123456:LOADTEST'
+BOT_USER = {'id': 123456, 'is_bot': True, 'first_name': 'GeoHunter', 'username': 'geohunter_load_bot'}
+START_COORDS = (55.7558, 37.6173)
+OUTBOUND_METHODS = ('sendMessage', 'editMessageText', 'deleteMessage')
+CLAIM_PASSES = 10  # Проходов по всем меткам в гонке за метки (с каждой стороны)
+
+
+# ========== ФЕЙКОВЫЙ BOT API ==========
+def create_fake_api():
+    """FastAPI-приложение, имитирующее методы Bot API, которые использует бот"""
+    from fastapi import FastAPI, Request
+
+    api = FastAPI()
+    state = {
+        'updates': deque(),
+        'next_update_id': 1,
+        'next_message_id': 1,
+        'calls': defaultdict(int),
+        'event': asyncio.Event(),
+    }
+
+    def message(chat_id, text=None):
+        state['next_message_id'] += 1
+        result = {
+            'message_id': state['next_message_id'],
+            'date': int(time.time()),
+            'chat': {'id': int(chat_id), 'type': 'private'},
+            'from': BOT_USER,
+        }
+        if text is not None:
+            result['text'] = text
+        return result
+
+    @api.post("/control/updates")
+    async def push_updates(updates: list[dict]):
+        for update in updates:
+            update['update_id'] = state['next_update_id']
+            state['next_update_id'] += 1
+            state['updates'].append(update)
+        state['event'].set()
+        return {'queued': len(state['updates'])}
+
+    @api.get("/control/stats")
+    async def get_stats():
+        return {'calls': dict(state['calls']), 'pending': len(state['updates'])}
+
+    @api.post("/control/reset")
+    async def reset():
+        state['updates'].clear()
+        state['calls'].clear()
+        return {'ok': True}
+
+    @api.post("/bot{token}/{method}")
+    async def bot_method(token: str, method: str, request: Request):
+        # PTB без файлов отправляет параметры как application/x-www-form-urlencoded
+        form = dict(urllib.parse.parse_qsl((await request.body()).decode('utf-8')))
+        state['calls'][method] += 1
+
+        if method == 'getUpdates':
+            offset = int(form.get('offset') or 0)
+            timeout = float(form.get('timeout') or 0)
+            while state['updates'] and state['updates'][0]['update_id'] < offset:
+                state['updates'].popleft()
+            if not state['updates'] and timeout:
+                state['event'].clear()
+                try:
+                    await asyncio.wait_for(state['event'].wait(), timeout=min(timeout, 1.0))
+                except asyncio.TimeoutError:
+                    pass
+            return {'ok': True, 'result': list(state['updates'])[:100]}
+        if method == 'getMe':
+            return {'ok': True, 'result': BOT_USER}
+        if method in ('sendMessage', 'editMessageText'):
+            return {'ok': True, 'result': message(form.get('chat_id', 0), form.get('text', ''))}
+        # deleteMessage, answerCallbackQuery, deleteWebhook и прочее
+        return {'ok': True, 'result': True}
+
+    return api
+
+
+def run_fake_api(port):
+    import uvicorn
+    uvicorn.run(create_fake_api(), host=FAKE_API_HOST, port=port, log_level='warning')
+
+
+# ========== СЦЕНАРНЫЕ ИГРОКИ ==========
+class UpdateFactory:
+    """Конструктор апдейтов Telegram для одного игрока"""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.user = {'id': user_id, 'is_bot': False, 'first_name': f'Player{user_id}'}
+        self.chat = {'id': user_id, 'type': 'private'}
+        self.message_id = 0
+        self.location_message_id = None
+
+    def _message(self, **fields):
+        self.message_id += 1
+        return {'message_id': self.message_id, 'date': int(time.time()), 'chat': self.chat,
+                'from': self.user, **fields}
+
+    def command(self, name):
+        text = f'/{name}'
+        return {'message': self._message(text=text, entities=[{'type': 'bot_command', 'offset': 0, 'length': len(text)}])}
+
+    def callback(self, data):
+        return {'callback_query': {
+            'id': f'{self.user_id}-{self.message_id}-{data}',
+            'from': self.user,
+            'chat_instance': str(self.user_id),
+            'data': data,
+            'message': self._message(text='menu'),
+        }}
+
+    def live_location(self, lat, lon):
+        location = {'latitude': lat, 'longitude': lon, 'live_period': 600}
+        if self.location_message_id is None:
+            message = self._message(location=location)
+            self.location_message_id = message['message_id']
+            return {'message': message}
+        # Обновления трансляции приходят как edited_message исходного сообщения
+        return {'edited_message': {'message_id': self.location_message_id, 'date': int(time.time()),
+                                   'edit_date': int(time.time()), 'chat': self.chat, 'from': self.user,
+                                   'location': location}}
+
+
+def step_towards(position, target, meters):
+    """Сдвиг точки на meters метров в сторону цели"""
+    lat, lon = position
+    dy = (target[0] - lat) * 111_320
+    dx = (target[1] - lon) * 111_320 * math.cos(math.radians(lat))
+    distance = math.hypot(dx, dy)
+    if distance <= meters:
+        return target
+    ratio = meters / distance
+    return (lat + dy * ratio / 111_320, lon + dx * ratio / (111_320 * math.cos(math.radians(lat))))
+
+
+async def player_script(push, user_id, args, draft):
+    """Сценарий одного игрока: старт, депозит, режим, трансляция, движение к меткам"""
+    factory = UpdateFactory(user_id)
+    pause = args.interval
+
+    for update in (factory.command('start'), factory.callback('deposit_50'), factory.callback(f'mode_{args.mode}')):
+        await push(update)
+        await asyncio.sleep(pause)
+
+    position = (START_COORDS[0] + (user_id % 100) * 0.001, START_COORDS[1] + (user_id // 100) * 0.001)
+    await push(factory.live_location(*position))
+    # Ждем, пока бот создаст игру
+    for _ in range(200):
+        if user_id in draft.games:
+            break
+        await asyncio.sleep(0.05)
+    else:
+        return
+    await push(factory.callback('confirm_live'))
+
+    for _ in range(args.steps):
+        await asyncio.sleep(pause)
+        game = draft.games.get(user_id)
+        if game is None:
+            break
+        targets = [s['coords'] for s in game.geospots if not s['found']]
+        if not targets:
+            break
+        target = min(targets, key=lambda c: (c[0] - position[0]) ** 2 + (c[1] - position[1]) ** 2)
+        position = step_towards(position, target, args.step_meters)
+        await push(factory.live_location(*position))
+
+
+# ========== ИЗМЕРЕНИЯ ==========
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(math.ceil(q * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def run_scenario(players, args, client, draft):
+    """Прогон сценария для заданного числа игроков"""
+    from telegram.ext import Application
+
+    latencies = defaultdict(list)
+
+    class TimedApplication(Application):
+        async def process_update(self, update):
+            started = time.perf_counter()
+            try:
+                await super().process_update(update)
+            finally:
+                kind = 'callback' if update.callback_query else \
+                    'location' if update.effective_message and update.effective_message.location else 'message'
+                latencies[kind].append(time.perf_counter() - started)
+
+    # Чистое состояние бота для каждого прогона
+    for container in (draft.games, draft.game_tokens, draft.user_balances,
+                      draft.user_stats, draft.user_achievements):
+        container.clear()
+    await client.post('/control/reset')
+
+    builder = Application.builder().token(FAKE_TOKEN).application_class(TimedApplication) \
+        .base_url(f'http://{FAKE_API_HOST}:{args.port}/bot')
+    application = draft.build_application(builder)
+
+    async def push(update):
+        await client.post('/control/updates', json=[update])
+
+    async with application:
+        await application.start()
+        await application.updater.start_polling(poll_interval=0.0, timeout=1)
+
+        cpu_started = time.process_time()
+        started = time.perf_counter()
+        await asyncio.gather(*(player_script(push, 10_000 + i, args, draft) for i in range(players)))
+        # Дожидаемся обработки оставшихся апдейтов
+        for _ in range(100):
+            stats = (await client.get('/control/stats')).json()
+            if not stats['pending'] and application.update_queue.empty():
+                break
+            await asyncio.sleep(0.1)
+        elapsed = time.perf_counter() - started
+        cpu = time.process_time() - cpu_started
+
+        await application.updater.stop()
+        await application.stop()
+
+    calls = stats['calls']
+    outbound = sum(calls.get(m, 0) for m in OUTBOUND_METHODS)
+    all_latencies = [v for values in latencies.values() for v in values]
+    return {
+        'players': players,
+        'updates': len(all_latencies),
+        'elapsed': elapsed,
+        'p50_ms': percentile(all_latencies, 0.50) * 1000,
+        'p99_ms': percentile(all_latencies, 0.99) * 1000,
+        'by_type_p99_ms': {k: percentile(v, 0.99) * 1000 for k, v in latencies.items()},
+        'outbound_per_sec': outbound / elapsed if elapsed else 0.0,
+        'outbound_calls': {m: calls.get(m, 0) for m in OUTBOUND_METHODS},
+        'cpu_ms_per_player': cpu * 1000 / players,
+        'games_finished': sum(1 for i in range(players) if 10_000 + i not in draft.games),
+    }
+
+
+def import_draft(args):
+    """Импорт бота с базами во временном каталоге"""
+    os.environ.setdefault('BOT_TOKEN', FAKE_TOKEN)
+    # Базы стенда не смешиваются с рабочими
+    directory = tempfile.mkdtemp(prefix='geohunter-load-')
+    atexit.register(shutil.rmtree, directory, True)
+    os.environ.setdefault('DB_NAME', os.path.join(directory, 'geohunter.db'))
+    os.environ.setdefault('STATE_DB', os.path.join(directory, 'state.db'))
+    if args.startup_budget is not None:
+        os.environ['STARTUP_BUDGET'] = str(args.startup_budget)
+    logging.getLogger().setLevel(logging.WARNING if not args.verbose else logging.INFO)
+    import draft
+    logging.getLogger().setLevel(logging.WARNING if not args.verbose else logging.INFO)
+    return draft
+
+
+async def run(args):
+    import httpx
+
+    draft = import_draft(args)
+
+    results = []
+    async with httpx.AsyncClient(base_url=f'http://{FAKE_API_HOST}:{args.port}', timeout=30) as client:
+        for _ in range(100):
+            try:
+                await client.get('/control/stats')
+                break
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+        for players in args.players:
+            result = await run_scenario(players, args, client, draft)
+            results.append(result)
+            if not args.json:
+                print(f"{players:>5} игроков: {result['updates']} апдейтов, "
+                      f"p50 {result['p50_ms']:.1f} мс, p99 {result['p99_ms']:.1f} мс, "
+                      f"исходящих {result['outbound_per_sec']:.1f}/с, "
+                      f"CPU {result['cpu_ms_per_player']:.1f} мс/игрок, "
+                      f"завершено игр {result['games_finished']}")
+    startup = draft.tracing.startup
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    elif startup.total is not None:
+        print(f"Запуск до первого апдейта: {startup.total:.2f} с ({startup.report()})")
+    return results, startup
+
+
+# ========== ГОНКА ЗА МЕТКИ ==========
+class FakeBot:
+    """Бот без сети для прямого вызова обработчиков"""
+
+    async def send_message(self, *args, **kwargs):
+        return SimpleNamespace(message_id=1)
+
+    async def edit_message_text(self, *args, **kwargs):
+        return SimpleNamespace(message_id=1)
+
+    async def delete_message(self, *args, **kwargs):
+        return True
+
+
+def claim_stress(args) -> int:
+    """Одна игра под одновременными находками из потока FastAPI и из цикла бота.
+
+    Потоки шлют /api/check_location через TestClient (приложение работает в своем потоке),
+    цикл бота параллельно вызывает check_proximity_and_respond и web_app_data found_spot.
+    Каждая метка должна быть засчитана один раз, а баланс — совпасть с журналом."""
+    import sqlite3
+    import threading
+    from fastapi.testclient import TestClient
+
+    draft = import_draft(args)
+    # Частое переключение потоков делает окна гонки видимыми
+    sys.setswitchinterval(1e-6)
+    # Стенд бьет по меткам без перемещения и без ограничения частоты
+    draft.RATE_LIMITS['check_location'] = (10 ** 9, 1)
+    draft.check_trajectory = lambda user_id, coords: True
+    app = draft.get_app()
+
+    failures = 0
+    for round_index in range(args.claim_stress):
+        user_id = 90_000 + round_index
+        draft.user_balances[user_id] = 0
+        game = draft.create_game(user_id, *START_COORDS, args.mode)
+        spots = [spot['coords'] for spot in game.geospots]
+        start = threading.Barrier(args.claim_threads + 1)
+
+        def api_worker():
+            with TestClient(app) as client:
+                start.wait()
+                for coords in spots * CLAIM_PASSES:
+                    client.post('/api/check_location', json={'token': game.token, 'coords': list(coords)})
+
+        async def bot_worker():
+            user = SimpleNamespace(id=user_id, first_name='Stress', language_code='ru')
+            update = SimpleNamespace(effective_user=user, effective_chat=SimpleNamespace(id=user_id),
+                                     effective_message=SimpleNamespace(web_app_data=None))
+            context = SimpleNamespace(bot=FakeBot(), user_data={})
+            await asyncio.to_thread(start.wait)
+            for _ in range(CLAIM_PASSES):
+                for index, coords in enumerate(spots):
+                    await draft.check_proximity_and_respond(update, context, coords, game)
+                    update.effective_message.web_app_data = SimpleNamespace(
+                        data=json.dumps({'action': 'found_spot', 'spot_id': index, 'coords': list(coords)}))
+                    await draft.web_app_data(update, context)
+                    await asyncio.sleep(0)
+
+        threads = [threading.Thread(target=api_worker) for _ in range(args.claim_threads)]
+        for thread in threads:
+            thread.start()
+        asyncio.run(bot_worker())
+        for thread in threads:
+            thread.join()
+
+        draft.ledger_writer.flush()
+        conn = sqlite3.connect(draft.DB_NAME)
+        try:
+            ledger = conn.execute('SELECT COALESCE(SUM(amount), 0), COUNT(*) FROM transactions WHERE user_id = ?',
+                                  (user_id,)).fetchone()
+        finally:
+            conn.close()
+        found_ids = [id(spot) for spot in game.found_spots]
+        balance = draft.user_balances.get(user_id, 0)
+        problems = []
+        if len(found_ids) != len(spots) or len(set(found_ids)) != len(found_ids):
+            problems.append(f"засчитано {len(found_ids)} находок из {len(spots)} меток")
+        if abs(balance - game.prize_total) > 1e-6 or abs(balance - ledger[0]) > 1e-6:
+            problems.append(f"баланс {balance}, призы игры {game.prize_total}, журнал {ledger[0]}")
+        if game.state.version != len(spots):
+            problems.append(f"дельт о находках {game.state.version}")
+        if problems:
+            failures += 1
+            print(f"Раунд {round_index}: " + "; ".join(problems), file=sys.stderr)
+        draft.end_game(user_id)
+
+    print(f"Гонка за метки: {args.claim_stress} раундов, {args.claim_threads} потоков API + цикл бота, "
+          f"ошибок {failures}")
+    return 1 if failures else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Нагрузочный стенд GeoHunter с фейковым Bot API")
+    parser.add_argument('--players', type=int, nargs='+', default=[10, 50, 100])
+    parser.add_argument('--steps', type=int, default=40, help="шагов трансляции на игрока")
+    parser.add_argument('--step-meters', type=float, default=4.0)
+    parser.add_argument('--interval', type=float, default=0.2, help="пауза между действиями игрока, с")
+    parser.add_argument('--mode', default='standard')
+    parser.add_argument('--port', type=int, default=FAKE_API_PORT)
+    parser.add_argument('--json', action='store_true')
+    parser.add_argument('--verbose', action='store_true')
+    parser.add_argument('--startup-budget', type=float,
+                        help="бюджет от импорта бота до первого апдейта, с; при превышении код выхода 1")
+    parser.add_argument('--claim-stress', type=int, metavar='ROUNDS',
+                        help="вместо нагрузки: гонка за метки одной игры из потока API и цикла бота")
+    parser.add_argument('--claim-threads', type=int, default=8)
+    args = parser.parse_args(argv)
+
+    if args.claim_stress:
+        return claim_stress(args)
+
+    server = multiprocessing.Process(target=run_fake_api, args=(args.port,), daemon=True)
+    server.start()
+    try:
+        _, startup = asyncio.run(run(args))
+    finally:
+        server.terminate()
+        server.join()
+    if args.startup_budget is not None and (startup.total is None or startup.total > args.startup_budget):
+        print(f"Бюджет запуска {args.startup_budget:.1f} с превышен", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,20 @@
+# locks.py
+# Реестр блокировок с разбиением на полосы: фиксированный набор замков, ключ выбирает
+# замок по хешу. Память не зависит от числа пользователей; два пользователя на одной
+# полосе лишь изредка ждут друг друга.
+import threading
+
+DEFAULT_STRIPES = 256
+
+
+class StripedLocks:
+    def __init__(self, stripes=DEFAULT_STRIPES):
+        # RLock: операция под замком пользователя может вызвать другую такую же
+        self.locks = tuple(threading.RLock() for _ in range(stripes))
+
+    def __len__(self):
+        return len(self.locks)
+
+    def __call__(self, key):
+        """Замок для ключа; использовать как with locks(user_id): ..."""
+        return self.locks[hash(key) % len(self.locks)]
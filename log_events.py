@@ -0,0 +1,130 @@
+# log_events.py
+# Неблокирующее логирование: очередь с фоновым потоком вывода, структурные события
+# горячих путей с сэмплированием и ограничением частоты, переключаемые на лету
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')  # text или json
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+
+# Подробные события горячих путей выключены по умолчанию
+HOT_PATH_VERBOSE = os.getenv('LOG_HOT_PATHS', 'False').lower() == 'true'
+
+# Доля событий, попадающих в лог (по умолчанию — все)
+EVENT_SAMPLING = {
+    'location_update': 0.1,
+    'live_location': 0.1,
+    'proximity': 0.05,
+    'spot_generated': 0.1,
+    'message_sent': 0.1,
+}
+# Не больше N событий каждого типа в секунду
+EVENT_RATE_LIMIT = 20.0
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись — одна JSON-строка, поля события сохраняются как есть"""
+
+    def format(self, record):
+        payload = {
+            'ts': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        event = getattr(record, 'event', None)
+        if event is not None:
+            payload['event'] = event
+            payload.update(record.fields)
+        if record.exc_info:
+            payload['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class _EventQueueHandler(logging.handlers.QueueHandler):
+    """Кладет запись в очередь без форматирования: его выполняет фоновый поток"""
+
+    def prepare(self, record):
+        return record
+
+
+def setup_logging():
+    """Настройка корневого логгера: вывод через очередь в отдельном потоке"""
+    global _listener
+    if _listener is not None:
+        return
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(JsonFormatter() if LOG_FORMAT == 'json' else logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers[:] = [_EventQueueHandler(log_queue)]
+    root.setLevel(LOG_LEVEL)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def set_verbose(enabled):
+    """Включение/выключение подробных событий горячих путей"""
+    global HOT_PATH_VERBOSE
+    HOT_PATH_VERBOSE = bool(enabled)
+
+
+class EventLogger:
+    """Структурные события горячих путей с сэмплированием и лимитом частоты"""
+
+    def __init__(self, logger):
+        self.logger = logger
+        self.buckets = {}  # событие -> [токены, время последнего пополнения]
+        self.dropped = {}
+
+    def enabled(self, event):
+        """Дешевая проверка до построения полей события"""
+        if not HOT_PATH_VERBOSE or not self.logger.isEnabledFor(logging.INFO):
+            return False
+        rate = EVENT_SAMPLING.get(event, 1.0)
+        if rate < 1.0 and random.random() >= rate:
+            return False
+        # Token bucket: O(1) на событие
+        now = time.monotonic()
+        bucket = self.buckets.get(event)
+        if bucket is None:
+            bucket = self.buckets[event] = [EVENT_RATE_LIMIT, now]
+        bucket[0] = min(EVENT_RATE_LIMIT, bucket[0] + (now - bucket[1]) * EVENT_RATE_LIMIT)
+        bucket[1] = now
+        if bucket[0] < 1.0:
+            self.dropped[event] = self.dropped.get(event, 0) + 1
+            return False
+        bucket[0] -= 1.0
+        return True
+
+    def log(self, event, **fields):
+        if self.enabled(event):
+            self.emit(event, **fields)
+
+    def emit(self, event, level=logging.INFO, **fields):
+        """Запись события без проверок (для редких, но важных событий)"""
+        # Сообщение собирается лениво в фоновом потоке через %-форматирование
+        self.logger.log(level, '%s %s', event, _LazyFields(fields),
+                        extra={'event': event, 'fields': fields})
+
+
+class _LazyFields:
+    def __init__(self, fields):
+        self.fields = fields
+
+    def __str__(self):
+        return ' '.join(f'{key}={value}' for key, value in self.fields.items())
@@ -0,0 +1,690 @@
+# messages.py
+# Каталог сообщений бота по языкам. Шаблоны разбираются один раз при импорте:
+# строка без подстановок отдается как есть, для остальных сохраняется готовый format_map.
+# Перевод с другим набором подстановок, чем в основном языке, — ошибка при старте, а не в игре.
+import random
+import string
+
+DEFAULT_LANGUAGE = 'ru'
+
+CATALOG = {
+    'ru': {
+        # Кнопки
+        'btn.start_game': "🎮 Начать игру",
+        'btn.open_map': "🌎 Открыть карту",
+        'btn.open_interactive_map': "🌎 Открыть интерактивную карту",
+        'btn.balance': "💰 Мой баланс",
+        'btn.deposit': "💳 Пополнить счет",
+        'btn.make_deposit': "💳 Внести депозит",
+        'btn.top_up': "💳 Пополнить баланс",
+        'btn.invite': "👥 Пригласить друзей",
+        'btn.rules': "❓ Правила",
+        'btn.stats': "📊 Статистика",
+        'btn.my_stats': "📊 Моя статистика",
+        'btn.back': "🔙 Назад",
+        'btn.main_menu': "🏠 Главное меню",
+        'btn.start_live': "📍 Включить трансляцию",
+        'btn.stop_live': "📍 Остановить трансляцию",
+        'btn.confirm_live': "✅ Я включил трансляцию",
+        'btn.send_manually': "📎 Отправить вручную",
+        'btn.cancel_game': "❌ Завершить игру",
+        'btn.history': "📜 Вся история",
+        'btn.deposit_5': "5$",
+        'btn.deposit_10': "10$ (+1$ бонус)",
+        'btn.deposit_20': "20$ (+3$ бонус)",
+
+        'mode.economy': "🟢 Эконом",
+        'mode.standard': "🔵 Стандарт",
+        'mode.premium': "🟣 Премиум",
+
+        # Меню и правила
+        'welcome': (
+            "🌟 Добро пожаловать в GeoHunter! 🌟\n\n"
+            "Я помогу тебе найти скрытые сокровища вокруг тебя!\n\n"
+            "Доступные режимы игры:\n"
+            "🟢 Эконом: 3$ - призы 1-10$\n"
+            "🔵 Стандарт: 5$ - призы 3-15$\n"
+            "🟣 Премиум: 7$ - призы 5-20$\n\n"
+            "💎 Джекпот: {jackpot:.2f} руб. (шанс {jackpot_chance}%)\n\n"
+            "Выбери действие:"
+        ),
+        'choose_action': "Выбери действие:",
+        'rules': (
+            "📜 Правила GeoHunter:\n\n"
+            "1. Выбери режим игры и внеси депозит\n"
+            "2. Запусти игру, отправив свою геопозицию\n"
+            "3. Я создам 5 скрытых геометок в радиусе 100 м\n"
+            "4. Перемещайся по местности и ищи метки\n"
+            "5. Когда приблизишься к метке:\n"
+            "   - 📱 Телефон начнет вибрировать\n"
+            "   - 🔔 Появится звуковой сигнал\n"
+            "   - 📊 Шкала будет показывать близость\n"
+            "6. Найди все метки и собери призы!\n\n"
+            "🔥 Советы:\n"
+            "- Используйте 'Трансляцию геопозиции' для автоматического отслеживания\n"
+            "- Приближайтесь к меткам медленно, чтобы не пропустить их\n\n"
+            "Удачи в охоте! 🗺️"
+        ),
+        'choose_mode': (
+            "🎮 Выбери режим игры:\n\n"
+            "🟢 Эконом (3$)\n"
+            "   - Призы: 1-10$\n\n"
+            "🔵 Стандарт (5$)\n"
+            "   - Призы: 3-15$\n\n"
+            "🟣 Премиум (7$)\n"
+            "   - Призы: 5-20$\n\n"
+            "💎 Во всех режимах есть шанс выиграть джекпот!"
+        ),
+
+        # Начало игры
+        'game.need_deposit': (
+            "Для игры в режиме {mode} требуется {entry_fee}$\n\n"
+            "Что вы можете найти:\n"
+            "• Призы: {min_prize}-{max_prize}$\n"
+            "• Шанс выигрыша: {win_chance}%\n"
+            "• Джекпот: {jackpot:.2f}$\n"
+            "• 5 геометок в радиусе 100 м\n\n"
+            "Хотите попробовать удачу?"
+        ),
+        'game.limit_reached': (
+            "❌ Вы исчерпали лимит игр на сегодня ({limit} игр/день).\n\n"
+            "⏸ Перерыв в игре: еще {hours} ч.\n"
+            "Пригласите друзей, чтобы получить дополнительные игры!"
+        ),
+        'game.mode_selected': (
+            "Отлично! Выбран режим {mode}\n"
+            "С вашего счета списано {entry_fee} руб.\n"
+            "Для начала игры мне нужна твоя текущая геопозиция. "
+            "Выбери способ передачи геопозиции:"
+        ),
+        'game.started': "начата",
+        'game.updated': "обновлена",
+        'game.location': (
+            "🎉 Игра {action}! 🎉\n\n"
+            "Режим: {mode}\n"
+            "В радиусе {radius} м от тебя спрятаны {spots} геометок.\n"
+            "Из них {prizes} содержат призы!\n\n"
+            "<a href='{map_url}'>🗺️ Посмотреть карту с метками</a>\n\n"
+            "Нажми кнопку ниже, чтобы открыть интерактивную карту и начать поиск!"
+        ),
+        'game.send_location': "Пожалуйста, отправь свою текущую геопозицию через меню Telegram:",
+
+        # Пополнение
+        'deposit.choose': (
+            "Выберите сумму депозита:\n\n"
+            "💎 При пополнении от 50 руб. - бонус 5 руб.! \n"
+            "💎 При пополнении от 100 руб. - бонус 15 руб.!"
+        ),
+        'deposit.rate_limited': "⏳ Слишком много запросов на пополнение. Попробуйте через минуту.",
+        'deposit.limit_reached': (
+            "❌ Достигнут лимит пополнений: {limit}$ за 24 часа.\n"
+            "⏸ Перерыв: еще {hours} ч."
+        ),
+        'deposit.done': "✅ Счет успешно пополнен на {amount}$\n",
+        'deposit.bonus': "🎁 Получен бонус: {bonus}$\n",
+        'deposit.balance': "💰 Текущий баланс: {balance}$\n",
+
+        # Баланс
+        'balance.header': (
+            "💰 Ваш баланс: {balance}$\n"
+            "📅 Игр сегодня: {games_today}/{limit}\n\n"
+            "Доступные режимы:\n"
+        ),
+        'balance.mode_games': "{mode}: {games} игр\n",
+        'balance.history': "\nИстория транзакций:\n",
+        'balance.history_empty': "История транзакций пуста\n",
+
+        # Трансляция геопозиции
+        'live.instructions': (
+            "📡 Как включить трансляцию геопозиции:\n\n"
+            "1. Откройте меню вложения (кнопка 📎)\n"
+            "2. Выберите 'Геопозиция'\n"
+            "3. Нажмите 'Транслировать мою геопозицию'\n"
+            "4. Выберите время трансляции\n"
+            "5. Нажмите 'Поделиться'\n\n"
+            "Я буду автоматически отслеживать ваше перемещение!"
+        ),
+        'live.activated': "✅ Трансляция геопозиции активирована! Начинайте поиск!",
+        'live.no_game': "⚠️ Сначала начните игру, отправив геопозицию!",
+        'live.stopped': "⏹ Трансляция геопозиции остановлена.",
+
+        # Поиск меток
+        'spot.progress': (
+            "🔔 Ты близко к геометке! 🔔\n"
+            "Расстояние: {distance:.1f} м\n"
+            "Прогресс: {bar} {progress}%"
+        ),
+        'spot.excluded': "⚠️ Метка засчитана без приза: ваше перемещение выглядит неправдоподобным.",
+        'spot.win': (
+            "🎉 Ура! Ты нашел геометку с призом! 🎉",
+            "💰 Вот это удача! Геометка принесла тебе {prize} руб.!",
+            "🤑 Нашел клад! Забирай {prize} руб.!",
+            "✨ Бинго! Ты нашел {prize} руб. в геометке!",
+            "💎 Ого! Геометка оказалась с сюрпризом: {prize} руб.!",
+        ),
+        'spot.empty': (
+            "🔍 Ты нашел геометку, но она пустая.",
+            "🤷‍♂️ Ничего страшного, эта метка оказалась пустой. Ищи следующую!",
+            "💨 На этот раз не повезло. Метка пустая, но удача уже близко!",
+            "🌫️ Эх, эта геометка пустая. Не сдавайся!",
+            "❌ Пусто... Но в следующий раз обязательно повезет!",
+        ),
+        'spot.jackpot': (
+            "🎰 🎰 🎰 ДЖЕКПОТ! 🎰 🎰 🎰\n\n💎 ВЫ ВЫИГРАЛИ ГЛАВНЫЙ ПРИЗ: {prize} руб.! 💎",
+            "🔥 НЕВЕРОЯТНО! ДЖЕКПОТ {prize} руб.! 🔥\n\nЭто настоящая удача!",
+            "🏆 ПОБЕДА! Ты сорвал джекпот в {prize} руб.! 🏆\n\nПоздравляем!",
+        ),
+        'spot.near_miss': (
+            "Ой! Вы были так близки к выигрышу! Попробуйте еще раз!",
+            "Почти получилось! Следующая метка точно будет удачной!",
+            "Удача уже на вашей стороне! Продолжайте поиски!",
+        ),
+        'spot.balance': "\n\n💰 Твой баланс: {balance} руб.!",
+        'spot.jackpot_footer': "\n\n🎆 Это невероятная удача! 🎆",
+        'spot.win_footer': "\n\n🎯 Продолжай в том же духе!",
+
+        # Итоги
+        'game.completed': (
+            "🏆 ТЫ НАШЕЛ ВСЕ ГЕОМЕТКИ! 🏆\n\n"
+            "Режим: {mode}\n"
+            "Общее время: {minutes} мин {seconds} сек\n"
+            "Найденные призы: {prizes}\n"
+            "Сумма выигрыша: {total} руб.\n\n"
+            "Хочешь сыграть еще раз?"
+        ),
+        'game.none': "У тебя нет активной игры. Начни новую игру!",
+        'game.stats': (
+            "📊 Твоя статистика:\n\n"
+            "Режим: {mode}\n"
+            "🔍 Найдено геометок: {found}/{total}\n"
+            "🎁 Найдено призов: {prizes}\n"
+            "💰 Сумма выигрыша: {winnings} руб.\n"
+            "⏱ Время игры: {minutes} мин {seconds} сек\n\n"
+            "📍 Центр поиска: {lat:.5f}, {lon:.5f}"
+        ),
+        'game.cancelled': (
+            "❌ Игра завершена досрочно!\n\n"
+            "Режим: {mode}\n"
+            "🔍 Ты нашел {found} из {total} геометок\n"
+            "🎁 Призов найдено: {prizes}\n"
+            "💰 Сумма выигрыша: {winnings} руб.\n\n"
+            "Можешь начать новую игру в любое время!"
+        ),
+        'game.no_active': "У тебя нет активной игры.",
+        'game.expired': (
+            "⌛ Игра завершена: давно не было геопозиции.\n"
+            "🔍 Найдено геометок: {found}/{total}"
+        ),
+        'game.expired_refund': "\n💰 Взнос {refund}$ возвращен на баланс.",
+        'live.no_active': "❌ У вас нет активной игры.",
+
+        # Прочее
+        'text.in_game': "Используйте кнопки для управления игрой:",
+        'text.hello': "Привет! Я бот для поиска геометок. Начни игру с помощью /start",
+        'webapp.no_funds': "❌ Недостаточно средств для игры в режиме {mode}",
+        'webapp.game_created': "🎮 Игра создана! Откройте карту, чтобы начать поиск:",
+        'webapp.prize': "🎉 Поздравляем! Вы нашли геометку с призом {prize} руб.!",
+        'webapp.rejected': "⚠️ Результат игры не прошел проверку, приз не начислен.\nВаш текущий баланс: ${balance}",
+        'language.set': "🌐 Язык: русский",
+        'language.usage': "Использование: /language {languages}",
+
+        # Достижения, история, приглашения
+        'achievement.first_win': "🎖 Получено достижение: Первый выигрыш!\n💰 Награда: {reward} руб.",
+        'history.game': "• {date}: {mode}, выигрыш {prize}$ ({status})\n",
+        'history.transaction': "• {date}: {sign}{amount}$ ({type})\n",
+        'history.games_title': "🎮 История игр",
+        'history.transactions_title': "📜 История транзакций",
+        'history.empty': "Пока пусто\n",
+        'btn.next': "➡️ Дальше",
+        'invite': (
+            "👥 Пригласи друзей и получай бонусы!\n\n"
+            "Твоя реферальная ссылка: {link}\n\n"
+            "За каждого приглашенного друга:\n"
+            "• Ты получаешь 5 руб.\n"
+            "• Друг получает +1 бесплатную игру\n"
+            "• Растем вместе! 🚀"
+        ),
+        'btn.open_web': "🌎 Открыть веб-интерфейс",
+        'webapp.open': "Откройте веб-интерфейс для игры:",
+
+        # Джекпот, рейтинг, вывод, бонус
+        'jackpot': (
+            "🎰 ТЕКУЩИЙ ДЖЕКПОТ: {amount:.2f} руб.! 🎰\n\n"
+            "Шанс выигрыша: {chance}%\n"
+            "Джекпот растет с каждой игрой!\n\n"
+            "Для участия в розыгрыше джекпота\n"
+            "просто играйте в любом режиме!"
+        ),
+        'top.period.day': "сегодня",
+        'top.period.week': "неделя",
+        'top.period.all': "все время",
+        'top.metric.spots': "найденные метки",
+        'top.metric.winnings': "выигрыши",
+        'top.title': "🏆 Рейтинг ({period}, {metric}):\n\n",
+        'top.empty': "Пока никого нет — станьте первым!\n",
+        'top.spots': "{score} меток",
+        'top.winnings': "{score:.2f} руб.",
+        'top.player': "Игрок {user_id}",
+        'top.row': "{place}. {name} — {value}\n",
+        'top.your_place': "\nВаше место: {place}",
+        'withdraw.too_small': (
+            "❌ Минимальная сумма для вывода: {minimum} руб.\n"
+            "💰 Ваш текущий баланс: {balance} руб.\n\n"
+            "Продолжайте играть, чтобы накопить нужную сумму!"
+        ),
+        'withdraw.accepted': (
+            "✅ Запрос на вывод {amount} руб. принят!\n\n"
+            "Обычно обработка занимает до 24 часов.\n"
+            "Средства поступят на ваш счет в течение\n"
+            "рабочего дня после подтверждения."
+        ),
+        'bonus.already': "❌ Вы уже получали ежедневный бонус сегодня. Приходите завтра!",
+        'bonus.received': (
+            "🎁 Ежедневный бонус: {amount} руб.! 🎁\n\n"
+            "💰 Ваш баланс: {balance} руб.\n"
+            "Возвращайтесь завтра за новым бонусом!"
+        ),
+        'check.no_location': "Нет информации о вашем местоположении",
+        'check.done': "Проверка расстояния выполнена",
+
+        # Команды администратора
+        'admin.only': "Эта команда только для администратора",
+        'admin.stats': (
+            "📊 Админ-статистика GeoHunter:\n\n"
+            "• Активных игр: {games}\n"
+            "• Уникальных игроков: {players}\n"
+            "• Всего игр: {total_games}\n"
+            "• Общие депозиты: {deposits} руб.\n"
+            "• Общие выигрыши: {prizes} руб.\n"
+            "• Доход: {revenue} руб.\n"
+            "• Фактическое преимущество: {house_edge:.2%}\n"
+            "• Размер джекпота: {jackpot:.2f} руб.\n"
+            "• Выигрышей джекпота: {jackpot_wins}\n\n"
+            "Текущие игры:\n"
+        ),
+        'admin.stats_game': (
+            "👤 Пользователь: {user_id}\n"
+            "🎮 Режим: {mode}\n"
+            "🔍 Найдено: {found}/{total}\n"
+            "⏱ Время: {minutes} мин (простой {idle} мин)\n"
+            "📍 Трансляция: {live}\n"
+            "📍 Центр: {lat:.5f}, {lon:.5f}\n\n"
+        ),
+        'admin.memory': "🧠 Память GeoHunter:\n\n{report}\n\nСвернуто окон счетчиков: {rolled}\nИгр за все время: {total_games}\nПополнено за время работы: {deposited}$",
+        'admin.export_usage': "Использование: /export transactions|games [YYYY-MM-DD] [YYYY-MM-DD] [csv|ndjson]",
+        'admin.verbose_on': "📝 Подробные логи: включены\nОтброшено лимитом: {dropped}",
+        'admin.verbose_off': "📝 Подробные логи: выключены\nОтброшено лимитом: {dropped}",
+        'admin.profile_caption': "🔥 Стеки в формате flamegraph (collapsed)",
+        'admin.profile_not_running': "Профилировщик не запущен",
+        'admin.profile_usage': "Использование: /profile [секунды|stop]",
+        'admin.profile_running': "Профилировщик уже запущен",
+        'admin.profile_started': "⏱ Профилирование запущено на {seconds} с",
+    },
+    'en': {
+        'btn.start_game': "🎮 Start game",
+        'btn.open_map': "🌎 Open map",
+        'btn.open_interactive_map': "🌎 Open interactive map",
+        'btn.balance': "💰 My balance",
+        'btn.deposit': "💳 Top up",
+        'btn.make_deposit': "💳 Make a deposit",
+        'btn.top_up': "💳 Top up balance",
+        'btn.invite': "👥 Invite friends",
+        'btn.rules': "❓ Rules",
+        'btn.stats': "📊 Statistics",
+        'btn.my_stats': "📊 My statistics",
+        'btn.back': "🔙 Back",
+        'btn.main_menu': "🏠 Main menu",
+        'btn.start_live': "📍 Share live location",
+        'btn.stop_live': "📍 Stop live location",
+        'btn.confirm_live': "✅ I'm sharing my location",
+        'btn.send_manually': "📎 Send manually",
+        'btn.cancel_game': "❌ End game",
+        'btn.history': "📜 Full history",
+        'btn.deposit_5': "$5",
+        'btn.deposit_10': "$10 (+$1 bonus)",
+        'btn.deposit_20': "$20 (+$3 bonus)",
+
+        'mode.economy': "🟢 Economy",
+        'mode.standard': "🔵 Standard",
+        'mode.premium': "🟣 Premium",
+
+        'welcome': (
+            "🌟 Welcome to GeoHunter! 🌟\n\n"
+            "I'll help you find hidden treasures around you!\n\n"
+            "Game modes:\n"
+            "🟢 Economy: $3 - prizes $1-10\n"
+            "🔵 Standard: $5 - prizes $3-15\n"
+            "🟣 Premium: $7 - prizes $5-20\n\n"
+            "💎 Jackpot: {jackpot:.2f} (chance {jackpot_chance}%)\n\n"
+            "Choose an action:"
+        ),
+        'choose_action': "Choose an action:",
+        'rules': (
+            "📜 GeoHunter rules:\n\n"
+            "1. Choose a game mode and make a deposit\n"
+            "2. Start the game by sending your location\n"
+            "3. I'll hide 5 geospots within 100 m of you\n"
+            "4. Walk around and look for them\n"
+            "5. When you get close to a spot:\n"
+            "   - 📱 Your phone vibrates\n"
+            "   - 🔔 A sound plays\n"
+            "   - 📊 The bar shows how close you are\n"
+            "6. Find all the spots and collect the prizes!\n\n"
+            "🔥 Tips:\n"
+            "- Share your live location for automatic tracking\n"
+            "- Approach spots slowly so you don't miss them\n\n"
+            "Happy hunting! 🗺️"
+        ),
+        'choose_mode': (
+            "🎮 Choose a game mode:\n\n"
+            "🟢 Economy ($3)\n"
+            "   - Prizes: $1-10\n\n"
+            "🔵 Standard ($5)\n"
+            "   - Prizes: $3-15\n\n"
+            "🟣 Premium ($7)\n"
+            "   - Prizes: $5-20\n\n"
+            "💎 Every mode can win the jackpot!"
+        ),
+
+        'game.need_deposit': (
+            "The {mode} mode costs ${entry_fee}\n\n"
+            "What you can find:\n"
+            "• Prizes: ${min_prize}-{max_prize}\n"
+            "• Win chance: {win_chance}%\n"
+            "• Jackpot: ${jackpot:.2f}\n"
+            "• 5 geospots within 100 m\n\n"
+            "Ready to try your luck?"
+        ),
+        'game.limit_reached': (
+            "❌ You've reached today's game limit ({limit} games/day).\n\n"
+            "⏸ Break: {hours} h left.\n"
+            "Invite friends to get extra games!"
+        ),
+        'game.mode_selected': (
+            "Great! {mode} mode selected\n"
+            "{entry_fee} has been charged to your account.\n"
+            "To start I need your current location. "
+            "Choose how to share it:"
+        ),
+        'game.started': "started",
+        'game.updated': "updated",
+        'game.location': (
+            "🎉 Game {action}! 🎉\n\n"
+            "Mode: {mode}\n"
+            "{spots} geospots are hidden within {radius} m of you.\n"
+            "{prizes} of them hold prizes!\n\n"
+            "<a href='{map_url}'>🗺️ View the map with spots</a>\n\n"
+            "Tap the button below to open the interactive map and start searching!"
+        ),
+        'game.send_location': "Please send your current location from the Telegram menu:",
+
+        'deposit.choose': (
+            "Choose a deposit amount:\n\n"
+            "💎 Deposit 50 or more - get a 5 bonus!\n"
+            "💎 Deposit 100 or more - get a 15 bonus!"
+        ),
+        'deposit.rate_limited': "⏳ Too many top-up requests. Please try again in a minute.",
+        'deposit.limit_reached': (
+            "❌ Deposit limit reached: ${limit} per 24 hours.\n"
+            "⏸ Break: {hours} h left."
+        ),
+        'deposit.done': "✅ Your account was topped up with ${amount}\n",
+        'deposit.bonus': "🎁 Bonus received: ${bonus}\n",
+        'deposit.balance': "💰 Current balance: ${balance}\n",
+
+        'balance.header': (
+            "💰 Your balance: ${balance}\n"
+            "📅 Games today: {games_today}/{limit}\n\n"
+            "Available modes:\n"
+        ),
+        'balance.mode_games': "{mode}: {games} games\n",
+        'balance.history': "\nTransaction history:\n",
+        'balance.history_empty': "No transactions yet\n",
+
+        'live.instructions': (
+            "📡 How to share your live location:\n\n"
+            "1. Open the attachment menu (📎 button)\n"
+            "2. Choose 'Location'\n"
+            "3. Tap 'Share My Live Location'\n"
+            "4. Choose how long to share\n"
+            "5. Tap 'Share'\n\n"
+            "I'll follow your movement automatically!"
+        ),
+        'live.activated': "✅ Live location is on! Start searching!",
+        'live.no_game': "⚠️ Start a game first by sending your location!",
+        'live.stopped': "⏹ Live location stopped.",
+
+        'spot.progress': (
+            "🔔 You're close to a geospot! 🔔\n"
+            "Distance: {distance:.1f} m\n"
+            "Progress: {bar} {progress}%"
+        ),
+        'spot.excluded': "⚠️ Spot counted without a prize: your movement looks implausible.",
+        'spot.win': (
+            "🎉 Hooray! You found a geospot with a prize! 🎉",
+            "💰 What luck! The geospot brought you {prize}!",
+            "🤑 Treasure found! Take your {prize}!",
+            "✨ Bingo! You found {prize} in the geospot!",
+            "💎 Wow! The geospot had a surprise: {prize}!",
+        ),
+        'spot.empty': (
+            "🔍 You found a geospot, but it's empty.",
+            "🤷‍♂️ No worries, this spot was empty. Find the next one!",
+            "💨 No luck this time. The spot is empty, but luck is near!",
+            "🌫️ This geospot is empty. Don't give up!",
+            "❌ Empty... You'll be lucky next time!",
+        ),
+        'spot.jackpot': (
+            "🎰 🎰 🎰 JACKPOT! 🎰 🎰 🎰\n\n💎 YOU WON THE GRAND PRIZE: {prize}! 💎",
+            "🔥 INCREDIBLE! JACKPOT {prize}! 🔥\n\nThat's real luck!",
+            "🏆 VICTORY! You hit the {prize} jackpot! 🏆\n\nCongratulations!",
+        ),
+        'spot.near_miss': (
+            "Oh! You were so close to winning! Try again!",
+            "Almost! The next spot will surely be lucky!",
+            "Luck is on your side! Keep searching!",
+        ),
+        'spot.balance': "\n\n💰 Your balance: {balance}!",
+        'spot.jackpot_footer': "\n\n🎆 Incredible luck! 🎆",
+        'spot.win_footer': "\n\n🎯 Keep it up!",
+
+        'game.completed': (
+            "🏆 YOU FOUND ALL THE GEOSPOTS! 🏆\n\n"
+            "Mode: {mode}\n"
+            "Total time: {minutes} min {seconds} s\n"
+            "Prizes found: {prizes}\n"
+            "Total winnings: {total}\n\n"
+            "Play again?"
+        ),
+        'game.none': "You have no active game. Start a new one!",
+        'game.stats': (
+            "📊 Your statistics:\n\n"
+            "Mode: {mode}\n"
+            "🔍 Geospots found: {found}/{total}\n"
+            "🎁 Prizes found: {prizes}\n"
+            "💰 Winnings: {winnings}\n"
+            "⏱ Game time: {minutes} min {seconds} s\n\n"
+            "📍 Search center: {lat:.5f}, {lon:.5f}"
+        ),
+        'game.cancelled': (
+            "❌ Game ended early!\n\n"
+            "Mode: {mode}\n"
+            "🔍 You found {found} of {total} geospots\n"
+            "🎁 Prizes found: {prizes}\n"
+            "💰 Winnings: {winnings}\n\n"
+            "You can start a new game any time!"
+        ),
+        'game.no_active': "You have no active game.",
+        'game.expired': (
+            "⌛ Game ended: no location received for a while.\n"
+            "🔍 Geospots found: {found}/{total}"
+        ),
+        'game.expired_refund': "\n💰 Your ${refund} entry fee was returned to your balance.",
+        'live.no_active': "❌ You have no active game.",
+
+        'text.in_game': "Use the buttons to control the game:",
+        'text.hello': "Hi! I'm a geospot hunting bot. Start a game with /start",
+        'webapp.no_funds': "❌ Not enough funds to play {mode} mode",
+        'webapp.game_created': "🎮 Game created! Open the map to start searching:",
+        'webapp.prize': "🎉 Congratulations! You found a geospot with a {prize} prize!",
+        'webapp.rejected': "⚠️ Game result could not be verified, no prize was credited.\nYour current balance: ${balance}",
+        'language.set': "🌐 Language: English",
+        'language.usage': "Usage: /language {languages}",
+
+        'achievement.first_win': "🎖 Achievement unlocked: First win!\n💰 Reward: {reward}",
+        'history.game': "• {date}: {mode}, won ${prize} ({status})\n",
+        'history.transaction': "• {date}: {sign}${amount} ({type})\n",
+        'history.games_title': "🎮 Game history",
+        'history.transactions_title': "📜 Transaction history",
+        'history.empty': "Nothing here yet\n",
+        'btn.next': "➡️ Next",
+        'invite': (
+            "👥 Invite friends and get bonuses!\n\n"
+            "Your referral link: {link}\n\n"
+            "For every friend you invite:\n"
+            "• You get 5\n"
+            "• Your friend gets +1 free game\n"
+            "• We grow together! 🚀"
+        ),
+        'btn.open_web': "🌎 Open web interface",
+        'webapp.open': "Open the web interface to play:",
+
+        'jackpot': (
+            "🎰 CURRENT JACKPOT: {amount:.2f}! 🎰\n\n"
+            "Win chance: {chance}%\n"
+            "The jackpot grows with every game!\n\n"
+            "To take part in the jackpot draw\n"
+            "just play in any mode!"
+        ),
+        'top.period.day': "today",
+        'top.period.week': "week",
+        'top.period.all': "all time",
+        'top.metric.spots': "spots found",
+        'top.metric.winnings': "winnings",
+        'top.title': "🏆 Leaderboard ({period}, {metric}):\n\n",
+        'top.empty': "Nobody here yet — be the first!\n",
+        'top.spots': "{score} spots",
+        'top.winnings': "{score:.2f}",
+        'top.player': "Player {user_id}",
+        'top.row': "{place}. {name} — {value}\n",
+        'top.your_place': "\nYour place: {place}",
+        'withdraw.too_small': (
+            "❌ Minimum withdrawal: {minimum}\n"
+            "💰 Your current balance: {balance}\n\n"
+            "Keep playing to reach the minimum!"
+        ),
+        'withdraw.accepted': (
+            "✅ Withdrawal request for {amount} accepted!\n\n"
+            "Processing usually takes up to 24 hours.\n"
+            "Funds arrive within one business day\n"
+            "after confirmation."
+        ),
+        'bonus.already': "❌ You've already claimed today's bonus. Come back tomorrow!",
+        'bonus.received': (
+            "🎁 Daily bonus: {amount}! 🎁\n\n"
+            "💰 Your balance: {balance}\n"
+            "Come back tomorrow for another bonus!"
+        ),
+        'check.no_location': "No information about your location",
+        'check.done': "Distance check done",
+
+        'admin.only': "This command is for the administrator only",
+        'admin.stats': (
+            "📊 GeoHunter admin statistics:\n\n"
+            "• Active games: {games}\n"
+            "• Unique players: {players}\n"
+            "• Total games: {total_games}\n"
+            "• Total deposits: {deposits}\n"
+            "• Total prizes: {prizes}\n"
+            "• Revenue: {revenue}\n"
+            "• Actual house edge: {house_edge:.2%}\n"
+            "• Jackpot: {jackpot:.2f}\n"
+            "• Jackpot wins: {jackpot_wins}\n\n"
+            "Current games:\n"
+        ),
+        'admin.stats_game': (
+            "👤 User: {user_id}\n"
+            "🎮 Mode: {mode}\n"
+            "🔍 Found: {found}/{total}\n"
+            "⏱ Time: {minutes} min (idle {idle} min)\n"
+            "📍 Live location: {live}\n"
+            "📍 Center: {lat:.5f}, {lon:.5f}\n\n"
+        ),
+        'admin.memory': "🧠 GeoHunter memory:\n\n{report}\n\nCounter windows rolled up: {rolled}\nGames all time: {total_games}\nDeposited since start: {deposited}$",
+        'admin.export_usage': "Usage: /export transactions|games [YYYY-MM-DD] [YYYY-MM-DD] [csv|ndjson]",
+        'admin.verbose_on': "📝 Verbose logs: on\nDropped by rate limit: {dropped}",
+        'admin.verbose_off': "📝 Verbose logs: off\nDropped by rate limit: {dropped}",
+        'admin.profile_caption': "🔥 Stacks in flamegraph (collapsed) format",
+        'admin.profile_not_running': "The profiler is not running",
+        'admin.profile_usage': "Usage: /profile [seconds|stop]",
+        'admin.profile_running': "The profiler is already running",
+        'admin.profile_started': "⏱ Profiling started for {seconds} s",
+    },
+}
+
+LANGUAGES = tuple(CATALOG)
+
+_formatter = string.Formatter()
+
+
+class Template:
+    """Разобранный шаблон: имена подстановок и готовая функция подстановки"""
+    __slots__ = ('source', 'fields', 'render')
+
+    def __init__(self, source):
+        self.source = source
+        self.fields = frozenset(field.split('.')[0].split('[')[0]
+                                for _, field, _, _ in _formatter.parse(source) if field is not None)
+        self.render = source.format_map if self.fields else None
+
+    def __call__(self, params):
+        return self.render(params) if self.render is not None else self.source
+
+
+def compile_catalog(catalog=CATALOG, default=DEFAULT_LANGUAGE):
+    """{язык: {ключ: Template или кортеж Template}}; недостающие ключи берутся из языка по умолчанию"""
+    def compile_entry(value):
+        return tuple(Template(v) for v in value) if isinstance(value, tuple) else Template(value)
+
+    def fields(entry):
+        return frozenset().union(*(t.fields for t in entry)) if isinstance(entry, tuple) else entry.fields
+
+    base = {key: compile_entry(value) for key, value in catalog[default].items()}
+    compiled = {default: base}
+    for lang, entries in catalog.items():
+        if lang == default:
+            continue
+        unknown = set(entries) - set(base)
+        if unknown:
+            raise ValueError(f"{lang}: ключей нет в языке {default}: {sorted(unknown)}")
+        table = dict(base)
+        for key, value in entries.items():
+            entry = compile_entry(value)
+            if not fields(entry) <= fields(base[key]):
+                raise ValueError(f"{lang}.{key}: подстановки {sorted(fields(entry) - fields(base[key]))} "
+                                 f"не передаются в {default}.{key}")
+            table[key] = entry
+        compiled[lang] = table
+    return compiled
+
+
+COMPILED = compile_catalog()
+
+
+def language_for(code):
+    """Язык каталога для кода Telegram ('ru', 'en-US', None...)"""
+    if code:
+        code = code.split('-')[0].lower()
+        if code in COMPILED:
+            return code
+    return DEFAULT_LANGUAGE
+
+
+def text(lang, key, **params):
+    """Сообщение key на языке lang"""
+    return COMPILED.get(lang, COMPILED[DEFAULT_LANGUAGE])[key](params)
+
+
+def choice(lang, key, **params):
+    """Случайный вариант сообщения из списка key"""
+    return random.choice(COMPILED.get(lang, COMPILED[DEFAULT_LANGUAGE])[key])(params)
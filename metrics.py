@@ -0,0 +1,211 @@
+# metrics.py
+# Легковесные метрики в текстовом формате Prometheus (без внешних зависимостей)
+import time
+import bisect
+import functools
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import tracing
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Границы бакетов латентности в секундах
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values, extra=''):
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def collect(self):
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} counter'
+        for label_values, value in list(self.values.items()):
+            yield f'{self.name}{_format_labels(self.labels, label_values)} {value}'
+
+
+class Gauge:
+    """Значение снимается функцией в момент сбора"""
+
+    def __init__(self, name, help_text, func):
+        self.name = name
+        self.help = help_text
+        self.func = func
+
+    def collect(self):
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} gauge'
+        yield f'{self.name} {self.func()}'
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS, span_kind=None):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.span_kind = span_kind  # Замеры также попадают в активную трассу
+        self.series = {}  # значения меток -> [счетчики бакетов..., сумма, количество]
+        self.lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+        if self.span_kind is not None:
+            tracing.add_span(self.span_kind, '.'.join(label_values), value)
+
+    def time(self, *label_values):
+        return _Timer(self, label_values)
+
+    def collect(self):
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} histogram'
+        for label_values, series in list(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                labels = _format_labels(self.labels, label_values, 'le="' + le + '"')
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = _format_labels(self.labels, label_values)
+            yield f'{self.name}_sum{labels} {series[-2]}'
+            yield f'{self.name}_count{labels} {series[-1]}'
+
+
+class _Timer:
+    def __init__(self, histogram, label_values):
+        self.histogram = histogram
+        self.label_values = label_values
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, *self.label_values)
+        return False
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def gauge(self, name, help_text, func):
+        return self.register(Gauge(name, help_text, func))
+
+    def render(self):
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+HANDLER_LATENCY = REGISTRY.register(Histogram(
+    'geohunter_handler_seconds', 'Время обработки апдейта обработчиком PTB', ('handler',)))
+HANDLER_ERRORS = REGISTRY.register(Counter(
+    'geohunter_handler_errors_total', 'Исключения в обработчиках PTB', ('handler',)))
+DB_QUERY_LATENCY = REGISTRY.register(Histogram(
+    'geohunter_db_query_seconds', 'Время запроса к базе данных', ('query',), span_kind='db'))
+BOT_API_LATENCY = REGISTRY.register(Histogram(
+    'geohunter_bot_api_seconds', 'Время вызова Telegram Bot API', ('method',), span_kind='bot_api'))
+PROVIDER_LATENCY = REGISTRY.register(Histogram(
+    'geohunter_provider_seconds', 'Время вызова платежного провайдера', ('provider', 'call'),
+    span_kind='provider'))
+PROVIDER_ERRORS = REGISTRY.register(Counter(
+    'geohunter_provider_errors_total', 'Ошибки вызовов платежного провайдера', ('provider', 'call')))
+DB_CACHE_LOOKUPS = REGISTRY.register(Counter(
+    'geohunter_db_cache_lookups_total', 'Обращения к кэшу пользователей Database', ('result',)))
+TRAJECTORY_FLAGS = REGISTRY.register(Counter(
+    'geohunter_trajectory_flags_total', 'Координаты с неправдоподобным перемещением', ('verdict',)))
+GAMES_EXPIRED = REGISTRY.register(Counter(
+    'geohunter_games_expired_total', 'Игры, завершенные по простою', ('mode',)))
+
+
+def instrument_handler(callback):
+    """Обертка обработчика PTB: латентность, ошибки и трасса апдейта"""
+    name = callback.__name__
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        token = tracing.start_trace(name)
+        started = time.perf_counter()
+        try:
+            return await callback(update, context)
+        except Exception:
+            HANDLER_ERRORS.inc(name)
+            raise
+        finally:
+            HANDLER_LATENCY.observe(time.perf_counter() - started, name)
+            tracing.finish_trace(token)
+            tracing.startup.first_update()
+
+    return wrapper
+
+
+def timed_query(method):
+    """Декоратор метода Database: время запроса по имени метода"""
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            DB_QUERY_LATENCY.observe(time.perf_counter() - started, name)
+
+    return wrapper
+
+
+def record_cache_lookup(hit):
+    DB_CACHE_LOOKUPS.inc('hit' if hit else 'miss')
+
+
+def start_http_server(port, host='0.0.0.0'):
+    """Отдельный /metrics для процессов без FastAPI"""
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != '/metrics':
+                self.send_error(404)
+                return
+            body = REGISTRY.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,60 @@
+# periodic.py
+# Периодические задачи бота. Обычно их выполняет JobQueue PTB, но она есть только
+# при установке python-telegram-bot[job-queue]; без нее задачи не должны молча пропадать —
+# они запускаются как задачи asyncio после старта приложения и отменяются при остановке.
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+_fallback_jobs = {}  # Приложение -> [(колбэк, интервал, первая задержка)]
+_fallback_tasks = {}  # Приложение -> [asyncio.Task]
+
+
+def add_hook(application, name, hook):
+    """Добавить обработчик post_init/post_stop/post_shutdown, сохранив уже заданный"""
+    previous = getattr(application, name)
+
+    async def chained(app):
+        if previous is not None:
+            await previous(app)
+        await hook(app)
+
+    setattr(application, name, chained)
+
+
+def run_repeating(application, callback, interval, first=0):
+    """Повторять callback(context) каждые interval секунд, начиная через first"""
+    if application.job_queue is not None:
+        application.job_queue.run_repeating(callback, interval=interval, first=first)
+        return
+    jobs = _fallback_jobs.setdefault(application, [])
+    if not jobs:
+        logger.warning("JobQueue is not available (install python-telegram-bot[job-queue]); "
+                       "periodic jobs will run as asyncio tasks")
+        add_hook(application, 'post_init', _start_tasks)
+        add_hook(application, 'post_shutdown', _stop_tasks)
+    jobs.append((callback, interval, first))
+
+
+async def _repeat(application, callback, interval, first):
+    context = application.context_types.context(application)
+    await asyncio.sleep(first)
+    while True:
+        try:
+            await callback(context)
+        except Exception as e:
+            logger.error(f"Periodic job {callback.__name__} failed: {e}")
+        await asyncio.sleep(interval)
+
+
+async def _start_tasks(application):
+    _fallback_tasks[application] = [asyncio.get_running_loop().create_task(_repeat(application, *job))
+                                    for job in _fallback_jobs.get(application, ())]
+
+
+async def _stop_tasks(application):
+    tasks = _fallback_tasks.pop(application, [])
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,96 @@
+# stats.py
+# Статистика с ограниченной памятью: вытеснение неактивных пользователей,
+# приблизительный подсчет уникальных игроков и отчет о потреблении памяти
+import sys
+import math
+import hashlib
+from collections import OrderedDict
+
+
+class HyperLogLog:
+    """Приблизительный подсчет уникальных элементов в фиксированной памяти"""
+
+    def __init__(self, precision=12):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+        # Стандартная поправка для m >= 128
+        self.alpha = 0.7213 / (1 + 1.079 / self.size)
+
+    def add(self, item):
+        digest = hashlib.blake2b(str(item).encode('utf-8'), digest_size=8).digest()
+        value = int.from_bytes(digest, 'big')
+        index = value >> (64 - self.precision)
+        rest = value & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        estimate = self.alpha * self.size * self.size / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        # Коррекция для малых значений (linear counting)
+        if estimate <= 2.5 * self.size and zeros:
+            return int(round(self.size * math.log(self.size / zeros)))
+        return int(round(estimate))
+
+    def __len__(self):
+        return self.count()
+
+
+class IdleEvictor:
+    """Учет активности пользователей для вытеснения неактивных записей"""
+
+    def __init__(self, ttl_seconds):
+        self.ttl_seconds = ttl_seconds
+        self.last_seen = OrderedDict()
+
+    def touch(self, user_id, now):
+        self.last_seen[user_id] = now
+        self.last_seen.move_to_end(user_id)
+
+    def expired(self, now):
+        """Пользователи, неактивные дольше TTL (самые старые в начале)"""
+        cutoff = now - self.ttl_seconds
+        result = []
+        for user_id, seen in self.last_seen.items():
+            if seen > cutoff:
+                break
+            result.append(user_id)
+        for user_id in result:
+            del self.last_seen[user_id]
+        return result
+
+
+def deep_sizeof(obj, seen=None):
+    """Приблизительный размер объекта вместе с содержимым, в байтах"""
+    seen = set() if seen is None else seen
+    total = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)) or hasattr(item, 'maxlen'):
+            stack.extend(item)
+        elif hasattr(item, '__dict__'):
+            stack.append(vars(item))
+    return total
+
+
+def memory_report(containers):
+    """Отчет: число записей и приблизительный размер каждой структуры"""
+    lines = []
+    total = 0
+    for name, container in containers.items():
+        size = deep_sizeof(container)
+        total += size
+        entries = container.size if isinstance(container, HyperLogLog) else len(container)
+        lines.append(f"• {name}: {entries} записей, ~{size / 1024:.1f} КБ")
+    lines.append(f"Итого: ~{total / 1024:.1f} КБ")
+    return "\n".join(lines)
@@ -0,0 +1,14 @@
+# tests/conftest.py
+# Общие настройки тестов: модули лежат в корне репозитория, базы — во временном каталоге
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# draft читает окружение при импорте: не трогаем рабочие базы
+_tmp = tempfile.mkdtemp(prefix='geohunter-tests-')
+os.environ.setdefault('DB_NAME', os.path.join(_tmp, 'geohunter.db'))
+os.environ.setdefault('STATE_DB', os.path.join(_tmp, 'state.db'))
+os.environ.setdefault('BOT_TOKEN', '123:test')
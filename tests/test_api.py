@@ -0,0 +1,81 @@
+# tests/test_api.py
+# Доступ к игре только по токену сессии; находки из веб-приложения — только рядом с меткой
+import json
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+import draft
+import trajectory
+
+
+@pytest.fixture
+def game():
+    user_id = 270001
+    draft.user_balances[user_id] = 0
+    game = draft.create_game(user_id, 55.75, 37.61, 'standard')
+    yield game
+    draft.end_game(user_id)
+    draft.trajectories.reset(user_id)
+
+
+class Bot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, *args, **kwargs):
+        self.sent.append(kwargs.get('text'))
+
+
+def send_found_spot(game, **fields):
+    user = SimpleNamespace(id=game.user_id, first_name='Test', language_code='ru')
+    update = SimpleNamespace(effective_user=user, effective_chat=SimpleNamespace(id=game.user_id),
+                             effective_message=SimpleNamespace(web_app_data=SimpleNamespace(
+                                 data=json.dumps({'action': 'found_spot', **fields}))))
+    asyncio.run(draft.web_app_data(update, SimpleNamespace(bot=Bot(), user_data={})))
+
+
+def test_web_app_claim_requires_proximity(game):
+    spot = game.geospots[0]
+    send_found_spot(game, spot_id=0)
+    send_found_spot(game, spot_id=0, coords=[56.75, 38.61])
+    assert not spot['found']
+
+    send_found_spot(game, spot_id=0, coords=list(spot['coords']))
+    assert spot['found']
+    assert game.found_spots == [spot]
+
+
+def test_websocket_requires_session_token(game):
+    client = TestClient(draft.get_app())
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect(f'/ws/{game.user_id}') as websocket:
+            websocket.receive_text()
+    with client.websocket_connect(f'/ws/{game.token}'):
+        assert game.user_id in draft.manager.active_connections
+
+
+def test_balance_change_is_a_delta(game):
+    client = TestClient(draft.get_app())
+    version = game.state.version
+    balance = draft.adjust_balance(game.user_id, 7)
+    assert client.get(f'/api/game/{game.token}?since={version}').json() == {
+        'v': version + 1, 'd': [{'v': version + 1, 'e': 'b', 'b': balance}], 'b': balance}
+
+    # Находка несет баланс в своей дельте: отдельной дельты баланса нет
+    game.geospots[0].update(has_prize=True, prize_amount=3)
+    game.claim_spot(0)
+    deltas = client.get(f'/api/game/{game.token}?since={version + 1}').json()['d']
+    assert [(delta['e'], delta['b']) for delta in deltas] == [('f', balance + 3)]
+
+
+def test_radius_follows_game_mode(game):
+    client = TestClient(draft.get_app())
+    radius = draft.GAME_MODES['standard']['search_radius']
+    assert client.get(f'/api/game/{game.token}').json()['radius'] == radius
+    assert client.get(f'/api/state/{game.token}').json()['radius'] == radius
+    center = game.center
+    assert all(trajectory.distance_m(*center, *spot['coords']) <= radius + 1 for spot in game.geospots)
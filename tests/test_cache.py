@@ -0,0 +1,51 @@
+# tests/test_cache.py
+# Кэш пользователей: запись в базу сразу видна при следующем чтении,
+# а заполнение кэша, обогнанное записью, не возвращает старое значение
+from types import SimpleNamespace
+
+import pytest
+
+from cache import LRUCache, MISSING
+from database import Database
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database(str(tmp_path / 'cache.db'))
+    db.create_user(SimpleNamespace(id=1, username='u', first_name='U', last_name=None))
+    return db
+
+
+def test_put_with_stale_generation_is_dropped():
+    cache = LRUCache()
+    generation = cache.generation
+    cache.invalidate('key')
+    cache.put('key', 'old', generation)
+    assert cache.get('key') is MISSING
+    cache.put('key', 'new', cache.generation)
+    assert cache.get('key') == 'new'
+
+
+def test_write_read_write_read(db):
+    db.update_balance(1, 10)
+    assert db.get_balance(1) == 10
+    db.update_balance(1, 5)
+    assert db.get_balance(1) == 15
+    assert db.get_user(1)['balance'] == db.fetch_user(1)['balance'] == 15
+
+
+def test_invalidation_during_fill(db, monkeypatch):
+    db.user_cache.clear()
+    fetch_user = db.fetch_user
+
+    def racing_fetch(user_id):
+        # Чтение из базы уже состоялось, а до записи в кэш успевает пройти начисление
+        user = fetch_user(user_id)
+        monkeypatch.setattr(db, 'fetch_user', fetch_user)
+        db.update_balance(user_id, 7)
+        return user
+
+    monkeypatch.setattr(db, 'fetch_user', racing_fetch)
+    assert db.get_user(1)['balance'] == 0  # Вызов, начатый до записи, видит старое значение
+    assert 1 not in db.user_cache          # но не кладет его в кэш
+    assert db.get_balance(1) == 7
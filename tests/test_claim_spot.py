@@ -0,0 +1,62 @@
+# tests/test_claim_spot.py
+# Метку забирает ровно один из конкурирующих потоков, приз начисляется один раз
+import time
+import threading
+
+import draft
+from locks import StripedLocks
+
+THREADS = 16
+
+
+class SlowSpot(dict):
+    """Метка, чтение флага которой уступает поток: расширяет окно между проверкой и отметкой"""
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        if key == 'found':
+            time.sleep(0.001)
+        return value
+
+
+def claim_concurrently(game, spot_index):
+    barrier = threading.Barrier(THREADS)
+    results = []
+
+    def worker():
+        barrier.wait()
+        results.append(game.claim_spot(spot_index))
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_one_thread_claims_the_spot():
+    user_id = 470001
+    game = draft.create_game(user_id, 55.75, 37.61, 'standard')
+    try:
+        game.geospots[0] = SlowSpot(game.geospots[0], has_prize=True, prize_amount=25)
+        before = draft.user_balances.get(user_id, 0)
+
+        results = claim_concurrently(game, 0)
+
+        winners = [result for result in results if result is not None]
+        assert len(results) == THREADS
+        assert len(winners) == 1
+        assert winners[0][:2] == (25, 'prize_won')
+        assert draft.user_balances[user_id] == before + 25
+        assert game.found_spots == [game.geospots[0]]
+        assert game.prize_total == 25
+    finally:
+        draft.end_game(user_id)
+
+
+def test_striped_locks_are_stable_and_bounded():
+    locks = StripedLocks(8)
+    assert len(locks) == 8
+    assert locks(42) is locks(42)
+    assert len({id(locks(key)) for key in range(1000)}) == 8
@@ -0,0 +1,37 @@
+# tests/test_counters.py
+# Свертка закончившихся окон счетчиков для отчета /memory
+import counters
+
+DAY = 24 * 3600
+
+
+def make_engine():
+    engine = counters.CounterEngine()
+    engine.define('games_played', DAY, kind=counters.SLIDING)
+    engine.define('rate_start', 60, kind=counters.SLIDING, persist=False)
+    engine.define('cooling_off', 3600, kind=counters.COOLDOWN)
+    return engine
+
+
+def test_closed_windows_are_rolled_up():
+    engine = make_engine()
+    now = 10 * DAY
+    engine.incr('games_played', 1, 3, now=now)
+    engine.incr('games_played', 2, 2, now=now)
+    engine.incr('games_played', 1, 1, now=now + DAY)
+    assert engine.rollup == {'games_played': 3}
+    assert engine.evict(now=now + 3 * DAY) == 2
+    assert engine.rollup == {'games_played': 6}
+    assert engine.rolled == 3
+    assert engine.totals() == {'games_played': 6}
+
+
+def test_totals_skip_rate_limits_and_cooldowns():
+    engine = make_engine()
+    now = 10 * DAY
+    engine.incr('games_played', 1, 2, now=now)
+    engine.incr('rate_start', 1, 5, now=now)
+    engine.start_cooldown('cooling_off', 1, now=now)
+    engine.evict(now=now + 3 * DAY)
+    assert engine.totals() == {'games_played': 2}
+    assert engine.rolled == 1
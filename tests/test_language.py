@@ -0,0 +1,31 @@
+# tests/test_language.py
+# Язык из /language сохраняется в users.language и переживает вытеснение из памяти
+import asyncio
+from types import SimpleNamespace
+
+import draft
+
+
+class Message:
+    async def reply_text(self, *args, **kwargs):
+        pass
+
+
+def choose_language(user, lang):
+    update = SimpleNamespace(effective_user=user, message=Message())
+    asyncio.run(draft.set_language(update, SimpleNamespace(args=[lang])))
+
+
+def test_language_survives_eviction():
+    user = SimpleNamespace(id=450001, language_code='ru')
+    choose_language(user, 'en')
+    draft.user_languages.clear()  # Как после sweep_stats или перезапуска
+    draft.db.user_cache.clear()
+    assert draft.user_language(user) == 'en'
+    assert draft.db.fetch_user(user.id)['language'] == 'en'
+
+
+def test_without_choice_client_language_is_used():
+    user = SimpleNamespace(id=450002, language_code='en-US')
+    assert draft.user_language(user) == 'en'
+    assert draft.user_languages[user.id] == ''  # Отсутствие выбора запомнено: база не опрашивается снова
@@ -0,0 +1,55 @@
+# tests/test_leaderboard.py
+# Имена в рейтингах: сохраняются в базе и хранятся в памяти только для игроков рейтингов
+import sqlite3
+
+from leaderboard import Leaderboards
+
+
+def test_names_survive_restart(tmp_path):
+    path = str(tmp_path / 'state.db')
+    boards = Leaderboards()
+    boards.open(path)
+    boards.record(1, winnings=10, spots=1, name='Alice')
+    boards.record(2, winnings=5, spots=1)
+    boards.close()
+
+    reopened = Leaderboards()
+    reopened.open(path)
+    assert reopened.top('all', 'winnings') == [(1, 1, 'Alice', 10), (2, 2, None, 5)]
+
+
+def test_names_only_for_ranked_users(tmp_path):
+    boards = Leaderboards()
+    boards.open(str(tmp_path / 'state.db'))
+    boards.record(1, name='Alice')  # Без находки игрок в рейтинги не попадает
+    assert boards.names == {}
+    boards.record(1, spots=1, name='Alice')
+    assert boards.names == {1: 'Alice'}
+
+
+def test_prune_drops_names_without_scores(tmp_path):
+    path = str(tmp_path / 'state.db')
+    boards = Leaderboards()
+    boards.open(path)
+    boards.record(1, spots=1, name='Alice')
+    boards.flush()
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("INSERT INTO leaderboard VALUES ('d:2000-01-01', 'spots', 2, 1)")
+        conn.execute("INSERT INTO leaderboard_names VALUES (2, 'Bob')")
+
+    boards.prune()
+    assert conn.execute('SELECT user_id, name FROM leaderboard_names').fetchall() == [(1, 'Alice')]
+    conn.close()
+
+
+def test_record_does_not_touch_the_database(tmp_path, monkeypatch):
+    boards = Leaderboards(flush_interval=3600)
+    boards.open(str(tmp_path / 'state.db'))
+    monkeypatch.setattr(sqlite3, 'connect', None)  # Любое обращение к базе из record упадет
+    boards.record(1, winnings=2, spots=1, name='Alice')
+    boards.record(1, winnings=3, spots=1)
+    monkeypatch.undo()
+    assert boards.flush() == 7  # 3 периода x 2 метрики, приросты свернуты, плюс имя
+    assert boards.top('day', 'winnings') == [(1, 1, 'Alice', 5)]
+    boards.close()
@@ -0,0 +1,18 @@
+# tests/test_payments.py
+# Оплаченный инвойс зачисляется ровно один раз, сколько бы раз его ни проверяли
+from types import SimpleNamespace
+
+from database import Database
+
+
+def test_pending_transaction_completes_once(tmp_path):
+    db = Database(str(tmp_path / 'payments.db'))
+    db.create_user(SimpleNamespace(id=1, username='u', first_name='U', last_name=None))
+    db.add_transaction(1, 20, 'deposit', 'pending', 'cryptobot', 'inv-1')
+    transaction_id = db.get_history_page(1, 'transactions')[0][0]['transaction_id']
+
+    assert db.complete_pending_transaction(transaction_id) == (1, 20, 20)
+    assert db.complete_pending_transaction(transaction_id) is None
+    assert db.get_balance(1) == db.fetch_user(1)['balance'] == 20
+    statuses = [row['status'] for row in db.get_history_page(1, 'transactions')[0]]
+    assert statuses == ['completed']
@@ -0,0 +1,71 @@
+# tests/test_startup.py
+# Быстрый запуск: актуальная схема не пересоздается, путь до первого апдейта укладывается в бюджет
+import os
+import sys
+import json
+import sqlite3
+import subprocess
+
+import database
+from database import Database, SCHEMA_VERSION
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STARTUP_SCRIPT = '''
+import json, tracing, draft
+draft.build_application()
+tracing.startup.first_update()
+print(json.dumps({"total": tracing.startup.total, "budget": tracing.startup.budget,
+                  "report": tracing.startup.report()}))
+'''
+
+
+def traced_connect(statements):
+    connect = sqlite3.connect
+
+    def wrapper(*args, **kwargs):
+        conn = connect(*args, **kwargs)
+        conn.set_trace_callback(statements.append)
+        return conn
+    return wrapper
+
+
+def test_init_db_skips_ddl_when_schema_is_current(tmp_path, monkeypatch):
+    path = str(tmp_path / 'schema.db')
+    statements = []
+    monkeypatch.setattr(database.sqlite3, 'connect', traced_connect(statements))
+
+    Database(path)
+    assert any(statement.lstrip().startswith('CREATE TABLE') for statement in statements)
+
+    statements.clear()
+    Database(path)
+    assert statements == ['PRAGMA user_version']
+
+    conn = sqlite3.connect(path)
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION
+    conn.close()
+
+
+def test_init_db_migrates_older_schema(tmp_path, monkeypatch):
+    path = str(tmp_path / 'old.db')
+    Database(path)
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA user_version = 0')
+    conn.close()
+
+    statements = []
+    monkeypatch.setattr(database.sqlite3, 'connect', traced_connect(statements))
+    Database(path)
+    assert any('CREATE INDEX' in statement for statement in statements)
+    assert f'PRAGMA user_version = {SCHEMA_VERSION}' in statements
+
+
+def test_startup_within_budget(tmp_path):
+    # Отдельный процесс: время импорта считается с нуля
+    env = dict(os.environ, DB_NAME=str(tmp_path / 'geohunter.db'), STATE_DB=str(tmp_path / 'state.db'))
+    result = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], cwd=ROOT, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    startup = json.loads(result.stdout.strip().splitlines()[-1])
+    assert startup['total'] <= startup['budget'], startup['report']
@@ -0,0 +1,73 @@
+# tests/test_trajectory.py
+# Проверка трека веб-приложения: время строго растет, погрешность GPS не складывается
+# в дальний переход; испорченный результат игры отклоняется, а не падает
+import importlib
+
+import pytest
+
+import trajectory
+from trajectory import TRACK_SCALE, TrackError
+
+START = (round(55.75 * TRACK_SCALE), round(37.61 * TRACK_SCALE))
+# Шаг чуть меньше погрешности GPS плюс предельная скорость за секунду (по широте)
+NEAR_FREE_STEP = int((trajectory.GPS_TOLERANCE + trajectory.MAX_SPEED) * TRACK_SCALE / trajectory.METERS_PER_DEGREE)
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def implementation(request, monkeypatch):
+    if request.param == 'numpy':
+        if trajectory._load_numpy() is None:
+            pytest.skip('numpy не установлен')
+    else:
+        monkeypatch.setattr(trajectory, 'np', False)
+    return request.param
+
+
+def make_track(steps):
+    flat = [*START, 0]
+    for step in steps:
+        flat += step
+    return flat
+
+
+def test_walk_passes(implementation):
+    # 10 минут ходьбы: 3 м за 2 с
+    trajectory.verify_track(make_track([[3, 0, 2]] * 300), [], max_radius=5000)
+
+
+def test_zero_time_steps_rejected(implementation):
+    with pytest.raises(TrackError) as error:
+        trajectory.verify_track(make_track([[10, 0, 0]] * 100), [], max_radius=10 ** 6)
+    assert error.value.reason == 'time'
+
+
+def test_tolerance_does_not_add_up(implementation):
+    # Каждый отрезок проходит по скорости за счет погрешности, но в среднем это ~34 м/с
+    flat = make_track([[NEAR_FREE_STEP, 0, 1]] * (trajectory.MAX_TRACK_POINTS - 1))
+    with pytest.raises(TrackError) as error:
+        trajectory.verify_track(flat, [], max_radius=10 ** 6)
+    assert error.value.reason == 'average_speed'
+
+
+def test_out_of_range_values_rejected(implementation):
+    with pytest.raises(TrackError):
+        trajectory.verify_track([*START, 0, 2 ** 70, 0, 1], [], max_radius=5000)
+
+
+@pytest.fixture
+def geohunter(tmp_path, monkeypatch):
+    # GeoHunter открывает geohunter.db в текущем каталоге при импорте
+    monkeypatch.chdir(tmp_path)
+    return importlib.import_module('GeoHunter')
+
+
+@pytest.mark.parametrize('found, track', [
+    (['spot'], None),
+    ([{'lat': 'x', 'lon': 37.61}], None),
+    ([], [*START, 0, 2 ** 70, 0, 1]),
+])
+def test_malformed_game_result_is_track_error(geohunter, found, track):
+    data = {'type': 'game_result', 'mode': 'economy', 'entry_fee': 3, 'prize_won': 0,
+            'found_geospots': found, 'track': track or make_track([[3, 0, 2]])}
+    with pytest.raises(TrackError):
+        geohunter.verify_game_result(data)
@@ -0,0 +1,35 @@
+# tests/test_web_assets.py
+# Раздача веб-приложения: страница по исходному имени и выбор gzip по Accept-Encoding
+import pytest
+
+from web_assets import WebAssets, accepts_gzip
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('', False),
+    ('gzip', True),
+    ('gzip, deflate, br', True),
+    ('br;q=1.0, gzip;q=0.5', True),
+    ('gzip;q=0', False),
+    ('GZIP; Q=0.0, deflate', False),
+    ('*', True),
+    ('*;q=0', False),
+    ('gzip;q=0, *', False),
+    ('identity', False),
+])
+def test_accepts_gzip(header, expected):
+    assert accepts_gzip(header) is expected
+
+
+def test_page_by_original_name():
+    assets = WebAssets()
+    assert assets.get('geohtml.html') is assets.get('') is assets.page
+    assert assets.get('geohtml.js') is None  # Ресурсы — только по имени с хешем
+
+
+def test_gzip_refused_with_zero_q():
+    assets = WebAssets()
+    status, body, headers = assets.respond(assets.page, 'gzip;q=0')
+    assert status == 200 and body == assets.page.body and 'Content-Encoding' not in headers
+    status, body, headers = assets.respond(assets.page, 'gzip')
+    assert body == assets.page.gzipped and headers['Content-Encoding'] == 'gzip'
@@ -0,0 +1,77 @@
+# timer_wheel.py
+# Хешированное колесо таймеров для истечения сроков по неактивности.
+# Продление срока — O(1) без перестановок: ключ переносится в нужную ячейку только
+# когда колесо доходит до его старой ячейки, а тик просматривает одну ячейку.
+import math
+import threading
+
+
+class TimerWheel:
+    def __init__(self, tick=5.0, slots=512):
+        self.tick = tick
+        self.slots = [set() for _ in range(slots)]
+        self.deadlines = {}   # ключ -> срок (в тех же единицах, что и now)
+        self.cursor = None    # Номер последнего обработанного тика
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.deadlines)
+
+    def __contains__(self, key):
+        return key in self.deadlines
+
+    def _slot(self, deadline):
+        return self.slots[math.ceil(deadline / self.tick) % len(self.slots)]
+
+    def _set(self, key, deadline, old):
+        self.deadlines[key] = deadline
+        if old is None or deadline < old:
+            # Более ранний срок должен попасть в свою ячейку сразу
+            self._slot(deadline).add(key)
+
+    def schedule(self, key, deadline):
+        """Поставить или перенести срок ключа"""
+        with self.lock:
+            self._set(key, deadline, self.deadlines.get(key))
+
+    def touch(self, key, deadline):
+        """Продлить срок существующего ключа; при продлении — только запись в словарь"""
+        with self.lock:
+            old = self.deadlines.get(key)
+            if old is None:
+                return False
+            self._set(key, deadline, old)
+            return True
+
+    def cancel(self, key):
+        with self.lock:
+            self.deadlines.pop(key, None)
+
+    def advance(self, now):
+        """Ключи с истекшим сроком; ячейки между прошлым и текущим тиком просматриваются один раз"""
+        current = math.floor(now / self.tick)
+        expired = []
+        with self.lock:
+            if self.cursor is None:
+                self.cursor = current - 1
+            # После долгой паузы достаточно одного оборота колеса
+            first = max(self.cursor + 1, current - len(self.slots) + 1)
+            for tick in range(first, current + 1):
+                slot = self.slots[tick % len(self.slots)]
+                pending, slot_keys = [], list(slot)
+                slot.clear()
+                for key in slot_keys:
+                    deadline = self.deadlines.get(key)
+                    if deadline is None:
+                        continue  # Отменен
+                    if deadline <= now:
+                        del self.deadlines[key]
+                        expired.append(key)
+                    else:
+                        pending.append((key, deadline))
+                for key, deadline in pending:
+                    target = self._slot(deadline)
+                    # Срок дальше оборота колеса: ключ остается в этой ячейке до следующего оборота
+                    (slot if target is slot else target).add(key)
+            self.cursor = current
+        return expired
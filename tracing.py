@@ -0,0 +1,155 @@
+# tracing.py
+# Трассировка обработки апдейтов и сэмплирующий профилировщик по запросу
+import os
+import sys
+import time
+import logging
+import threading
+import contextvars
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# Порог медленного апдейта (мс), такие трассы пишутся в лог
+SLOW_TRACE_MS = float(os.getenv('SLOW_TRACE_MS', '500'))
+
+_current_trace = contextvars.ContextVar('geohunter_trace', default=None)
+
+
+class Trace:
+    """Трасса одного апдейта: список шагов (вид, имя, длительность)"""
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.spans = []
+
+    def add(self, kind, name, duration):
+        self.spans.append((kind, name, duration))
+
+    def summary(self):
+        """Суммарное время по шагам, самые долгие первыми"""
+        totals = {}
+        for kind, name, duration in self.spans:
+            key = f"{kind}.{name}"
+            count, total = totals.get(key, (0, 0.0))
+            totals[key] = (count + 1, total + duration)
+        parts = sorted(totals.items(), key=lambda item: item[1][1], reverse=True)
+        return ", ".join(f"{key} {total * 1000:.1f}мс" + (f" x{count}" if count > 1 else "")
+                         for key, (count, total) in parts)
+
+
+def start_trace(name):
+    """Начать трассу в текущем контексте; возвращает токен для finish_trace"""
+    return _current_trace.set(Trace(name))
+
+
+def finish_trace(token):
+    """Завершить трассу и записать ее в лог, если она медленная"""
+    trace = _current_trace.get()
+    _current_trace.reset(token)
+    if trace is None:
+        return None
+    elapsed_ms = (time.perf_counter() - trace.started) * 1000
+    if elapsed_ms >= SLOW_TRACE_MS:
+        logger.warning(f"Slow update {elapsed_ms:.1f} ms in {trace.name}: {trace.summary() or 'no spans'}")
+    return trace
+
+
+def add_span(kind, name, duration):
+    """Добавить шаг в активную трассу (если ее нет — ничего не делает)"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(kind, name, duration)
+
+
+class span:
+    """Контекстный менеджер для шагов, которые не измеряются метриками"""
+
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        add_span(self.kind, self.name, time.perf_counter() - self.started)
+        return False
+
+
+class StartupProfile:
+    """Фазы запуска процесса: от импорта этого модуля до первого обработанного апдейта"""
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.started = time.perf_counter()
+        self.last = self.started
+        self.phases = []
+        self.total = None  # Время до первого апдейта, с
+
+    def mark(self, name):
+        """Завершить фазу name (длительность — с предыдущей отметки)"""
+        now = time.perf_counter()
+        self.phases.append((name, now - self.last))
+        self.last = now
+
+    def first_update(self):
+        if self.total is not None:
+            return
+        self.mark('first_update')
+        self.total = self.last - self.started
+        log = logger.warning if self.total > self.budget else logger.info
+        log(f"Startup {self.total:.2f} s (budget {self.budget:.1f} s): {self.report()}")
+
+    def report(self):
+        return ", ".join(f"{name} {duration * 1000:.0f}мс" for name, duration in self.phases)
+
+
+class SamplingProfiler:
+    """Сэмплирующий профилировщик потока: стеки в свернутом формате для flamegraph"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = Counter()
+        self.running = False
+        self.thread = None
+        self.target_thread_id = None
+        self.run_id = 0  # Номер запуска, чтобы отложенная остановка не задела следующий
+
+    def start(self, target_thread_id=None):
+        if self.running:
+            return False
+        self.samples.clear()
+        self.run_id += 1
+        self.target_thread_id = target_thread_id or threading.get_ident()
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self.thread.start()
+        return True
+
+    def _run(self):
+        while self.running:
+            frame = sys._current_frames().get(self.target_thread_id)
+            if frame is not None:
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.samples[';'.join(reversed(stack))] += 1
+            time.sleep(self.interval)
+
+    def stop(self):
+        """Остановить профилировщик и вернуть стеки в формате 'a;b;c count'"""
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        return '\n'.join(f"{stack} {count}" for stack, count in self.samples.most_common()) + '\n'
+
+
+profiler = SamplingProfiler()
+# Бюджет времени от запуска до первого обработанного апдейта (с)
+startup = StartupProfile(float(os.getenv('STARTUP_BUDGET', '3')))
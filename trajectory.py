@@ -0,0 +1,235 @@
+# trajectory.py
+# Проверка правдоподобности перемещения игрока против подмены GPS:
+# кольцевой буфер последних координат, скорость, ускорение и детектор прыжков за O(1),
+# а также проверка целой траектории, присланной веб-приложением вместе с результатом игры
+import math
+import time
+from collections import deque
+from itertools import accumulate
+
+np = None  # numpy (необязательный) загружается при первой проверке трека: не замедляет запуск
+
+METERS_PER_DEGREE = 111_320
+
+HISTORY_SIZE = 16        # Последних координат на игрока
+MIN_INTERVAL = 0.5       # Минимальный учитываемый интервал между координатами, с
+GPS_TOLERANCE = 20       # Погрешность GPS, м (не считается перемещением)
+MAX_SPEED = 15.0         # Предельная средняя скорость по буферу, м/с (~54 км/ч)
+MAX_ACCELERATION = 8.0   # Предельное ускорение, м/с²
+JUMP_DISTANCE = 300      # Скачок дальше этого при превышении скорости — телепорт, м
+
+SCORE_DECAY = 0.8        # Затухание оценки подозрительности за одну координату
+JUMP_PENALTY = 3.0
+THROTTLE_SCORE = 2.0     # С этой оценки координаты не проверяются на находки
+EXCLUDE_SCORE = 5.0      # С этой оценки игрок до конца игры остается без призов
+
+OK = 'ok'
+THROTTLE = 'throttle'
+EXCLUDE = 'exclude'
+
+# Трек веб-приложения: плоский список [широта, долгота, секунды] по точкам, первая точка
+# абсолютная, остальные — разности с предыдущей; координаты в единицах TRACK_SCALE градуса
+TRACK_SCALE = 100_000    # 1e-5° ≈ 1.1 м
+MAX_TRACK_POINTS = 5000  # Больше точек не проверяем: ограничивает время проверки
+FIND_DISTANCE = 12       # Дистанция находки в веб-приложении (10 м) с запасом на округление трека
+TRACK_MAX_VALUE = 2 ** 31  # Предел модуля значения трека (координаты и время укладываются с запасом)
+
+
+def distance_m(lat1, lon1, lat2, lon2):
+    """Равнопромежуточная аппроксимация: на дистанциях игры погрешность пренебрежимо мала"""
+    dy = (lat2 - lat1) * METERS_PER_DEGREE
+    dx = (lon2 - lon1) * METERS_PER_DEGREE * math.cos(math.radians((lat1 + lat2) * 0.5))
+    return math.hypot(dx, dy)
+
+
+class Track:
+    """Траектория одного игрока"""
+    __slots__ = ('fixes', 'speed', 'score', 'excluded', 'flags')
+
+    def __init__(self, size=HISTORY_SIZE):
+        self.fixes = deque(maxlen=size)  # (время, широта, долгота)
+        self.speed = 0.0
+        self.score = 0.0
+        self.excluded = False
+        self.flags = 0
+
+    def add(self, lat, lon, now):
+        """Учет новой координаты; возвращает OK, THROTTLE или EXCLUDE"""
+        fixes = self.fixes
+        if fixes:
+            last_time, last_lat, last_lon = fixes[-1]
+            dt = max(now - last_time, MIN_INTERVAL)
+            jump = distance_m(last_lat, last_lon, lat, lon)
+            speed = max(0.0, jump - GPS_TOLERANCE) / dt
+            acceleration = abs(speed - self.speed) / dt
+
+            # Средняя скорость от самой старой координаты в буфере сглаживает дрожание GPS
+            first_time, first_lat, first_lon = fixes[0]
+            span = max(now - first_time, MIN_INTERVAL)
+            average = max(0.0, distance_m(first_lat, first_lon, lat, lon) - GPS_TOLERANCE) / span
+
+            penalty = 0.0
+            if average > MAX_SPEED:
+                penalty += 1.0
+            if acceleration > MAX_ACCELERATION:
+                penalty += 1.0
+            if jump > JUMP_DISTANCE and speed > MAX_SPEED:
+                penalty += JUMP_PENALTY
+            self.score = self.score * SCORE_DECAY + penalty
+            self.speed = speed
+            if penalty:
+                self.flags += 1
+        fixes.append((now, lat, lon))
+
+        if self.excluded or self.score >= EXCLUDE_SCORE:
+            self.excluded = True
+            return EXCLUDE
+        if self.score >= THROTTLE_SCORE:
+            return THROTTLE
+        return OK
+
+
+class TrajectoryGuard:
+    """Траектории всех игроков"""
+
+    def __init__(self, size=HISTORY_SIZE):
+        self.size = size
+        self.tracks = {}
+
+    def __len__(self):
+        return len(self.tracks)
+
+    def check(self, user_id, lat, lon, now=None):
+        track = self.tracks.get(user_id)
+        if track is None:
+            track = self.tracks[user_id] = Track(self.size)
+        return track.add(lat, lon, time.monotonic() if now is None else now)
+
+    def excluded(self, user_id):
+        track = self.tracks.get(user_id)
+        return track is not None and track.excluded
+
+    def reset(self, user_id):
+        self.tracks.pop(user_id, None)
+
+
+class TrackError(ValueError):
+    """Трек не прошел проверку; reason — короткий код причины для логов и метрик"""
+
+    def __init__(self, reason, detail=''):
+        super().__init__(f"{reason}: {detail}" if detail else reason)
+        self.reason = reason
+
+
+def _load_numpy():
+    """numpy для векторной проверки или None — тогда проверка на чистом Python"""
+    global np
+    if np is None:
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            np = False
+    return np or None
+
+
+def decode_track(flat):
+    """Разностный трек -> (широты, долготы, секунды) в градусах и секундах"""
+    np = _load_numpy()
+    if not isinstance(flat, list) or not flat or len(flat) % 3:
+        raise TrackError('malformed', 'ожидается непустой список троек')
+    if len(flat) // 3 > MAX_TRACK_POINTS:
+        raise TrackError('too_long', f'{len(flat) // 3} точек')
+    if not all(type(v) is int for v in flat):
+        raise TrackError('malformed', 'значения должны быть целыми')
+    if np is not None:
+        try:
+            values = np.asarray(flat, dtype=np.int64)
+        except OverflowError:
+            values = None
+        if values is None or np.abs(values).max() >= TRACK_MAX_VALUE:
+            raise TrackError('malformed', 'значение вне пределов int32')
+        points = np.cumsum(values.reshape(-1, 3), axis=0)
+        return points[:, 0] / TRACK_SCALE, points[:, 1] / TRACK_SCALE, points[:, 2].astype(np.float64)
+    if not -TRACK_MAX_VALUE < min(flat) <= max(flat) < TRACK_MAX_VALUE:
+        raise TrackError('malformed', 'значение вне пределов int32')
+    lats = [v / TRACK_SCALE for v in accumulate(flat[0::3])]
+    lons = [v / TRACK_SCALE for v in accumulate(flat[1::3])]
+    return lats, lons, [float(v) for v in accumulate(flat[2::3])]
+
+
+def verify_track(flat, spots, max_radius, find_distance=FIND_DISTANCE, max_speed=MAX_SPEED,
+                 tolerance=GPS_TOLERANCE):
+    """Проверка результата игры веб-приложения по треку; при нарушении — TrackError.
+
+    spots — координаты (широта, долгота) заявленных находок. Трек должен начинаться в центре
+    игры, время каждой точки — строго расти, скорость на каждом отрезке и средняя по всему
+    пути — не превышать max_speed (погрешность GPS прощается отрезку и один раз всему пути),
+    а каждая метка — лежать в радиусе игры и в find_distance от какой-нибудь точки трека.
+
+    Проверка лишь отсекает грубые подделки: и метки, и трек присылает клиент, поэтому
+    согласованный с выдуманными метками трек ее проходит. Надежной она станет, когда
+    сервер будет сам хранить расстановку меток игры и сверять находки с ней"""
+    lats, lons, seconds = decode_track(flat)
+    if _load_numpy() is not None:
+        return _verify_numpy(lats, lons, seconds, spots, max_radius, find_distance, max_speed, tolerance)
+    return _verify_python(lats, lons, seconds, spots, max_radius, find_distance, max_speed, tolerance)
+
+
+def _verify_numpy(lats, lons, seconds, spots, max_radius, find_distance, max_speed, tolerance):
+    dt = np.diff(seconds)
+    if (dt <= 0).any():
+        raise TrackError('time', f'время не растет на отрезке {int((dt <= 0).argmax())}')
+    # Равнопромежуточная проекция относительно начала трека
+    kx = METERS_PER_DEGREE * math.cos(math.radians(float(lats[0])))
+    ys = (lats - lats[0]) * METERS_PER_DEGREE
+    xs = (lons - lons[0]) * kx
+    if len(xs) > 1:
+        steps = np.hypot(np.diff(xs), np.diff(ys))
+        speeds = np.maximum(steps - tolerance, 0.0) / dt
+        worst = int(speeds.argmax())
+        if speeds[worst] > max_speed:
+            raise TrackError('speed', f'{speeds[worst]:.1f} м/с на отрезке {worst}')
+        _check_average(float(steps.sum()), float(seconds[-1] - seconds[0]), max_speed, tolerance)
+    if not len(spots):
+        return
+    spots = np.asarray(spots, dtype=np.float64).reshape(-1, 2)
+    spot_y = (spots[:, 0] - lats[0]) * METERS_PER_DEGREE
+    spot_x = (spots[:, 1] - lons[0]) * kx
+    far = np.hypot(spot_x, spot_y) > max_radius + tolerance
+    if far.any():
+        raise TrackError('radius', f'метка {int(far.argmax())} вне радиуса игры')
+    # Матрица метки x точки трека: ближайшая точка для каждой метки
+    nearest = np.hypot(spot_x[:, None] - xs[None, :], spot_y[:, None] - ys[None, :]).min(axis=1)
+    missed = nearest > find_distance
+    if missed.any():
+        index = int(missed.argmax())
+        raise TrackError('not_visited', f'метка {index}: ближайшая точка в {nearest[index]:.0f} м')
+
+
+def _check_average(path, elapsed, max_speed, tolerance):
+    """Средняя скорость по всему пути: погрешность отрезков не складывается в дальний переход"""
+    average = max(0.0, path - tolerance) / max(elapsed, MIN_INTERVAL)
+    if average > max_speed:
+        raise TrackError('average_speed', f'{average:.1f} м/с за {elapsed:.0f} с')
+
+
+def _verify_python(lats, lons, seconds, spots, max_radius, find_distance, max_speed, tolerance):
+    path = 0.0
+    for i in range(1, len(lats)):
+        dt = seconds[i] - seconds[i - 1]
+        if dt <= 0:
+            raise TrackError('time', f'время не растет на отрезке {i - 1}')
+        step = distance_m(lats[i - 1], lons[i - 1], lats[i], lons[i])
+        speed = max(0.0, step - tolerance) / dt
+        if speed > max_speed:
+            raise TrackError('speed', f'{speed:.1f} м/с на отрезке {i - 1}')
+        path += step
+    if len(lats) > 1:
+        _check_average(path, seconds[-1] - seconds[0], max_speed, tolerance)
+    for index, (lat, lon) in enumerate(spots):
+        if distance_m(lats[0], lons[0], lat, lon) > max_radius + tolerance:
+            raise TrackError('radius', f'метка {index} вне радиуса игры')
+        nearest = min(distance_m(lat, lon, la, lo) for la, lo in zip(lats, lons))
+        if nearest > find_distance:
+            raise TrackError('not_visited', f'метка {index}: ближайшая точка в {nearest:.0f} м')
@@ -0,0 +1,89 @@
+# web_assets.py
+# Раздача веб-приложения из FastAPI вместо GitHub Pages.
+# При запуске страница и ее локальные CSS/JS читаются один раз: ресурсы получают имена
+# с хешем содержимого (кэшируются навсегда), ссылки на них в странице переписываются,
+# для всего заранее готовится gzip. Сама страница перепроверяется по ETag — после
+# выкладки клиент сразу получает новые имена ресурсов.
+import os
+import re
+import gzip
+import hashlib
+from collections import namedtuple
+
+WEB_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+WEB_APP_PAGE = 'geohtml.html'
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+CONTENT_TYPES = {
+    '.html': 'text/html; charset=utf-8',
+    '.css': 'text/css; charset=utf-8',
+    '.js': 'application/javascript; charset=utf-8',
+}
+# Локальные ресурсы страницы: относительные имена без каталогов и схемы
+ASSET_REF = re.compile(r'(?P<attr>\b(?:href|src)=")(?P<name>[\w.-]+\.(?:css|js))"')
+
+Asset = namedtuple('Asset', 'body gzipped content_type etag cache_control')
+
+
+def accepts_gzip(accept_encoding):
+    """Разрешен ли gzip заголовком Accept-Encoding с учетом q ('gzip;q=0' — запрет)"""
+    weights = {}
+    for item in accept_encoding.split(','):
+        coding, *params = (part.strip() for part in item.split(';'))
+        weight = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        if coding:
+            weights[coding.lower()] = weight
+    return weights.get('gzip', weights.get('*', 0.0)) > 0
+
+
+def make_asset(name, body, cache_control):
+    """Ресурс с готовым gzip (если он меньше); слабый ETag общий для обоих вариантов"""
+    digest = hashlib.sha256(body).hexdigest()
+    gzipped = gzip.compress(body, compresslevel=9, mtime=0)
+    return Asset(body, gzipped if len(gzipped) < len(body) else None,
+                 CONTENT_TYPES[os.path.splitext(name)[1]], f'W/"{digest[:16]}"', cache_control)
+
+
+class WebAssets:
+    def __init__(self, directory=WEB_APP_DIR, page=WEB_APP_PAGE):
+        self.files = {}  # имя с хешем -> Asset
+        names = {}       # исходное имя -> имя с хешем
+
+        def hashed(match):
+            name = match['name']
+            if name not in names:
+                with open(os.path.join(directory, name), 'rb') as f:
+                    body = f.read()
+                stem, ext = os.path.splitext(name)
+                names[name] = f"{stem}.{hashlib.sha256(body).hexdigest()[:10]}{ext}"
+                self.files[names[name]] = make_asset(name, body, IMMUTABLE)
+            return f'{match["attr"]}{names[name]}"'
+
+        with open(os.path.join(directory, page), encoding='utf-8') as f:
+            html = ASSET_REF.sub(hashed, f.read())
+        self.page = make_asset(page, html.encode('utf-8'), REVALIDATE)
+        self.page_name = page
+
+    def get(self, name):
+        """Asset по имени с хешем; '' или исходное имя страницы — страница"""
+        return self.page if name in ('', self.page_name) else self.files.get(name)
+
+    @staticmethod
+    def respond(asset, accept_encoding='', if_none_match=''):
+        """(статус, тело, заголовки) ответа с учетом gzip и условного запроса"""
+        headers = {'Cache-Control': asset.cache_control, 'ETag': asset.etag, 'Vary': 'Accept-Encoding'}
+        if asset.etag in (tag.strip() for tag in if_none_match.split(',')):
+            return 304, b'', headers
+        headers['Content-Type'] = asset.content_type
+        if asset.gzipped is not None and accepts_gzip(accept_encoding):
+            headers['Content-Encoding'] = 'gzip'
+            return 200, asset.gzipped, headers
+        return 200, asset.body, headers
@@ -0,0 +1,102 @@
+# webapp_payload.py
+# Компактный формат данных веб-приложения для Telegram.WebApp.sendData (лимит 4096 байт).
+# Версия 2 — JSON-массив [версия, тип, поля по схеме...]: числовые массивы упакованы
+# struct'ом в little-endian и закодированы base64. Версия 1 — прежний JSON-объект
+# с полными ключами; decode_payload принимает обе.
+#
+# Пример версии 2:
+#   [2, "game_result", "economy", 3, 5, "<метки base64>", "<трек base64>"]
+import json
+import base64
+import struct
+
+PAYLOAD_VERSION = 2
+MAX_PAYLOAD_SIZE = 4096  # Ограничение sendData, байт
+COORD_SCALE = 100_000    # Координаты в единицах 1e-5°, как в треке trajectory.TRACK_SCALE
+
+# Метка: приз (uint16), широта и долгота (int32)
+SPOT_FORMAT = '<Hii'
+SPOT_SIZE = struct.calcsize(SPOT_FORMAT)
+# Трек: первая точка абсолютная (int32 x3), дальше разности (int16 x3)
+TRACK_HEAD_FORMAT = '<iii'
+TRACK_HEAD_SIZE = struct.calcsize(TRACK_HEAD_FORMAT)
+TRACK_DELTA_SIZE = struct.calcsize('<hhh')
+
+# Схема: (версия, тип) -> поля после типа в порядке массива; 'spots'/'track' — упакованные
+SCHEMAS = {
+    (2, 'game_result'): (('mode', str), ('entry_fee', int), ('prize_won', int),
+                         ('found_geospots', 'spots'), ('track', 'track')),
+    (2, 'payment_request'): (('amount', (int, float)),),
+}
+
+
+def _unpack(value, size):
+    raw = base64.b64decode(value, validate=True)
+    if len(raw) % size:
+        raise ValueError(f"длина поля {len(raw)} не кратна {size}")
+    return raw
+
+
+def decode_spots(value):
+    raw = _unpack(value, SPOT_SIZE)
+    return [{'has_prize': prize > 0, 'prize_amount': prize, 'lat': lat / COORD_SCALE, 'lon': lon / COORD_SCALE}
+            for prize, lat, lon in struct.iter_unpack(SPOT_FORMAT, raw)]
+
+
+def decode_track(value):
+    """Трек в разностном виде trajectory.verify_track: плоский список целых"""
+    raw = _unpack(value, 1)
+    if not raw:
+        return []
+    if len(raw) < TRACK_HEAD_SIZE or (len(raw) - TRACK_HEAD_SIZE) % TRACK_DELTA_SIZE:
+        raise ValueError(f"неверная длина трека {len(raw)}")
+    deltas = (len(raw) - TRACK_HEAD_SIZE) // 2
+    return list(struct.unpack_from(TRACK_HEAD_FORMAT, raw) + struct.unpack_from(f'<{deltas}h', raw, TRACK_HEAD_SIZE))
+
+
+DECODERS = {'spots': decode_spots, 'track': decode_track}
+
+
+def decode_payload(raw):
+    """Данные sendData -> словарь в формате версии 1; ValueError при нарушении схемы"""
+    data = json.loads(raw)
+    if isinstance(data, dict):
+        return data  # Версия 1
+    if not isinstance(data, list) or len(data) < 2:
+        raise ValueError("ожидается объект или массив")
+    schema = SCHEMAS.get((data[0], data[1]))
+    if schema is None:
+        raise ValueError(f"неизвестные версия/тип {data[0]!r}/{data[1]!r}")
+    if len(data) != len(schema) + 2:
+        raise ValueError(f"{data[1]} v{data[0]}: ожидается полей {len(schema)}, получено {len(data) - 2}")
+
+    result = {'type': data[1], 'version': data[0]}
+    for (name, kind), value in zip(schema, data[2:]):
+        if kind in DECODERS:
+            if not isinstance(value, str):
+                raise ValueError(f"{name}: ожидается строка base64")
+            result[name] = DECODERS[kind](value)
+        elif not isinstance(value, kind) or isinstance(value, bool):
+            raise ValueError(f"{name}: неверный тип {type(value).__name__}")
+        else:
+            result[name] = value
+    return result
+
+
+def encode_payload(data):
+    """Словарь версии 1 -> строка версии 2 (как ее собирает веб-приложение)"""
+    schema = SCHEMAS[(PAYLOAD_VERSION, data['type'])]
+    fields = [PAYLOAD_VERSION, data['type']]
+    for name, kind in schema:
+        value = data[name]
+        if kind == 'spots':
+            value = b''.join(struct.pack(SPOT_FORMAT, spot.get('prize_amount', 0) if spot.get('has_prize') else 0,
+                                         round(spot['lat'] * COORD_SCALE), round(spot['lon'] * COORD_SCALE))
+                             for spot in value)
+        elif kind == 'track':
+            value = struct.pack(TRACK_HEAD_FORMAT, *value[:3]) + struct.pack(f'<{len(value) - 3}h', *value[3:]) \
+                if value else b''
+        if isinstance(value, bytes):
+            value = base64.b64encode(value).decode('ascii')
+        fields.append(value)
+    return json.dumps(fields, separators=(',', ':'))